@@ -0,0 +1,496 @@
+from collections import Counter, defaultdict
+
+import pandas as pd
+
+from esquema import aplicar_esquema
+from logica import COLUMNAS, COLUMNAS_LIBRES, TIPOS_CONTADOR, fila_vista_libre
+from persistencia import AsignadorIDs, ConflictoConcurrencia, Delta, valor_celda
+from recurrencias import IndiceRecurrencias
+
+# ==========================================
+# ALMACÉN DE TAREAS CON MUTACIONES IN-PLACE
+# ==========================================
+# Las filas se guardan en un dict ordenado {ID: [valores]}, así que asignar,
+# completar, liberar... cuestan O(1) y no copian la tabla. Cada operación
+# apunta su cambio (para enviar solo el delta) y cómo deshacerlo (para volver
+# atrás si falla el guardado). El DataFrame para pintar se genera una sola vez
+# por versión, no en cada clic.
+
+
+class TareaNoDisponible(Exception):
+    """La tarea ya no se puede asignar (otra persona la cogió o no queda stock)."""
+
+
+# Columnas que cambian a qué vista por usuario/grupo pertenece una fila
+_COLUMNAS_VISTA = ('Responsable', 'Estado', 'Para')
+
+
+def _clave(v):
+    """IDs como enteros aunque la hoja los devuelva como float ('7.0')."""
+    try:
+        return int(float(v))
+    except (TypeError, ValueError):
+        return v
+
+
+class _VistaLibres:
+    """Vista de libres de unos grupos y unas 'debidas', guardada fila a fila."""
+
+    def __init__(self, grupos, debidas):
+        self.grupos = tuple(grupos)
+        self.debidas = None if debidas is None else frozenset(debidas)
+        self.filas = {}
+        self.por_tarea = defaultdict(set)
+        # Tareas cambiadas desde que se pidió la vista (None: rehacerla entera)
+        self.tocadas = None
+        self.df = None
+
+    def sirve(self, grupos, debidas):
+        return self.grupos == tuple(grupos) and self.debidas == (None if debidas is None else frozenset(debidas))
+
+
+class AlmacenTareas:
+    """Tabla de tareas indexada por ID con registro de cambios y rollback.
+
+    'ids' es el AsignadorIDs compartido; sin él se usa uno local al almacén.
+    """
+
+    def __init__(self, df=None, ids=None):
+        if df is None or len(df.columns) == 0:
+            df = pd.DataFrame(columns=COLUMNAS)
+        self.columnas = list(df.columns)
+        self._pos = {c: n for n, c in enumerate(self.columnas)}
+        self._filas = {}
+        # Orden de llegada de cada fila, para recolocarlas si se revierte un borrado
+        self._orden = {}
+        # Índices para consultar el stock sin recorrer la tabla
+        self._puntuales = Counter()
+        self._maestra = {}
+        self._n_maestras = Counter()
+        # Filas que el reinicio diario tiene que tocar (asignadas, hechas o 'Puntual')
+        self._sucias = set()
+        # Qué maestras tocan cada día según su 'Frecuencia'
+        self.recurrencias = IndiceRecurrencias()
+        # Vistas por usuario y grupo: ('resp', Responsable, Estado) y ('libre', Para) -> IDs
+        self._vistas = defaultdict(set)
+        self._ids_tarea = defaultdict(set)
+        self._libres = None
+        for fila in df.fillna("-").itertuples(index=False, name=None):
+            fila = [valor_celda(v) for v in fila]
+            fila[self._pos['ID']] = _clave(fila[self._pos['ID']])
+            if fila[self._pos['ID']] in self._filas:
+                raise ValueError(f"ID duplicado en la tabla: {fila[self._pos['ID']]}")
+            self._filas[fila[self._pos['ID']]] = fila
+            self._orden[fila[self._pos['ID']]] = len(self._orden)
+            self._indexar(fila, 1)
+        self._siguiente_orden = len(self._orden)
+        self.ids = ids if ids is not None else AsignadorIDs()
+        self.ids.asegurar_minimo(max((k for k in self._filas if isinstance(k, int)), default=0))
+        self.version = 0
+        self._tabla = None
+        self._tabla_version = -1
+        self._descartar_cambios()
+
+    def _es_sucia(self, fila):
+        p = self._pos
+        return (fila[p['Frecuencia']] == 'Puntual' or fila[p['Responsable']] != 'Sin asignar'
+                or fila[p['Estado']] != 'Pendiente' or fila[p['Franja']] != '-')
+
+    def _marcar(self, id_tarea):
+        if self._es_sucia(self._filas[id_tarea]):
+            self._sucias.add(id_tarea)
+        else:
+            self._sucias.discard(id_tarea)
+
+    def _claves_vista(self, fila):
+        p = self._pos
+        if fila[p['Responsable']] == 'Sin asignar':
+            return [('libre', fila[p['Para']])]
+        return [('resp', fila[p['Responsable']], fila[p['Estado']])]
+
+    def _vista(self, fila, signo):
+        for clave in self._claves_vista(fila):
+            if signo > 0:
+                self._vistas[clave].add(fila[self._pos['ID']])
+            else:
+                self._vistas[clave].discard(fila[self._pos['ID']])
+
+    def _indexar(self, fila, signo):
+        tarea = fila[self._pos['Tarea']]
+        self._vista(fila, signo)
+        if signo > 0:
+            self._ids_tarea[tarea].add(fila[self._pos['ID']])
+        else:
+            self._ids_tarea[tarea].discard(fila[self._pos['ID']])
+        self._tocar_libres(tarea)
+        if fila[self._pos['Frecuencia']] != 'Puntual':
+            if signo > 0:
+                self.recurrencias.agregar(fila[self._pos['ID']], fila[self._pos['Frecuencia']])
+            else:
+                self.recurrencias.quitar(fila[self._pos['ID']])
+        if signo > 0 and self._es_sucia(fila):
+            self._sucias.add(fila[self._pos['ID']])
+        elif signo < 0:
+            self._sucias.discard(fila[self._pos['ID']])
+        if fila[self._pos['Frecuencia']] == 'Puntual':
+            self._puntuales[tarea] += signo
+        elif signo > 0:
+            self._n_maestras[tarea] += 1
+            self._maestra.setdefault(tarea, fila[self._pos['ID']])
+        else:
+            self._n_maestras[tarea] -= 1
+            if self._maestra.get(tarea) != fila[self._pos['ID']]:
+                return
+            del self._maestra[tarea]
+            if self._n_maestras[tarea] <= 0:
+                # Lo normal al asignar una tarea normal: no queda otra maestra
+                return
+            # Caso raro (hay otra maestra con el mismo nombre): se busca
+            for otra in self._filas.values():
+                if otra[self._pos['Tarea']] == tarea and otra[self._pos['Frecuencia']] != 'Puntual':
+                    self._maestra[tarea] = otra[self._pos['ID']]
+                    break
+
+    # --- Registro de cambios ---
+    def _descartar_cambios(self):
+        self._insertados = {}
+        self._actualizados = {}
+        self._borrados = []
+        self._deshacer = []
+        # Valores leídos de las filas que se tocan (condición para escribir)
+        self._condiciones = {}
+        self._reservas = Counter()
+
+    def _esperar(self, id_tarea, columnas):
+        """Apunta el valor original de las columnas antes de tocarlas."""
+        if id_tarea in self._insertados:
+            return
+        fila = self._filas[id_tarea]
+        esperados = self._condiciones.setdefault(id_tarea, {})
+        for c in columnas:
+            esperados.setdefault(c, fila[self._pos[c]])
+
+    def _tocar(self):
+        self.version += 1
+
+    def _tocar_libres(self, tarea):
+        # El stock y el texto de una fila libre dependen de todas las filas de su tarea
+        if self._libres is not None and self._libres.tocadas is not None:
+            self._libres.tocadas.add(tarea)
+
+    def _set(self, id_tarea, columna, valor):
+        fila = self._filas[id_tarea]
+        anterior = fila[self._pos[columna]]
+        if anterior == valor:
+            return
+        self._esperar(id_tarea, [columna])
+        if columna in _COLUMNAS_VISTA:
+            self._vista(fila, -1)
+        fila[self._pos[columna]] = valor
+        if columna in _COLUMNAS_VISTA:
+            self._vista(fila, 1)
+        self._marcar(id_tarea)
+        self._tocar_libres(fila[self._pos['Tarea']])
+        self._deshacer.append(('set', id_tarea, columna, anterior))
+        if id_tarea not in self._insertados:
+            self._actualizados.setdefault(id_tarea, {})[columna] = valor
+        self._tocar()
+
+    def _insertar(self, valores):
+        fila = [valores.get(c, "-") for c in self.columnas]
+        id_tarea = fila[self._pos['ID']]
+        if id_tarea in self._filas:
+            raise ValueError(f"ID duplicado: {id_tarea}")
+        self._filas[id_tarea] = fila
+        self._orden[id_tarea] = self._siguiente_orden
+        self._siguiente_orden += 1
+        self._insertados[id_tarea] = fila
+        self._indexar(fila, 1)
+        self._deshacer.append(('insertar', id_tarea, None, None))
+        self._tocar()
+        return id_tarea
+
+    def _borrar(self, id_tarea):
+        self._esperar(id_tarea, self.columnas)
+        fila = self._filas.pop(id_tarea)
+        self._indexar(fila, -1)
+        if self._insertados.pop(id_tarea, None) is None:
+            self._actualizados.pop(id_tarea, None)
+            self._borrados.append(id_tarea)
+        self._deshacer.append(('borrar', id_tarea, None, fila))
+        self._tocar()
+
+    def cambios_pendientes(self):
+        """Delta con todo lo modificado desde el último confirmar()."""
+        return Delta(
+            self.columnas,
+            insertados=[list(f) for f in self._insertados.values()],
+            actualizados={k: dict(v) for k, v in self._actualizados.items()},
+            borrados=list(self._borrados),
+            condiciones={k: dict(v) for k, v in self._condiciones.items() if k not in self._insertados},
+            reservas={t: n for t, n in self._reservas.items() if n > 0},
+        )
+
+    def confirmar(self):
+        """El backend ya tiene los cambios: se vacía el registro."""
+        for op, id_tarea, _, _ in self._deshacer:
+            if op == 'borrar' and id_tarea not in self._filas:
+                self._orden.pop(id_tarea, None)
+        self._descartar_cambios()
+
+    def revertir(self):
+        """Deshace todas las operaciones desde el último confirmar()."""
+        for op, id_tarea, columna, anterior in reversed(self._deshacer):
+            if op == 'set':
+                fila = self._filas[id_tarea]
+                if columna in _COLUMNAS_VISTA:
+                    self._vista(fila, -1)
+                fila[self._pos[columna]] = anterior
+                if columna in _COLUMNAS_VISTA:
+                    self._vista(fila, 1)
+                self._marcar(id_tarea)
+                self._tocar_libres(fila[self._pos['Tarea']])
+            elif op == 'insertar':
+                self._indexar(self._filas.pop(id_tarea), -1)
+                self._orden.pop(id_tarea, None)
+            elif op == 'borrar':
+                # Vuelve a su sitio original: se reconstruye el orden del dict
+                self._filas[id_tarea] = anterior
+                self._indexar(anterior, 1)
+        if any(op == 'borrar' for op, *_ in self._deshacer):
+            self._reordenar()
+        self._descartar_cambios()
+        self._tocar()
+
+    def _reordenar(self):
+        self._filas = {k: self._filas[k] for k in sorted(self._filas, key=self._orden.__getitem__)}
+
+    # --- Lectura ---
+    def __len__(self):
+        return len(self._filas)
+
+    def __contains__(self, id_tarea):
+        return _clave(id_tarea) in self._filas
+
+    def fila(self, id_tarea):
+        """Fila como dict {columna: valor}."""
+        return dict(zip(self.columnas, self._filas[_clave(id_tarea)]))
+
+    def tabla(self):
+        """DataFrame de la versión actual (se regenera solo si hubo cambios)."""
+        if self._tabla_version != self.version:
+            self._tabla = aplicar_esquema(pd.DataFrame(list(self._filas.values()), columns=self.columnas),
+                                          validar=False)
+            self._tabla_version = self.version
+        return self._tabla
+
+    def _tabla_de(self, ids):
+        ids = sorted(ids, key=self._orden.__getitem__)
+        return pd.DataFrame([self._filas[i] for i in ids], columns=self.columnas)
+
+    def filas_de(self, usuario, estado):
+        """Filas de 'usuario' en 'estado' (Mis Pendientes / Mis Finalizadas), en O(resultado)."""
+        return self._tabla_de(self._vistas.get(('resp', usuario, estado), ()))
+
+    def libres_para(self, grupos):
+        """Filas sin asignar cuyo 'Para' está en 'grupos' (candidatas a Tareas Libres)."""
+        ids = set()
+        for grupo in grupos:
+            ids |= self._vistas.get(('libre', grupo), set())
+        return self._tabla_de(ids)
+
+    def tareas_libres(self, grupos, debidas=None):
+        """Lo mismo que vista_tareas_libres sobre la tabla, sin recorrerla.
+
+        La vista se guarda y, tras cada cambio, solo se rehacen las filas de
+        las tareas tocadas. Con otros grupos u otras 'debidas' se rehace entera.
+        """
+        vista = self._libres
+        if vista is None or not vista.sirve(grupos, debidas):
+            vista = self._libres = _VistaLibres(grupos, debidas)
+        if vista.tocadas is None:
+            candidatas = set().union(*(self._vistas.get(('libre', g), ()) for g in vista.grupos))
+        elif vista.tocadas:
+            candidatas = set()
+            for tarea in vista.tocadas:
+                for id_tarea in vista.por_tarea.pop(tarea, ()):
+                    del vista.filas[id_tarea]
+                candidatas |= self._ids_tarea.get(tarea, set())
+        else:
+            return vista.df
+        for id_tarea in candidatas:
+            fila = self._fila_libre(id_tarea, vista.grupos, vista.debidas)
+            if fila is not None:
+                vista.filas[id_tarea] = fila
+                vista.por_tarea[fila[1]].add(id_tarea)
+        orden = sorted(vista.filas, key=self._orden.__getitem__)
+        vista.df = pd.DataFrame([vista.filas[i] for i in orden], columns=COLUMNAS_LIBRES)
+        vista.tocadas = set()
+        return vista.df
+
+    def _fila_libre(self, id_tarea, grupos, debidas):
+        """Fila de 'id_tarea' en la vista de libres, o None si no sale (como vista_tareas_libres)."""
+        fila = self._filas[id_tarea]
+        p = self._pos
+        if fila[p['Responsable']] != 'Sin asignar' or fila[p['Para']] not in grupos:
+            return None
+        if fila[p['Frecuencia']] == 'Puntual':
+            # De un contador sale solo la maestra; una normal 'Puntual' libre es una unidad
+            if fila[p['Tipo']] in TIPOS_CONTADOR:
+                return None
+            stock = 1
+        else:
+            if debidas is not None and id_tarea not in debidas:
+                return None
+            stock = self.stock(fila[p['Tarea']])
+            if stock <= 0:
+                return None
+        return fila_vista_libre(id_tarea, fila[p['Tarea']], fila[p['Tipo']], fila[p['Para']], stock)
+
+    def debidas(self, dia):
+        """IDs de las maestras que tocan el día 'dia' (sin recorrer la tabla)."""
+        return self.recurrencias.debidas(dia)
+
+    def nuevo_id(self):
+        return self.ids.siguiente()
+
+    def stock(self, tarea):
+        """Unidades libres de un contador, o 1/0 de una normal (como obtener_stock_real, en O(1))."""
+        id_maestra = self._maestra.get(tarea)
+        if id_maestra is None:
+            return 0
+        maestra = self._filas[id_maestra]
+        try:
+            objetivo = int(float(maestra[self._pos['Cantidad']]))
+        except (TypeError, ValueError):
+            objetivo = 0
+        if maestra[self._pos['Tipo']] not in TIPOS_CONTADOR:
+            objetivo = 1
+        return max(0, objetivo - self._puntuales[tarea])
+
+    # --- Operaciones de la app ---
+    def asignar(self, id_tarea, usuario, franja):
+        """Crea la asignación 'Puntual'.
+
+        La maestra se queda: una normal es un contador de una unidad, así que
+        sale de la lista de libres hasta que se suelte o llegue el reinicio.
+        """
+        id_tarea = _clave(id_tarea)
+        if id_tarea not in self._filas:
+            raise TareaNoDisponible("La tarea ya no existe")
+        original = self.fila(id_tarea)
+        es_contador = original['Tipo'] in TIPOS_CONTADOR
+        sustituye = original['Frecuencia'] == 'Puntual'
+        if sustituye:
+            # Una 'Puntual' libre (normal soltada en hojas antiguas): la nueva la sustituye
+            if original['Responsable'] != 'Sin asignar':
+                raise TareaNoDisponible(f"'{original['Tarea']}' ya está asignada")
+        elif self.stock(original['Tarea']) <= 0:
+            raise TareaNoDisponible(f"No quedan unidades de '{original['Tarea']}'" if es_contador
+                                    else f"'{original['Tarea']}' ya está asignada")
+        else:
+            self._reservas[original['Tarea']] += 1
+        id_nuevo = self._insertar({
+            'ID': self.nuevo_id(),
+            'Tarea': original['Tarea'],
+            'Frecuencia': 'Puntual',
+            'Tipo': original['Tipo'],
+            'Para': original['Para'],
+            'Responsable': usuario,
+            'Estado': 'Pendiente',
+            'Franja': franja,
+            'Cantidad': 1,
+        })
+        if sustituye:
+            self._borrar(id_tarea)
+        return id_nuevo
+
+    def completar(self, id_tarea):
+        self._set(_clave(id_tarea), 'Estado', 'Hecho')
+
+    def reabrir(self, id_tarea):
+        """Deshace un 'Hecho' (botón Undo)."""
+        self._set(_clave(id_tarea), 'Estado', 'Pendiente')
+
+    def liberar(self, id_tarea):
+        id_tarea = _clave(id_tarea)
+        fila = self.fila(id_tarea)
+        if fila['Frecuencia'] == 'Puntual' and fila['Tarea'] in self._maestra:
+            # La unidad vuelve a su maestra (la normal vuelve a la lista de libres)
+            self._borrar(id_tarea)
+        else:
+            # Sin maestra (normales asignadas en hojas antiguas): la propia fila queda libre
+            self._set(id_tarea, 'Responsable', 'Sin asignar')
+            self._set(id_tarea, 'Franja', '-')
+
+    def ajustar_cantidad(self, id_tarea, cantidad):
+        self._set(_clave(id_tarea), 'Cantidad', int(cantidad))
+
+    def nueva_tarea(self, tarea, para, tipo, cantidad, frecuencia='Diaria'):
+        return self._insertar({
+            'ID': self.nuevo_id(),
+            'Tarea': tarea,
+            'Frecuencia': frecuencia,
+            'Tipo': tipo,
+            'Para': para,
+            'Responsable': 'Sin asignar',
+            'Estado': 'Pendiente',
+            'Franja': '-',
+            'Cantidad': int(cantidad),
+        })
+
+    def reinicio_diario(self):
+        """Borra las asignaciones 'Puntual' y deja el resto libre y pendiente.
+
+        Solo recorre las filas que cambiaron (índice '_sucias'), no la tabla entera.
+        Una normal sin maestra (hojas de cuando asignar la borraba) no se pierde:
+        vuelve como maestra diaria, como en migrar_tabla.
+        """
+        p = self._pos
+        for id_tarea in sorted(self._sucias, key=self._orden.__getitem__):
+            fila = self._filas[id_tarea]
+            if fila[p['Frecuencia']] == 'Puntual':
+                tarea = fila[p['Tarea']]
+                self._borrar(id_tarea)
+                if fila[p['Tipo']] not in TIPOS_CONTADOR and tarea not in self._maestra:
+                    self._insertar({**dict(zip(self.columnas, fila)), 'ID': self.nuevo_id(), 'Frecuencia': 'Diaria',
+                                    'Responsable': 'Sin asignar', 'Estado': 'Pendiente', 'Franja': '-',
+                                    'Cantidad': 1})
+                continue
+            self._set(id_tarea, 'Responsable', 'Sin asignar')
+            self._set(id_tarea, 'Estado', 'Pendiente')
+            self._set(id_tarea, 'Franja', '-')
+
+
+def ejecutar_con_reintentos(almacen, operacion, backend, recargar, intentos=3):
+    """Aplica 'operacion(almacen)' y guarda solo sus cambios en el backend.
+
+    Como cada escritura lleva los valores que se leyeron, los cambios de otras
+    sesiones sobre otras filas se conservan. Si alguien tocó las mismas filas
+    (ConflictoConcurrencia), se recarga la tabla con 'recargar()' y se repite
+    la operación sobre los datos frescos. Devuelve (almacén vigente, delta
+    guardado); el almacén puede ser uno nuevo si hubo que recargar.
+
+    Coger una unidad de un contador (solo reservas, sin filas que comprobar)
+    va con backend.reservar(): si no queda stock se sabe en esa misma
+    llamada y se lanza TareaNoDisponible sin recargar ni reintentar.
+    """
+    for intento in range(intentos):
+        try:
+            operacion(almacen)
+            delta = almacen.cambios_pendientes()
+            if delta.reservas and not delta.condiciones:
+                if not backend.reservar(delta):
+                    raise TareaNoDisponible(f"No quedan unidades de '{', '.join(delta.reservas)}'")
+            else:
+                backend.aplicar_delta(delta)
+            almacen.confirmar()
+            return almacen, delta
+        except ConflictoConcurrencia:
+            almacen.revertir()
+            if intento == intentos - 1:
+                raise
+            almacen = recargar()
+        except Exception:
+            almacen.revertir()
+            raise
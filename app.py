@@ -1,7 +1,13 @@
 import streamlit as st
 from streamlit_gsheets import GSheetsConnection
 import pandas as pd
-import time
+from almacen import TareaNoDisponible
+from conexion import CircuitoAbierto, GestorConexiones
+from instrumentacion import Instrumentacion
+from hogares import HogarDesconocido, RegistroHogares, cargar_hogares
+from recurrencias import DIAS_SEMANA, Regla
+from logica import filtrar_por_texto, numero_paginas, paginar
+from servicio import Configuracion, Sesion, crear_inquilino
 
 # ==========================================
 # 1. CONFIGURACIÓN Y ESTILO
@@ -13,6 +19,22 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Almacenamiento, escritura diferida, réplica, reinicio, hogares... (variables GESTI_*, ver servicio.py)
+CONF = Configuracion.desde_entorno()
+
+# Tiempos de cada parte de la recarga (panel de administración → Rendimiento)
+@st.cache_resource
+def crear_instrumentacion():
+    return Instrumentacion(activa=CONF.instrumentacion)
+
+instr = crear_instrumentacion()
+recarga_anterior = st.session_state.get('recarga')
+if recarga_anterior is not None and recarga_anterior.perfil:
+    st.session_state.ultimo_perfil = recarga_anterior.perfil
+st.session_state.recarga = instr.iniciar_recarga(perfilar=st.session_state.pop('perfilar', False),
+                                                 anterior=recarga_anterior)
+instr.seccion("estilo")
+
 st.markdown("""
     <style>
     .main { background-color: #f5f7f9; }
@@ -25,60 +47,183 @@ st.markdown("""
 # ==========================================
 # 2. CONEXIÓN Y GESTIÓN DE DATOS
 # ==========================================
-conn = st.connection("gsheets", type=GSheetsConnection)
+@st.cache_resource
+def crear_gestor():
+    """Conexiones a Sheets del proceso, compartidas por todos los hogares, con cuota y reintentos."""
+    if not CONF.usa_gsheets():
+        return None
+    return GestorConexiones(lambda: GSheetsConnection("gsheets"), tam_pool=CONF.tam_pool,
+                            lecturas_por_minuto=CONF.lecturas_minuto, escrituras_por_minuto=CONF.escrituras_minuto)
+
+@st.cache_resource
+def crear_registro():
+    """Hogares cargados en el proceso; cada uno se carga la primera vez que alguien entra."""
+    fabrica = lambda hogar: crear_inquilino(hogar, CONF, gestor=crear_gestor(),  # noqa: E731
+                                            instrumentacion=crear_instrumentacion())
+    return RegistroHogares(cargar_hogares(CONF.ruta_hogares), fabrica, max_activos=CONF.max_hogares_activos)
+
+# El hogar va en la URL (?hogar=garcia) o en GESTI_HOGAR; con uno solo no hace falta.
+# Nunca se listan los hogares: quien entra sin decir el suyo no ve los demás
+instr.seccion("sesion")
+registro = crear_registro()
+id_hogar = st.query_params.get("hogar") or CONF.hogar
+if not id_hogar:
+    if len(registro.hogares) != 1:
+        st.error("Entra con la dirección de tu hogar (…?hogar=nombre).")
+        st.stop()
+    id_hogar = next(iter(registro.hogares))
+try:
+    inquilino = registro.obtener(id_hogar)
+except HogarDesconocido:
+    st.error(f"No existe el hogar '{id_hogar}'.")
+    st.stop()
 
-def cargar_datos():
+hogar = inquilino.hogar
+historial = inquilino.historial
+planificador = inquilino.planificador
+replica = inquilino.replica
+cola = inquilino.cola
+# Cola que lleva los cambios a la hoja (la diferida o la de la réplica), para el estado de la barra lateral
+cola_envio = replica.cola if replica is not None else cola
+
+gestor = crear_gestor()
+
+# La sesión del núcleo (usuario y copia de la tabla) vive en la de Streamlit;
+# si cambia de hogar se empieza otra con la tabla del nuevo
+if st.session_state.get('sesion') is None or st.session_state.sesion.inquilino is not inquilino:
+    st.session_state.sesion = Sesion(inquilino)
+sesion = st.session_state.sesion
+
+@instr.medir("cargar_datos")
+def cargar_datos(forzar=False):
+    # Si no se ha podido leer, la tabla vacía no significa 'no hay tareas'
+    st.session_state.sin_datos = False
     try:
-        return conn.read(ttl=0)
+        sesion.cargar(forzar=forzar)
+        return
+    except CircuitoAbierto as e:
+        st.error(f"🔴 Google Sheets no responde; se reintentará en {e.reintento_en:.0f}s.")
     except Exception as e:
         st.error(f"Error de conexión: {e}")
-        return pd.DataFrame()
+    st.session_state.sin_datos = True
+    sesion.cargar(tabla=pd.DataFrame())
 
-def guardar_datos(df_nuevo):
+@instr.medir("guardar_datos")
+def guardar_datos(operacion):
+    """Ejecuta 'operacion()' (una operación de la sesión) y avisa en la página si no se ha guardado."""
     try:
-        df_final = df_nuevo.copy().reset_index(drop=True)
-        df_final = df_final.fillna("-")
-        conn.update(data=df_final)
-        st.session_state.df = df_final
+        operacion()
         return True
+    except TareaNoDisponible as e:
+        # La sesión ya ha recargado la tabla
+        st.warning(f"⚠️ {e}")
+        return False
+    except CircuitoAbierto as e:
+        st.error(f"🔴 Google Sheets no responde; el cambio no se ha guardado. "
+                 f"Prueba otra vez en {e.reintento_en:.0f}s.")
+        return False
     except Exception as e:
+        # La copia de la sesión ya ha vuelto a quedar igual que la hoja
         st.error(f"❌ Error al guardar: {e}")
         return False
 
-if 'df' not in st.session_state:
-    st.session_state.df = cargar_datos()
+# Si la última carga falló se vuelve a intentar en cada recarga de la página
+if sesion.almacen is None or st.session_state.get('sin_datos'):
+    cargar_datos()
+# Si el reinicio automático ha pasado mientras la sesión estaba abierta, se recarga
+sesion.al_dia()
 
 # ==========================================
 # 3. PERFILES Y SEGURIDAD
 # ==========================================
+instr.seccion("ui_barra_lateral")
 st.sidebar.title("🎮 Control de Acceso")
-usuarios = ["Papá", "Mamá", "Jesús", "Cris", "María"]
+usuarios = hogar.usuarios
 user_actual = st.sidebar.selectbox("¿Quién está usando la App?", usuarios)
-es_admin = user_actual in ["Papá", "Mamá"]
-filtro_grupo = ['Padres', 'Todos'] if es_admin else ['Hijos', 'Todos']
+sesion.cambiar_usuario(user_actual)
+es_admin = sesion.es_admin
 
 st.sidebar.divider()
-st.sidebar.info(f"Conectado como: **{user_actual}**")
+st.sidebar.info(f"Conectado como: **{user_actual}** · {hogar.nombre}")
 if es_admin:
     st.sidebar.success("Modo Administrador Activo")
 
+if cola_envio is not None:
+    estado_cola = replica.estado() if replica is not None else cola.estado()
+    if estado_cola['ultimo_error']:
+        st.sidebar.error(f"🔴 Sin conexión con la hoja ({estado_cola['pendientes']} cambios en cola). "
+                         f"Reintento en {estado_cola['reintento_en']:.0f}s")
+        if replica is not None:
+            st.sidebar.caption("Se sigue trabajando con la copia local; los cambios se enviarán al volver.")
+    elif estado_cola['pendientes']:
+        st.sidebar.warning(f"🟡 Sincronizando {estado_cola['pendientes']} cambios...")
+    elif replica is not None and estado_cola['segundos_desde_sincronizacion'] is not None:
+        st.sidebar.caption(f"🟢 Todo sincronizado (hoja consultada hace "
+                           f"{estado_cola['segundos_desde_sincronizacion']:.0f}s)")
+    else:
+        st.sidebar.caption("🟢 Todo sincronizado")
+    if estado_cola['descartados']:
+        st.sidebar.caption(f"⚠️ {estado_cola['descartados']} cambios descartados por conflicto con otra sesión")
+
+# Solo se pintan los widgets de la página visible de cada lista
+st.sidebar.divider()
+busqueda = st.sidebar.text_input("🔎 Buscar tarea")
+tam_pagina = st.sidebar.selectbox("Tareas por página", [10, 25, 50, 100], index=1)
+
+def pagina_visible(clave, tabla):
+    """Aplica la búsqueda y devuelve solo la página actual de 'tabla'."""
+    tabla = filtrar_por_texto(tabla, busqueda)
+    n_paginas = numero_paginas(len(tabla), tam_pagina)
+    pagina = 1
+    if n_paginas > 1:
+        pagina = st.number_input(f"Página (de {n_paginas})", min_value=1, max_value=n_paginas,
+                                 value=1, key=f"pag_{clave}")
+    return paginar(tabla, pagina, tam_pagina)
+
 # ==========================================
-# 4. LÓGICA DE NEGOCIO (CONTADORES BLINDADOS)
+# 4. SECCIONES QUE SE REPINTAN SOLAS
 # ==========================================
-df = st.session_state.df
+# Cada sección de la página es un st.fragment: un clic dentro de ella vuelve
+# a ejecutar solo esa función, no el script entero (estilo, barra lateral,
+# las demás listas...). Por eso cada sección pide sus vistas a la sesión en
+# el momento: el resto de variables del script son las de la última
+# ejecución completa. Si un cambio se ve también en otras secciones,
+# refrescar() pide la recarga completa.
+
+def seccion(nombre):
+    """st.fragment medido como la parte 'nombre' de la recarga.
 
-def obtener_stock_real(df_actual, nombre_tarea):
-    """Calcula el stock restando las filas puntuales de la fila maestra."""
-    maestra = df_actual[(df_actual['Tarea'] == nombre_tarea) & (df_actual['Frecuencia'] != 'Puntual')]
-    if maestra.empty: return 0
-    total_objetivo = int(maestra.iloc[0]['Cantidad'])
-    asignadas = len(df_actual[(df_actual['Tarea'] == nombre_tarea) & (df_actual['Frecuencia'] == 'Puntual')])
-    return max(0, total_objetivo - asignadas)
+    Cuando el fragmento se ejecuta solo, la recarga del script ya está
+    cerrada: se mide como una recarga aparte que solo tiene esta sección.
+    """
+    def decorador(funcion):
+        @st.fragment
+        def envoltura():
+            recarga = st.session_state.get('recarga')
+            if recarga is not None and not recarga.terminada:
+                instr.seccion(nombre)
+                funcion()
+                return
+            st.session_state.recarga = instr.iniciar_recarga(anterior=recarga)
+            st.session_state.fragmento = nombre
+            instr.contar('recargas_de_fragmento')
+            try:
+                instr.seccion(nombre)
+                funcion()
+            finally:
+                st.session_state.fragmento = None
+                instr.terminar_recarga()
+        return envoltura
+    return decorador
 
-# Filtrado de tareas
-libres_total = df[(df['Responsable'] == 'Sin asignar') & (df['Para'].isin(filtro_grupo))]
-mis_pendientes = df[(df['Responsable'] == user_actual) & (df['Estado'] == 'Pendiente')]
-mis_finalizadas = df[(df['Responsable'] == user_actual) & (df['Estado'] == 'Hecho')]
+def refrescar(*secciones):
+    """Tras un cambio: repinta solo el fragmento en curso si el cambio no se ve en otras secciones.
+
+    El resumen no cuenta: se pone al día en la siguiente recarga completa.
+    """
+    if st.session_state.get('fragmento') is not None and set(secciones) <= {st.session_state.fragmento}:
+        st.rerun(scope="fragment")
+    st.rerun()
 
 # ==========================================
 # 5. INTERFAZ PRINCIPAL
@@ -86,87 +231,66 @@ mis_finalizadas = df[(df['Responsable'] == user_actual) & (df['Estado'] == 'Hech
 st.title("🏠 GESTI Hogar PRO 6.9")
 
 # --- SECCIÓN A: TAREAS DISPONIBLES ---
-st.header(f"📌 Tareas Libres")
-
-if libres_total.empty:
-    st.success("🎉 ¡Todo bajo control!")
-else:
-    # Solo mostramos tareas que tengan stock o sean normales
-    for i, row in libres_total.iterrows():
-        stock_disponible = 1 # Valor por defecto para tareas normales
-        
-        if row['Tipo'] in ['Contador', 'Multi-Franja']:
-            # Solo procesamos la fila MAESTRA en esta sección
-            if row['Frecuencia'] == 'Puntual': continue 
-            stock_disponible = obtener_stock_real(df, row['Tarea'])
-            if stock_disponible <= 0: continue
-
-        with st.container():
-            c_info, c_btns = st.columns([2, 3])
-            with c_info:
-                badge = "🔢" if row['Tipo'] in ['Contador', 'Multi-Franja'] else "📋"
-                txt = f"{badge} **{row['Tarea']}**"
-                if row['Tipo'] in ['Contador', 'Multi-Franja']:
-                    txt += f"  \n*(Disponibles: {stock_disponible})*"
-                st.write(txt)
-            
-            with c_btns:
-                f1, f2, f3, f4 = st.columns(4)
-                franjas = [("Mañana", f1), ("Mediodía", f2), ("Tarde", f3), ("Noche", f4)]
-                for f_nombre, col_bt in franjas:
-                    if col_bt.button(f_nombre, key=f"asig_{i}_{f_nombre}"):
-                        df_temp = st.session_state.df.copy()
-                        nueva_tarea = pd.DataFrame([{
-                            'ID': df_temp['ID'].max() + 1,
-                            'Tarea': row['Tarea'],
-                            'Frecuencia': 'Puntual',
-                            'Tipo': row['Tipo'],
-                            'Para': row['Para'],
-                            'Responsable': user_actual,
-                            'Estado': 'Pendiente',
-                            'Franja': f_nombre,
-                            'Cantidad': 1
-                        }])
-                        # Si es tarea normal, quitamos la original. Si es contador, la dejamos (ya que restamos por cálculo)
-                        if row['Tipo'] not in ['Contador', 'Multi-Franja']:
-                            df_temp = df_temp.drop(i)
-                        
-                        df_temp = pd.concat([df_temp, nueva_tarea], ignore_index=True)
-                        if guardar_datos(df_temp): st.rerun()
+@seccion("ui_libres")
+def seccion_libres():
+    st.header(f"📌 Tareas Libres")
+    # La vista de libres la mantiene el almacén: cuesta lo que ocupa, no lo que
+    # ocupa la tabla (y trae stock, badge y texto)
+    libres_total = sesion.libres()
+
+    if st.session_state.get('sin_datos'):
+        st.warning("⚠️ No se han podido cargar las tareas. Vuelve a intentarlo en unos segundos.")
+    elif libres_total.empty:
+        st.success("🎉 ¡Todo bajo control!")
+    else:
+        # Solo se pintan widgets: qué filas mostrar y su texto ya viene calculado
+        for _, row in pagina_visible("libres", libres_total).iterrows():
+            with st.container():
+                c_info, c_btns = st.columns([2, 3])
+                with c_info:
+                    st.write(row['Texto'])
+
+                with c_btns:
+                    f1, f2, f3, f4 = st.columns(4)
+                    franjas = [("Mañana", f1), ("Mediodía", f2), ("Tarde", f3), ("Noche", f4)]
+                    for f_nombre, col_bt in franjas:
+                        if col_bt.button(f_nombre, key=f"asig_{row['ID']}_{f_nombre}"):
+                            if guardar_datos(lambda: sesion.asignar(row['ID'], f_nombre)):
+                                refrescar("ui_libres", "ui_mi_actividad")
+
+seccion_libres()
 
 # --- SECCIÓN B: MI ACTIVIDAD ---
-st.divider()
-col_pend, col_fin = st.columns(2)
-
-with col_pend:
-    st.header(f"📋 Mis Pendientes ({len(mis_pendientes)})")
-    for i, row in mis_pendientes.iterrows():
-        with st.expander(f"🔹 {row['Tarea']} ({row['Franja']})", expanded=True):
-            c_h, c_l = st.columns(2)
-            if c_h.button("✅ Hecho", key=f"h_{i}"):
-                df_temp = st.session_state.df.copy()
-                df_temp.at[i, 'Estado'] = 'Hecho'
-                if guardar_datos(df_temp): st.rerun()
-            if c_l.button("🔓 Liberar", key=f"l_{i}"):
-                df_temp = st.session_state.df.copy()
-                if row['Frecuencia'] == 'Puntual' and row['Tipo'] not in ['Contador', 'Multi-Franja']:
-                    # Si era normal y la liberamos, vuelve a estar sin asignar (pero la fila ya se borró al asignar, hay que recrearla o marcarla)
-                    df_temp.at[i, 'Responsable'], df_temp.at[i, 'Franja'] = 'Sin asignar', '-'
-                else:
-                    df_temp = df_temp.drop(i)
-                if guardar_datos(df_temp): st.rerun()
-
-with col_fin:
-    st.header(f"✨ Mis Finalizadas ({len(mis_finalizadas)})")
-    for i, row in mis_finalizadas.iterrows():
-        c_txt, c_undo = st.columns([3, 1])
-        c_txt.write(f"🟢 **{row['Tarea']}**")
-        if c_undo.button("🔄 Undo", key=f"u_{i}"):
-            df_temp = st.session_state.df.copy()
-            df_temp.at[i, 'Estado'] = 'Pendiente'
-            if guardar_datos(df_temp): st.rerun()
+@seccion("ui_mi_actividad")
+def seccion_mi_actividad():
+    st.divider()
+    mis_pendientes = sesion.pendientes()
+    mis_finalizadas = sesion.finalizadas()
+    col_pend, col_fin = st.columns(2)
+
+    with col_pend:
+        st.header(f"📋 Mis Pendientes ({len(mis_pendientes)})")
+        for _, row in pagina_visible("pendientes", mis_pendientes).iterrows():
+            with st.expander(f"🔹 {row['Tarea']} ({row['Franja']})", expanded=True):
+                c_h, c_l = st.columns(2)
+                if c_h.button("✅ Hecho", key=f"h_{row['ID']}"):
+                    if guardar_datos(lambda: sesion.completar(row['ID'])): refrescar("ui_mi_actividad")
+                if c_l.button("🔓 Liberar", key=f"l_{row['ID']}"):
+                    # La unidad vuelve a la lista de libres
+                    if guardar_datos(lambda: sesion.liberar(row['ID'])): refrescar("ui_mi_actividad", "ui_libres")
+
+    with col_fin:
+        st.header(f"✨ Mis Finalizadas ({len(mis_finalizadas)})")
+        for _, row in pagina_visible("finalizadas", mis_finalizadas).iterrows():
+            c_txt, c_undo = st.columns([3, 1])
+            c_txt.write(f"🟢 **{row['Tarea']}**")
+            if c_undo.button("🔄 Undo", key=f"u_{row['ID']}"):
+                if guardar_datos(lambda: sesion.reabrir(row['ID'])): refrescar("ui_mi_actividad")
+
+seccion_mi_actividad()
 
 # --- SECCIÓN C: RECOMENDACIONES (SUEÑO, HIGIENE, ALIMENTACIÓN, MENTALIDAD) ---
+instr.seccion("ui_recomendaciones")
 st.divider()
 st.header("💡 Recomendaciones para un Día Pro")
 r1, r2, r3, r4 = st.columns(4)
@@ -192,20 +316,35 @@ with r4:
     st.markdown('<div class="advice-box"><b>Agradecimiento:</b> Anota 3 cosas buenas del día antes de dormir para entrenar el optimismo.</div>', unsafe_allow_html=True)
 
 # --- SECCIÓN D: PANEL ADMIN ---
-if es_admin:
+@seccion("ui_admin")
+def seccion_admin():
     st.divider()
     with st.expander("⚙️ PANEL DE ADMINISTRACIÓN AVANZADO"):
-        t1, t2, t3 = st.tabs(["🔄 Reseteos", "➕ Nueva Tarea", "🔢 Ajustar Objetivos"])
+        t1, t2, t3, t4, t5 = st.tabs(["🔄 Reseteos", "➕ Nueva Tarea", "🔢 Ajustar Objetivos", "📜 Historial",
+                                      "⏱️ Rendimiento"])
         
         with t1:
             c1, c2 = st.columns(2)
             if c1.button("🔄 MODO 1: Recarga Forzada (Mantiene todo)"):
-                st.session_state.df = cargar_datos()
+                cargar_datos(forzar=True)
                 st.rerun()
             if c2.button("💾 MODO 2: Reinicio Próximo Día (Limpia y Sincroniza)"):
-                df_reset = st.session_state.df[st.session_state.df['Frecuencia'] != 'Puntual'].copy()
-                df_reset['Responsable'], df_reset['Estado'], df_reset['Franja'] = 'Sin asignar', 'Pendiente', '-'
-                if guardar_datos(df_reset): st.balloons(); st.rerun()
+                # Archiva lo hecho en el historial antes de dejarlo todo libre
+                if guardar_datos(sesion.reinicio_diario):
+                    st.balloons(); st.rerun()
+            if planificador is not None:
+                estado_plan = planificador.estado()
+                st.caption(f"⏰ Reinicio automático: próximo el {estado_plan['proximo']:%d/%m a las %H:%M}"
+                           + (f" · último día reiniciado: {estado_plan['ultimo_dia']:%d/%m}"
+                              if estado_plan['ultimo_dia'] else ""))
+                if estado_plan['ultimo_error']:
+                    st.error(f"❌ El último reinicio automático falló: {estado_plan['ultimo_error']}")
+            if gestor is not None:
+                m = gestor.metricas()
+                st.caption(f"🔌 API de Sheets: {m['peticiones']} peticiones, {m['reintentos']} reintentos, "
+                           f"{m['errores_429']} límites de cuota, circuito {m['circuito']}, "
+                           f"conexiones {m['en_uso']}/{m['conexiones']} (máx. {m['tam_pool']}), "
+                           f"latencia p95 {m['latencia_p95_ms']:.0f} ms")
 
         with t2:
             with st.form("new_task"):
@@ -213,22 +352,85 @@ if es_admin:
                 n_p = st.selectbox("Para", ["Todos", "Padres", "Hijos"])
                 n_tp = st.selectbox("Tipo", ["Normal", "Contador", "Multi-Franja"])
                 n_c = st.number_input("Cantidad Objetivo", value=1)
+                n_f = st.selectbox("Frecuencia", ["Diaria", "Semanal", "Mensual", "Cada N días"])
+                c_sem, c_mes, c_cada = st.columns(3)
+                n_dias = c_sem.multiselect("Días (Semanal)", DIAS_SEMANA, default=["L"])
+                n_dia_mes = c_mes.number_input("Día del mes (Mensual)", min_value=1, max_value=31, value=1)
+                n_cada = c_cada.number_input("Cada cuántos días", min_value=1, value=2)
                 if st.form_submit_button("Guardar"):
-                    nueva_fila = pd.DataFrame([{'ID': df['ID'].max()+1, 'Tarea': n_t, 'Frecuencia': 'Diaria', 'Tipo': n_tp, 'Para': n_p, 'Responsable': 'Sin asignar', 'Estado': 'Pendiente', 'Franja': '-', 'Cantidad': n_c}])
-                    if guardar_datos(pd.concat([df, nueva_fila])): st.rerun()
+                    regla = {
+                        "Diaria": Regla('diaria'),
+                        "Semanal": Regla('semanal', dias=sorted(DIAS_SEMANA.index(d) for d in n_dias) or [0]),
+                        "Mensual": Regla('mensual', dia=int(n_dia_mes)),
+                        "Cada N días": Regla('cada', n=int(n_cada), ancla=sesion.dia()),
+                    }[n_f]
+                    if guardar_datos(lambda: sesion.nueva_tarea(n_t, n_p, n_tp, n_c, regla)):
+                        refrescar("ui_admin", "ui_libres")
 
         with t3:
             st.write("Ajusta cuántas veces hay que hacer cada tarea hoy:")
+            df = sesion.tabla()
             contadores = df[df['Tipo'].isin(['Contador', 'Multi-Franja']) & (df['Frecuencia'] != 'Puntual')]
-            for idx, row in contadores.iterrows():
+            for _, row in pagina_visible("objetivos", contadores).iterrows():
                 col_n, col_v = st.columns([3, 1])
-                nuevo_val = col_v.number_input(f"{row['Tarea']}", value=int(row['Cantidad']), key=f"adj_{idx}")
+                nuevo_val = col_v.number_input(f"{row['Tarea']}", value=int(row['Cantidad']), key=f"adj_{row['ID']}")
                 if nuevo_val != int(row['Cantidad']):
-                    df_temp = st.session_state.df.copy()
-                    df_temp.at[idx, 'Cantidad'] = nuevo_val
-                    if guardar_datos(df_temp): st.rerun()
+                    if guardar_datos(lambda: sesion.ajustar_cantidad(row['ID'], nuevo_val)):
+                        refrescar("ui_admin", "ui_libres")
+
+        with t4:
+            dias_hist = st.number_input("Últimos días", min_value=1, value=30, step=7)
+            # Guardado en el historial hasta que se archive algo nuevo: no se relee en cada recarga
+            hist = historial.ultimos_dias(int(dias_hist))
+            if hist.empty:
+                st.info("Aún no hay días cerrados en el historial.")
+            else:
+                st.bar_chart(hist['Responsable'].value_counts())
+                st.dataframe(pagina_visible("historial", hist.sort_values('Momento', ascending=False)),
+                             use_container_width=True, hide_index=True)
+
+        with t5:
+            if not instr.activa:
+                st.info("La instrumentación está apagada (GESTI_INSTRUMENTACION=0).")
+            else:
+                resumen_instr = instr.resumen()
+                st.write("Tiempo por parte de la recarga (todo el proceso):")
+                st.dataframe(pd.DataFrame.from_dict(resumen_instr['tramos'], orient='index').round(2),
+                             use_container_width=True)
+                if resumen_instr['contadores']:
+                    st.write("Contadores del backend:")
+                    st.dataframe(pd.Series(resumen_instr['contadores'], name='Total'), use_container_width=True)
+                ultimas = [r for r in instr.recargas if r.terminada][-1:]
+                if ultimas:
+                    st.write(f"Última recarga completa: {ultimas[0].duracion * 1000:.1f} ms")
+                    st.dataframe(pd.DataFrame(ultimas[0].a_dict()['tramos']).round(2), hide_index=True,
+                                 use_container_width=True)
+                c_json, c_prom, c_perf = st.columns(3)
+                c_json.download_button("⬇️ JSON", instr.a_json(), file_name="rendimiento.json",
+                                       mime="application/json")
+                c_prom.download_button("⬇️ Prometheus", instr.a_prometheus(), file_name="rendimiento.prom",
+                                       mime="text/plain")
+                if c_perf.button("🔬 Perfilar la próxima recarga"):
+                    st.session_state.perfilar = True
+                    st.rerun()
+                c_perf.caption("El perfil aparece aquí en la recarga siguiente a la perfilada.")
+                if st.session_state.get('ultimo_perfil'):
+                    with st.expander("cProfile de la última recarga perfilada"):
+                        st.code(st.session_state.ultimo_perfil)
+
+if es_admin:
+    seccion_admin()
 
 # --- RESUMEN ---
-st.divider()
-st.subheader("📊 Resumen General")
-st.dataframe(st.session_state.df[['Tarea', 'Responsable', 'Franja', 'Estado', 'Cantidad']], use_container_width=True, hide_index=True)
+@seccion("ui_resumen")
+def seccion_resumen():
+    st.divider()
+    c_tit, c_act = st.columns([5, 1])
+    c_tit.subheader("📊 Resumen General")
+    # Los clics de las otras secciones no lo repintan; este botón sí (solo a él)
+    c_act.button("🔄 Actualizar", key="actualizar_resumen")
+    resumen = pagina_visible("resumen", sesion.tabla())
+    st.dataframe(resumen[['Tarea', 'Responsable', 'Franja', 'Estado', 'Cantidad']], use_container_width=True, hide_index=True)
+
+seccion_resumen()
+instr.terminar_recarga()
@@ -0,0 +1,65 @@
+"""Simula muchas sesiones arrancando contra la caché compartida de lectura.
+
+También comprueba que una escritura de otro proceso entre dos guardados
+propios no se da por vista: la caché de este proceso la acaba leyendo.
+
+Uso: python benchmarks/bench_cache.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from persistencia import BackendMemoria, CacheTabla, calcular_delta  # noqa: E402
+from datos_sinteticos import tabla_sintetica  # noqa: E402
+
+LATENCIA = 0.02
+SESIONES = 200
+
+
+def sin_cache(backend):
+    t0 = time.perf_counter()
+    for _ in range(SESIONES):
+        backend.leer()
+    return time.perf_counter() - t0
+
+
+def con_cache(backend):
+    cache = CacheTabla(backend, comprobar_cada=0.0)
+    t0 = time.perf_counter()
+    for n in range(SESIONES):
+        cache.obtener()
+        if n % 50 == 49:
+            # Otra sesión guarda: la caché se actualiza sin volver a leer
+            df = cache.obtener()
+            df_nuevo = df.copy()
+            df_nuevo.at[0, 'Estado'] = 'Hecho' if df.at[0, 'Estado'] == 'Pendiente' else 'Pendiente'
+            delta = calcular_delta(df, df_nuevo)
+            backend.aplicar_delta(delta)
+            cache.registrar_escritura(delta)
+    return time.perf_counter() - t0, cache
+
+
+def escritura_ajena():
+    """Dos procesos (dos cachés) cargan y luego guardan uno tras otro; True si el segundo ve el cambio del primero."""
+    backend = BackendMemoria(tabla_sintetica(200))
+    caches = [CacheTabla(backend, comprobar_cada=3600.0) for _ in range(2)]
+    tablas = [c.obtener() for c in caches]
+    for fila, (cache, df) in enumerate(zip(caches, tablas)):
+        df_nuevo = df.copy()
+        df_nuevo.at[fila, 'Cantidad'] = 90 + fila
+        delta = calcular_delta(df, df_nuevo)
+        backend.aplicar_delta(delta)
+        cache.registrar_escritura(delta)
+    return list(caches[1].obtener()['Cantidad'][:2]) == [90, 91]
+
+
+if __name__ == "__main__":
+    t_sin = sin_cache(BackendMemoria(tabla_sintetica(5_000), LATENCIA))
+    backend = BackendMemoria(tabla_sintetica(5_000), LATENCIA)
+    t_con, cache = con_cache(backend)
+    print(f"{SESIONES} sesiones sin caché: {t_sin:.3f}s")
+    print(f"{SESIONES} sesiones con caché: {t_con:.3f}s "
+          f"(lecturas reales: {backend.lecturas}, {cache.estadisticas()})")
+    assert escritura_ajena(), "la caché ha dado por vista una escritura de otro proceso"
+    print("escritura de otro proceso entre dos guardados: releída")
@@ -0,0 +1,109 @@
+"""Prueba de carga del núcleo (servicio.py) sin Streamlit.
+
+Varios usuarios de un mismo hogar, cada uno en su hilo con su Sesion, hacen
+lo que haría la app: mirar las libres, coger una, terminarla, deshacerla,
+soltarla... contra el backend en memoria, SQLite plano y el modelo
+normalizado. Mide operaciones por segundo y latencia por operación, y al
+final comprueba que ningún contador tiene más asignaciones que su objetivo y
+que una sesión nueva ve lo mismo que el backend.
+Uso: python benchmarks/bench_carga.py [operaciones_por_usuario]
+"""
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from almacen import TareaNoDisponible  # noqa: E402
+from esquema import aplicar_esquema, quitar_esquema  # noqa: E402
+from hogares import Hogar  # noqa: E402
+from logica import TIPOS_CONTADOR  # noqa: E402
+from persistencia import ConflictoConcurrencia  # noqa: E402
+from servicio import Configuracion, Sesion, crear_inquilino  # noqa: E402
+from datos_sinteticos import FRANJAS, USUARIOS, mismas_filas, tabla_sintetica  # noqa: E402
+
+FILAS = 2_000
+OPERACIONES = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000
+# (operación, peso)
+MEZCLA = [('libres', 30), ('asignar', 25), ('completar', 15), ('reabrir', 5), ('liberar', 10), ('pendientes', 15)]
+
+
+def usuario(sesion, semilla, tiempos, fallos):
+    rnd = random.Random(semilla)
+    nombres, pesos = zip(*MEZCLA)
+    for op in rnd.choices(nombres, pesos, k=OPERACIONES):
+        t0 = time.perf_counter()
+        try:
+            if op == 'libres':
+                sesion.libres()
+            elif op == 'pendientes':
+                sesion.pendientes()
+            elif op == 'asignar':
+                libres = sesion.libres()
+                if not libres.empty:
+                    sesion.asignar(rnd.choice(list(libres['ID'])), rnd.choice(FRANJAS))
+            else:
+                filas = sesion.finalizadas() if op == 'reabrir' else sesion.pendientes()
+                if not filas.empty:
+                    getattr(sesion, op)(rnd.choice(list(filas['ID'])))
+        except (TareaNoDisponible, ConflictoConcurrencia):
+            # Otra sesión se ha llevado la tarea: en la app es un aviso
+            fallos[op] += 1
+        tiempos[op].append(time.perf_counter() - t0)
+
+
+def comprobar(inquilino):
+    df = inquilino.backend.leer()
+    maestras = df[(df['Frecuencia'] != 'Puntual') & df['Tipo'].isin(TIPOS_CONTADOR)]
+    objetivo = dict(zip(maestras['Tarea'], maestras['Cantidad'].astype(int)))
+    asignadas = Counter(df.loc[(df['Frecuencia'] == 'Puntual') & df['Tipo'].isin(TIPOS_CONTADOR), 'Tarea'])
+    exceso = sum(max(0, n - objetivo.get(t, 0)) for t, n in asignadas.items() if t in objetivo)
+    nueva = Sesion(inquilino)
+    nueva.cargar(forzar=True)
+    plana = lambda t: quitar_esquema(aplicar_esquema(t))  # noqa: E731
+    return exceso, mismas_filas(plana(nueva.tabla()), plana(df))
+
+
+def medir(conf, tabla):
+    hogar = Hogar('carga', usuarios=USUARIOS)
+    inquilino = crear_inquilino(hogar, conf)
+    inquilino.backend.escribir_todo(tabla)
+    tiempos = defaultdict(list)
+    fallos = Counter()
+    sesiones = [Sesion(inquilino, u) for u in USUARIOS]
+    for s in sesiones:
+        s.al_dia()
+    hilos = [threading.Thread(target=usuario, args=(s, n, tiempos, fallos)) for n, s in enumerate(sesiones)]
+    t0 = time.perf_counter()
+    for h in hilos: h.start()
+    for h in hilos: h.join()
+    total = time.perf_counter() - t0
+    inquilino.cerrar()
+    return tiempos, fallos, total, comprobar(inquilino)
+
+
+def main():
+    # Sin asignaciones de partida: tabla_sintetica no respeta el objetivo de los contadores
+    tabla = tabla_sintetica(FILAS, ratio_contador=0.3, ratio_puntual=0)
+    print(f"{len(USUARIOS)} usuarios x {OPERACIONES} operaciones sobre {FILAS} filas")
+    with tempfile.TemporaryDirectory() as carpeta:
+        comun = dict(hora_reinicio='', ruta_historial=os.path.join(carpeta, 'historial'))
+        for nombre, conf in (
+                ("memoria", Configuracion(backend='memoria', **comun)),
+                ("sqlite", Configuracion(backend='sqlite', ruta_sqlite=os.path.join(carpeta, 'p.db'), **comun)),
+                ("normalizado", Configuracion(backend='normalizado', migrar_desde='',
+                                              ruta_sqlite=os.path.join(carpeta, 'n.db'), **comun))):
+            tiempos, fallos, total, (exceso, iguales) = medir(conf, tabla)
+            n_ops = sum(len(t) for t in tiempos.values())
+            detalle = ", ".join(f"{op} {1000 * sum(t) / len(t):.2f} ms" for op, t in sorted(tiempos.items()))
+            print(f"{nombre:12} {n_ops / total:7.0f} op/s ({sum(fallos.values())} sin tarea) · {detalle}")
+            assert exceso == 0, f"{exceso} asignaciones de más"
+            assert iguales, "la sesión nueva no ve lo mismo que el backend"
+    print("ningún contador por encima de su objetivo; sesión nueva = backend")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Latencia de un clic con escritura síncrona frente a la cola diferida.
+
+Simula una hoja lenta (latencia fija por llamada) y mide cuánto espera el
+usuario en cada clic, cuántas llamadas llegan al backend y que al final la
+hoja queda igual que el almacén local. Con la hoja caída, vaciar() tiene que
+rendirse al acabar su plazo sin que el hilo de envío gaste CPU esperando.
+Uso: python benchmarks/bench_cola.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from almacen import AlmacenTareas, ejecutar_con_reintentos  # noqa: E402
+from cola import ColaEscritura, ejecutar_diferido  # noqa: E402
+from persistencia import AsignadorIDs, BackendMemoria  # noqa: E402
+from datos_sinteticos import mismas_filas, tabla_sintetica  # noqa: E402
+
+FILAS = 2_000
+CLICS = 100
+LATENCIA = 0.05
+
+
+def clics(almacen, guardar):
+    ids = list(almacen.tabla()['ID'])[:CLICS]
+    tiempos = []
+    for id_tarea in ids:
+        t0 = time.perf_counter()
+        guardar(lambda a, i=id_tarea: a.completar(i))
+        tiempos.append(time.perf_counter() - t0)
+    tiempos.sort()
+    return sum(tiempos) / len(tiempos), tiempos[int(len(tiempos) * 0.95)]
+
+
+class BackendCaido(BackendMemoria):
+    def aplicar_delta(self, delta, clave='ID'):
+        self.llamadas += 1
+        raise ConnectionError("Sin conexión con la hoja")
+
+
+def vaciar_con_hoja_caida(df):
+    """(vaciar() ha devuelto, segundos de CPU del proceso mientras esperaba)."""
+    almacen = AlmacenTareas(df, ids=AsignadorIDs())
+    with tempfile.TemporaryDirectory() as tmp:
+        cola = ColaEscritura(BackendCaido(df), ruta=os.path.join(tmp, 'cola.jsonl'), intervalo=0.1,
+                             espera_base=5.0)
+        ejecutar_diferido(almacen, lambda a: a.completar(int(df['ID'].iloc[0])), cola)
+        time.sleep(0.3)  # primer intento fallido: el siguiente es dentro de unos segundos
+        cpu = time.process_time()
+        vaciado = cola.vaciar(timeout=1.0)
+        cpu = time.process_time() - cpu
+    return vaciado, cpu
+
+
+def igual(backend, almacen):
+    return mismas_filas(backend.leer().sort_values('ID'), almacen.tabla().sort_values('ID'))
+
+
+def main():
+    df = tabla_sintetica(FILAS, ratio_puntual=0.0)
+
+    backend = BackendMemoria(df, latencia=LATENCIA)
+    almacen = AlmacenTareas(df, ids=AsignadorIDs())
+
+    def sincrono(op):
+        ejecutar_con_reintentos(almacen, op, backend, lambda: almacen)
+    media_s, p95_s = clics(almacen, sincrono)
+    print(f"síncrono:  media {media_s * 1000:7.1f} ms  p95 {p95_s * 1000:7.1f} ms  "
+          f"llamadas {backend.llamadas}  coincide {igual(backend, almacen)}")
+
+    backend = BackendMemoria(df, latencia=LATENCIA)
+    almacen = AlmacenTareas(df, ids=AsignadorIDs())
+    with tempfile.TemporaryDirectory() as tmp:
+        cola = ColaEscritura(backend, ruta=os.path.join(tmp, 'cola.jsonl'), intervalo=0.5)
+        media_d, p95_d = clics(almacen, lambda op: ejecutar_diferido(almacen, op, cola))
+        cola.vaciar()
+        cola.detener()
+    print(f"diferido:  media {media_d * 1000:7.1f} ms  p95 {p95_d * 1000:7.1f} ms  "
+          f"llamadas {backend.llamadas}  lotes {cola.lotes}  coincide {igual(backend, almacen)}")
+    print(f"mejora media ×{media_s / media_d:.0f}")
+
+    vaciado, cpu = vaciar_con_hoja_caida(df)
+    print(f"hoja caída: vaciar() = {vaciado}, {cpu * 1000:.0f} ms de CPU esperando 1 s")
+    assert not vaciado and cpu < 0.3, "el hilo de envío no debe dar vueltas mientras espera el reintento"
+
+
+if __name__ == '__main__':
+    main()
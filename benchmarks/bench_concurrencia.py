@@ -0,0 +1,104 @@
+"""Varias sesiones asignando a la vez contra la hoja falsa.
+
+Compara 'gana el último' (reescritura completa, como antes), que pierde
+asignaciones confirmadas al usuario, con las escrituras condicionadas del
+almacén: tiempo, asignaciones perdidas y exceso de stock de cada una. Que
+las condicionadas no pierden ni sobreasignan nada lo comprueba
+tests/test_almacen.py.
+Uso: python benchmarks/bench_concurrencia.py
+"""
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from almacen import AlmacenTareas, TareaNoDisponible, ejecutar_con_reintentos  # noqa: E402
+from logica import TIPOS_CONTADOR  # noqa: E402
+from persistencia import AsignadorIDs, BackendMemoria, ConflictoConcurrencia  # noqa: E402
+from datos_sinteticos import USUARIOS, tabla_sintetica  # noqa: E402
+
+SESIONES = 8
+CLICS = 60
+LATENCIA = 0.001
+
+
+def sobreasignaciones(df):
+    """Unidades asignadas por encima del objetivo + tareas normales repetidas."""
+    puntuales = df[df['Frecuencia'] == 'Puntual']
+    maestras = df[df['Frecuencia'] != 'Puntual'].drop_duplicates('Tarea').set_index('Tarea')
+    exceso = 0
+    for (tarea, tipo), n in Counter(zip(puntuales['Tarea'], puntuales['Tipo'])).items():
+        limite = int(maestras.at[tarea, 'Cantidad']) if tipo in TIPOS_CONTADOR else 1
+        exceso += max(0, n - limite)
+    return exceso
+
+
+def perdurables(df):
+    return int((df['Frecuencia'] == 'Puntual').sum())
+
+
+def sesion_ingenua(backend, stats, usuario, rnd):
+    for _ in range(CLICS):
+        df = backend.leer()
+        libres = df[df['Responsable'] == 'Sin asignar']
+        if libres.empty:
+            return
+        i = rnd.choice(list(libres.index))
+        row = df.loc[i]
+        nueva = pd.DataFrame([{**row.to_dict(), 'ID': df['ID'].max() + 1, 'Frecuencia': 'Puntual',
+                               'Responsable': usuario, 'Franja': 'Tarde', 'Cantidad': 1}])
+        if row['Tipo'] not in TIPOS_CONTADOR:
+            df = df.drop(i)
+        backend.escribir_todo(pd.concat([df, nueva], ignore_index=True))
+        stats['ok'] += 1
+
+
+def sesion_condicionada(backend, ids, stats, usuario, rnd):
+    recargar = lambda: AlmacenTareas(backend.leer(), ids=ids)  # noqa: E731
+    almacen = recargar()
+    for _ in range(CLICS):
+        df = almacen.tabla()
+        libres = df[(df['Responsable'] == 'Sin asignar') & (df['Frecuencia'] != 'Puntual')]
+        if libres.empty:
+            return
+        id_tarea = rnd.choice(list(libres['ID']))
+        try:
+            almacen, _ = ejecutar_con_reintentos(
+                almacen, lambda a: a.asignar(id_tarea, usuario, 'Tarde'), backend, recargar)
+            stats['ok'] += 1
+        except (TareaNoDisponible, ConflictoConcurrencia):
+            stats['rechazadas'] += 1
+            almacen = recargar()
+
+
+def lanzar(objetivo, *args):
+    hilos = [threading.Thread(target=objetivo, args=(*args, USUARIOS[n % len(USUARIOS)], random.Random(n)))
+             for n in range(SESIONES)]
+    t0 = time.perf_counter()
+    for h in hilos: h.start()
+    for h in hilos: h.join()
+    return time.perf_counter() - t0
+
+
+if __name__ == "__main__":
+    df = tabla_sintetica(300, ratio_contador=0.5, ratio_puntual=0.0)
+
+    backend = BackendMemoria(df, latencia=LATENCIA)
+    stats = Counter()
+    t = lanzar(sesion_ingenua, backend, stats)
+    perdidas = stats['ok'] - perdurables(backend.df)
+    print(f"Gana el último: {t:.2f}s, {stats['ok']} clics OK, {perdidas} asignaciones perdidas, "
+          f"exceso: {sobreasignaciones(backend.df)}")
+
+    backend = BackendMemoria(df, latencia=LATENCIA)
+    stats = Counter()
+    t = lanzar(sesion_condicionada, backend, AsignadorIDs(backend), stats)
+    perdidas = stats['ok'] - perdurables(backend.df)
+    exceso = sobreasignaciones(backend.df)
+    print(f"Condicionado:   {t:.2f}s, {stats['ok']} clics OK, {perdidas} asignaciones perdidas, "
+          f"exceso: {exceso} ({stats['rechazadas']} rechazadas por conflicto o sin stock)")
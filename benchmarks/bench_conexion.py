@@ -0,0 +1,126 @@
+"""GestorConexiones contra un servidor local con latencia, cuota y errores 429.
+
+Compara muchas sesiones llamando a la vez:
+- directo: sin cuota ni reintentos (lo que hacía la app: el 429 llega al usuario);
+- gestor:  pool acotado, cubo de tokens ajustado a la cuota y reintentos con jitter.
+Después tira el servidor (503) y comprueba que el disyuntor corta las
+llamadas enseguida, que una prueba fallida lo vuelve a abrir y que se
+cierra cuando el servidor se recupera.
+Uso: python benchmarks/bench_conexion.py
+"""
+import os
+import sys
+import threading
+import time
+import urllib.error
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from conexion import CircuitoAbierto, GestorConexiones  # noqa: E402
+from servidor_falso import ClienteHTTP, ServidorFalso  # noqa: E402
+
+CUOTA = 40          # peticiones por segundo que admite el servidor
+SESIONES = 16
+PETICIONES = 15     # por sesión
+TAM_POOL = 4
+
+
+def en_paralelo(funcion):
+    errores = []
+
+    def sesion():
+        for n in range(PETICIONES):
+            try:
+                funcion(n)
+            except Exception as e:
+                errores.append(e)
+    hilos = [threading.Thread(target=sesion) for _ in range(SESIONES)]
+    t0 = time.perf_counter()
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    return time.perf_counter() - t0, errores
+
+
+def directo(servidor):
+    cliente = ClienteHTTP(servidor.url)
+    return en_paralelo(lambda n: cliente.leer() if n % 4 else cliente.escribir({'n': n}))
+
+
+def con_gestor(servidor):
+    # Un poco por debajo de la cuota del servidor, repartida entre lecturas y escrituras
+    gestor = GestorConexiones(lambda: ClienteHTTP(servidor.url), tam_pool=TAM_POOL,
+                              lecturas_por_minuto=CUOTA * 0.7 * 60, escrituras_por_minuto=CUOTA * 0.2 * 60,
+                              rafaga=5, espera_base=0.05, espera_tope=1.0, intentos=8)
+
+    def llamada(n):
+        with gestor.conexion() as conn:
+            if n % 4:
+                gestor.peticion('lectura', conn.leer)
+            else:
+                gestor.peticion('escritura', lambda: conn.escribir({'n': n}))
+    segundos, errores = en_paralelo(llamada)
+    return segundos, errores, gestor
+
+
+def disyuntor(servidor):
+    gestor = GestorConexiones(lambda: ClienteHTTP(servidor.url), tam_pool=2, espera_base=0.01,
+                              espera_tope=0.05, intentos=2, umbral_fallos=3, enfriamiento=0.5,
+                              lecturas_por_minuto=6000)
+    servidor.caido = True
+    fallos, rechazadas = 0, 0
+    t0 = time.perf_counter()
+    for _ in range(50):
+        try:
+            with gestor.conexion() as conn:
+                gestor.peticion('lectura', conn.leer)
+        except CircuitoAbierto:
+            rechazadas += 1
+        except urllib.error.HTTPError:
+            fallos += 1
+    t_caido = time.perf_counter() - t0
+    llegadas = servidor.errores_503
+    print(f"servidor caído: {fallos} fallos, {rechazadas} rechazadas sin llamar "
+          f"({llegadas} peticiones llegaron al servidor) en {t_caido * 1000:.0f} ms")
+    assert fallos == 3 and rechazadas == 47 and llegadas == 6
+
+    # Pasado el enfriamiento, con el servidor aún caído: la prueba falla sin reintento y se reabre
+    time.sleep(0.6)
+    try:
+        with gestor.conexion() as conn:
+            gestor.peticion('lectura', conn.leer)
+    except urllib.error.HTTPError:
+        pass
+    assert servidor.errores_503 == llegadas + 1 and gestor.metricas()['circuito'] == 'abierto'
+    print("prueba fallida con el servidor caído: una sola petición y el circuito vuelve a abrirse")
+    servidor.caido = False
+    time.sleep(0.6)
+    with gestor.conexion() as conn:
+        gestor.peticion('lectura', conn.leer)
+    assert gestor.metricas()['circuito'] == 'cerrado'
+    print("servidor recuperado: el disyuntor vuelve a cerrarse con la petición de prueba")
+
+
+def main():
+    total = SESIONES * PETICIONES
+    with ServidorFalso(latencia=0.01, cuota_por_segundo=CUOTA, prob_429=0.02) as servidor:
+        t, errores = directo(servidor)
+        print(f"directo: {total} peticiones en {t:.2f}s, {len(errores)} errores para el usuario "
+              f"({servidor.errores_429} respuestas 429)")
+
+    with ServidorFalso(latencia=0.01, cuota_por_segundo=CUOTA, prob_429=0.02) as servidor:
+        t, errores, gestor = con_gestor(servidor)
+        m = gestor.metricas()
+        print(f"gestor:  {total} peticiones en {t:.2f}s, {len(errores)} errores para el usuario "
+              f"({servidor.errores_429} respuestas 429, {m['reintentos']} reintentos)")
+        print(f"         conexiones: {m['conexiones']}/{m['tam_pool']}, espera por cuota: {m['espera_cuota']:.1f}s, "
+              f"latencia media {m['latencia_media_ms']:.1f} ms, p95 {m['latencia_p95_ms']:.1f} ms")
+        assert not errores
+        assert m['peticiones'] == total and m['conexiones'] <= TAM_POOL
+
+    with ServidorFalso(latencia=0.0) as servidor:
+        disyuntor(servidor)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Memoria y filtros con la tabla tal como llega de conn.read() frente al esquema compacto.
+
+Uso: python benchmarks/bench_esquema.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from esquema import aplicar_esquema, quitar_esquema  # noqa: E402
+from datos_sinteticos import mismas_filas, tabla_sintetica  # noqa: E402
+
+REPETICIONES = 50
+# Una casa real repite pocos nombres de tarea; las sintéticas son todas distintas
+TAREAS_DISTINTAS = 300
+
+
+def como_la_hoja(n):
+    df = tabla_sintetica(n)
+    df['Tarea'] = ["Tarea " + str(int(t.split()[-1]) % TAREAS_DISTINTAS) for t in df['Tarea']]
+    # conn.read() devuelve columnas object y guardar_datos hacía fillna("-")
+    return df.astype(object).fillna("-")
+
+
+def filtros(df):
+    """Los filtros de la página de un usuario."""
+    libres = df[(df['Responsable'] == 'Sin asignar') & (df['Para'].isin(['Hijos', 'Todos']))]
+    pendientes = df[(df['Responsable'] == 'Cris') & (df['Estado'] == 'Pendiente')]
+    contadores = df[df['Tipo'].isin(['Contador', 'Multi-Franja']) & (df['Frecuencia'] != 'Puntual')]
+    return libres, pendientes, contadores
+
+
+def medir(funcion, df):
+    t0 = time.perf_counter()
+    for _ in range(REPETICIONES):
+        funcion(df)
+    return (time.perf_counter() - t0) / REPETICIONES * 1000
+
+
+def main():
+    print(f"{'filas':>8} | {'object MB':>9} {'esquema MB':>10} {'×':>5} | {'filtros object':>14} {'esquema':>8} {'×':>5}")
+    for n in (1_000, 10_000, 100_000):
+        crudo = como_la_hoja(n)
+        t0 = time.perf_counter()
+        compacto = aplicar_esquema(crudo)
+        t_carga = (time.perf_counter() - t0) * 1000
+        assert mismas_filas(quitar_esquema(compacto), crudo)
+        mb_crudo = crudo.memory_usage(deep=True).sum() / 1e6
+        mb_compacto = compacto.memory_usage(deep=True).sum() / 1e6
+        t_crudo, t_compacto = medir(filtros, crudo), medir(filtros, compacto)
+        print(f"{n:>8} | {mb_crudo:>9.2f} {mb_compacto:>10.2f} {mb_crudo / mb_compacto:>5.1f} | "
+              f"{t_crudo:>11.2f} ms {t_compacto:>5.2f} ms {t_crudo / t_compacto:>5.1f}   (cargar: {t_carga:.0f} ms)")
+
+
+if __name__ == '__main__':
+    main()
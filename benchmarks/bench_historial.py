@@ -0,0 +1,75 @@
+"""Historial por columnas frente al historial.csv acumulado de las versiones V1b/V1c.
+
+Genera meses de cierres diarios y compara el tamaño en disco y lo que cuesta
+consultar el último mes y el total por persona.
+Uso: python benchmarks/bench_historial.py
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from historial import Historial, hechas_de  # noqa: E402
+from datos_sinteticos import tabla_sintetica  # noqa: E402
+
+DIAS = 365
+FILAS_DIA = 400
+
+
+def tamano(ruta):
+    if os.path.isfile(ruta):
+        return os.path.getsize(ruta)
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, fs in os.walk(ruta) for f in fs)
+
+
+def main():
+    base = tabla_sintetica(FILAS_DIA * 2, ratio_puntual=0.6)
+    base['Estado'] = 'Hecho'
+    hechas = hechas_de(base[base['Frecuencia'] == 'Puntual']).head(FILAS_DIA)
+    inicio = datetime(2025, 10, 1, 22, 0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ruta_csv = os.path.join(tmp, 'historial.csv')
+        historial = Historial(os.path.join(tmp, 'historial'))
+        t_csv = t_col = 0.0
+        for d in range(DIAS):
+            momento = inicio + timedelta(days=d)
+            dia = hechas.assign(ID=hechas['ID'] + d * FILAS_DIA)
+            t0 = time.perf_counter()
+            dia.assign(Fecha=momento).to_csv(ruta_csv, mode='a', header=not os.path.exists(ruta_csv), index=False)
+            t_csv += time.perf_counter() - t0
+            t0 = time.perf_counter()
+            historial.registrar(dia, momento)
+            t_col += time.perf_counter() - t0
+        print(f"{DIAS} días × {FILAS_DIA} filas")
+        print(f"añadir un día:   csv {t_csv / DIAS * 1000:6.2f} ms   columnas {t_col / DIAS * 1000:6.2f} ms")
+        print(f"en disco:        csv {tamano(ruta_csv) / 1e6:6.1f} MB   "
+              f"columnas {tamano(historial.ruta) / 1e6:6.1f} MB")
+
+        desde = inicio + timedelta(days=DIAS - 30)
+        t0 = time.perf_counter()
+        df = pd.read_csv(ruta_csv, parse_dates=['Fecha'])
+        mes_csv = df[df['Fecha'] >= desde]
+        t_csv = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        mes_col = historial.leer(desde=desde)
+        t_col = time.perf_counter() - t0
+        assert len(mes_csv) == len(mes_col)
+        print(f"último mes:      csv {t_csv * 1000:6.0f} ms   columnas {t_col * 1000:6.1f} ms   ×{t_csv / t_col:.0f}")
+
+        t0 = time.perf_counter()
+        por_csv = pd.read_csv(ruta_csv, usecols=['Responsable'])['Responsable'].value_counts()
+        t_csv = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        por_col = historial.resumen_por_usuario()
+        t_col = time.perf_counter() - t0
+        assert por_csv.to_dict() == {str(k): v for k, v in por_col.items()}
+        print(f"total por persona: csv {t_csv * 1000:6.0f} ms   columnas {t_col * 1000:6.1f} ms   ×{t_csv / t_col:.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""Muchos hogares en un mismo proceso: solo se cargan los que tienen sesiones.
+
+Simula sesiones repartidas entre unos pocos hogares activos de un total de
+cientos y comprueba que:
+- solo se leen las tablas de los hogares visitados, una vez cada una;
+- nunca hay más de 'max_activos' cargados y se descarga el menos usado;
+- dos sesiones que entran a la vez en un hogar comparten el mismo inquilino;
+- lo que guarda un hogar no aparece en otro;
+- el reinicio diario del hilo común solo toca los hogares cargados.
+Uso: python benchmarks/bench_hogares.py
+"""
+import os
+import random
+import sys
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from almacen import AlmacenTareas, ejecutar_con_reintentos  # noqa: E402
+from hogares import Hogar, Inquilino, RegistroHogares  # noqa: E402
+from persistencia import AsignadorIDs, BackendMemoria, CacheTabla  # noqa: E402
+from planificador import PlanificadorReinicio  # noqa: E402
+from datos_sinteticos import USUARIOS, tabla_sintetica  # noqa: E402
+
+HOGARES = 500
+FILAS_POR_HOGAR = 2_000
+ACTIVOS = 40
+MAX_ACTIVOS = 50
+SESIONES = 5_000
+
+
+def crear_hogares():
+    return {f"h{n}": Hogar(f"h{n}", usuarios=USUARIOS) for n in range(HOGARES)}
+
+
+def crear_fabrica(backends, reloj=datetime.now):
+    def fabrica(hogar):
+        backend = backends[hogar.id]
+        cache = CacheTabla(backend, comprobar_cada=60.0)
+        ids = AsignadorIDs(backend)
+        planificador = PlanificadorReinicio(backend, ids=ids, hora='04:00', reloj=reloj,
+                                            al_reiniciar=cache.registrar_escritura, iniciar=False)
+        return Inquilino(hogar, cache, ids, planificador=planificador)
+    return fabrica
+
+
+def main():
+    tabla = tabla_sintetica(FILAS_POR_HOGAR)
+    hogares = crear_hogares()
+    backends = {h: BackendMemoria(tabla) for h in hogares}
+    registro = RegistroHogares(hogares, crear_fabrica(backends), max_activos=MAX_ACTIVOS, iniciar=False)
+
+    # Sesiones: la mayoría en unos pocos hogares (reparto tipo Zipf)
+    rnd = random.Random(0)
+    visitables = list(hogares)[:ACTIVOS]
+    pesos = [1 / (n + 1) for n in range(ACTIVOS)]
+    t0 = time.perf_counter()
+    for _ in range(SESIONES):
+        inquilino = registro.obtener(rnd.choices(visitables, pesos)[0])
+        inquilino.cache.obtener()
+    t_sesiones = time.perf_counter() - t0
+
+    leidos = [h for h, b in backends.items() if b.lecturas]
+    estado = registro.estado()
+    print(f"{HOGARES} hogares, {SESIONES} sesiones en {ACTIVOS} de ellos: {t_sesiones * 1000:.0f} ms "
+          f"({t_sesiones / SESIONES * 1e6:.0f} µs por sesión)")
+    print(f"cargados ahora: {estado['activos']} (máx. {MAX_ACTIVOS}), cargas: {estado['cargas']}, "
+          f"descargas: {estado['descargas']}, hogares leídos: {len(leidos)}")
+    assert set(leidos) <= set(visitables)
+    assert estado['cargas'] == len(leidos)
+    assert all(b.lecturas == 1 for b in backends.values() if b.lecturas)
+
+    memoria_hogar = registro.obtener('h0').cache.obtener().memory_usage(deep=True).sum()
+    print(f"memoria de tablas: {memoria_hogar * estado['activos'] / 1e6:.1f} MB cargados "
+          f"frente a {memoria_hogar * HOGARES / 1e6:.1f} MB si se cargaran todos")
+
+    # Con menos sitio que hogares activos se descarga el que lleva más sin usarse
+    pequeno = RegistroHogares(hogares, crear_fabrica(backends), max_activos=3, iniciar=False)
+    for h in ['h0', 'h1', 'h2', 'h0', 'h3']:
+        pequeno.obtener(h)
+    assert pequeno.activos() == ['h2', 'h0', 'h3'] and pequeno.estado()['descargas'] == 1
+
+    # Sesiones simultáneas en un hogar nuevo: un solo inquilino y una sola lectura
+    resultados = []
+    hilos = [threading.Thread(target=lambda: resultados.append(registro.obtener('h499'))) for _ in range(16)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    assert len({id(i) for i in resultados}) == 1
+    resultados[0].cache.obtener()
+    assert backends['h499'].lecturas == 1
+
+    # Aislamiento: lo que se guarda en un hogar no llega a otro
+    a, b = registro.obtener('h0'), registro.obtener('h1')
+    almacen = AlmacenTareas(a.cache.obtener(), ids=a.ids)
+    libre = next(i for i in almacen._filas if almacen._filas[i][almacen._pos['Responsable']] == 'Sin asignar')
+    _, delta = ejecutar_con_reintentos(almacen, lambda x: x.asignar(libre, 'Papá', 'Mañana'), a.backend,
+                                       lambda: AlmacenTareas(a.cache.obtener(forzar=True), ids=a.ids))
+    a.cache.registrar_escritura(delta)
+    assert not delta.vacio
+    assert not a.cache.obtener().equals(b.cache.obtener())
+    assert backends['h1'].leer().equals(tabla)
+
+    # Reinicio diario desde el hilo común: solo los hogares cargados
+    dias = iter([datetime(2026, 10, 18, 12), datetime(2026, 10, 19, 5)])
+    ahora = [next(dias)]
+    hogares = crear_hogares()
+    backends = {h: BackendMemoria(tabla) for h in hogares}
+    registro = RegistroHogares(hogares, crear_fabrica(backends, reloj=lambda: ahora[0]),
+                               max_activos=MAX_ACTIVOS, iniciar=False)
+    for h in visitables[:10]:
+        registro.obtener(h)
+    registro.comprobar_reinicios()  # primer arranque: solo apunta el día
+    ahora[0] = next(dias)
+    t0 = time.perf_counter()
+    reiniciados = registro.comprobar_reinicios()
+    t_reinicio = time.perf_counter() - t0
+    print(f"reinicio de {reiniciados} hogares cargados: {t_reinicio * 1000:.0f} ms")
+    assert reiniciados == 10
+    assert sum(1 for b in backends.values() if b.leer_ultimo_reinicio()) == 10
+    # Un hogar que se carga después se pone al día en la siguiente comprobación
+    registro.obtener('h100')
+    assert registro.comprobar_reinicios() == 0  # primera vez que se ve: solo apunta el día
+    assert backends['h100'].leer_ultimo_reinicio() == datetime(2026, 10, 19).toordinal()
+
+
+if __name__ == "__main__":
+    main()
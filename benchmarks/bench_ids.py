@@ -0,0 +1,89 @@
+"""Asignaciones simultáneas desde varios hilos: max()+1 frente a AsignadorIDs.
+
+Después, varios procesos con su propio AsignadorIDs contra el mismo fichero
+SQLite (tabla plana y modelo normalizado): ningún ID puede salir dos veces.
+
+Uso: python benchmarks/bench_ids.py
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from modelo import BackendNormalizado  # noqa: E402
+from persistencia import AsignadorIDs, BackendMemoria, BackendSQLite  # noqa: E402
+from datos_sinteticos import tabla_sintetica  # noqa: E402
+
+HILOS = 8
+POR_HILO = 500
+PROCESOS = 6
+
+
+def en_paralelo(funcion):
+    repartidos = []
+    barrera = threading.Barrier(HILOS)
+
+    def trabajador():
+        barrera.wait()
+        for _ in range(POR_HILO):
+            repartidos.append(funcion())
+
+    hilos = [threading.Thread(target=trabajador) for _ in range(HILOS)]
+    t0 = time.perf_counter()
+    for h in hilos: h.start()
+    for h in hilos: h.join()
+    return repartidos, time.perf_counter() - t0
+
+
+def proceso(clase, ruta, barrera):
+    # Bloques pequeños para que los procesos pidan bloque a la vez muchas veces
+    asignador = AsignadorIDs(clase(ruta), tam_bloque=5)
+    barrera.wait()
+    return [asignador.siguiente() for _ in range(POR_HILO)]
+
+
+def entre_procesos(clase, ruta):
+    clase(ruta)  # crea el esquema antes de que arranquen los procesos
+    with multiprocessing.Manager() as gestor:
+        barrera = gestor.Barrier(PROCESOS)
+        with multiprocessing.Pool(PROCESOS) as pool:
+            t0 = time.perf_counter()
+            listas = pool.starmap(proceso, [(clase, ruta, barrera)] * PROCESOS)
+            t = time.perf_counter() - t0
+    repartidos = [i for lista in listas for i in lista]
+    return len(repartidos) - len(set(repartidos)), t
+
+
+if __name__ == "__main__":
+    df = tabla_sintetica(10_000)
+    ids_tabla = df['ID'].tolist()
+
+    def max_mas_uno():
+        # Lo que hacía app.py: leer el máximo y añadir la fila después
+        nuevo = max(ids_tabla) + 1
+        time.sleep(0)
+        ids_tabla.append(nuevo)
+        return nuevo
+
+    repartidos, t = en_paralelo(max_mas_uno)
+    print(f"max()+1:      {len(repartidos) - len(set(repartidos))} IDs repetidos, {t:.3f}s")
+
+    backend = BackendMemoria()
+    asignador = AsignadorIDs(backend)
+    asignador.asegurar_minimo(int(df['ID'].max()))
+    repartidos, t = en_paralelo(asignador.siguiente)
+    print(f"AsignadorIDs: {len(repartidos) - len(set(repartidos))} IDs repetidos, {t:.3f}s "
+          f"({backend.llamadas} escrituras de la marca)")
+
+    # Dos procesos distintos contra el mismo backend no se pisan los bloques
+    otro = AsignadorIDs(backend)
+    assert not set(otro.reservar(100)) & set(repartidos)
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        for nombre, clase in (("tabla plana", BackendSQLite), ("normalizado", BackendNormalizado)):
+            repetidos, t = entre_procesos(clase, os.path.join(carpeta, f"{nombre}.db"))
+            print(f"{PROCESOS} procesos ({nombre}): {repetidos} IDs repetidos, {t:.3f}s")
+            assert repetidos == 0
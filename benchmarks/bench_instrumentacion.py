@@ -0,0 +1,87 @@
+"""Coste de la instrumentación sobre una recarga simulada de app.py.
+
+Simula recargas con las mismas secciones que la app (cargar, vistas,
+pintar...) sobre un almacén de 10k filas, con la instrumentación apagada,
+encendida y perfilando con cProfile, y comprueba que las exportaciones
+JSON y Prometheus tienen todas las secciones.
+Uso: python benchmarks/bench_instrumentacion.py
+"""
+import json
+import os
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from almacen import AlmacenTareas  # noqa: E402
+from instrumentacion import BackendMedido, Instrumentacion  # noqa: E402
+from persistencia import AsignadorIDs, BackendMemoria, CacheTabla  # noqa: E402
+from datos_sinteticos import tabla_sintetica  # noqa: E402
+
+FILAS = 10_000
+RECARGAS = 200
+SECCIONES = ['sesion', 'vistas', 'ui_libres', 'ui_mi_actividad', 'ui_resumen']
+
+
+def recarga(instr, cache, perfilar=False):
+    instr.iniciar_recarga(perfilar=perfilar)
+    instr.seccion('sesion')
+    with instr.tramo('cargar_datos'):
+        almacen = AlmacenTareas(cache.obtener(), ids=AsignadorIDs())
+    instr.seccion('vistas')
+    almacen.tabla()
+    libres = almacen.tareas_libres(['Padres', 'Todos'], almacen.debidas(date.today()))
+    pendientes = almacen.filas_de('Papá', 'Pendiente')
+    instr.seccion('ui_libres')
+    textos = list(libres['Texto'].head(25))
+    instr.seccion('ui_mi_actividad')
+    textos += [str(t) for t in pendientes['Tarea'].head(25)]
+    instr.seccion('ui_resumen')
+    instr.terminar_recarga()
+    return textos
+
+
+def medir(instr, cache, perfilar=False):
+    t0 = time.perf_counter()
+    for _ in range(RECARGAS):
+        recarga(instr, cache, perfilar)
+    return (time.perf_counter() - t0) / RECARGAS
+
+
+def main():
+    instr = Instrumentacion()
+    cache = CacheTabla(BackendMedido(BackendMemoria(tabla_sintetica(FILAS)), instr))
+    cache.obtener()
+
+    apagada = Instrumentacion(activa=False)
+    t_apagada = medir(apagada, cache)
+    t_encendida = medir(instr, cache)
+    t0 = time.perf_counter()
+    recarga(instr, cache, perfilar=True)
+    t_perfil = time.perf_counter() - t0
+    print(f"recarga ({FILAS} filas): apagada {t_apagada * 1000:.2f} ms, "
+          f"instrumentada {t_encendida * 1000:.2f} ms ({(t_encendida / t_apagada - 1) * 100:+.1f}%), "
+          f"con cProfile {t_perfil * 1000:.1f} ms")
+
+    t0 = time.perf_counter()
+    for _ in range(100_000):
+        with instr.tramo('vacio'):
+            pass
+    print(f"coste de un tramo vacío: {(time.perf_counter() - t0) * 10:.2f} µs")
+
+    datos = json.loads(instr.a_json())
+    assert set(SECCIONES) <= set(datos['tramos'])
+    assert datos['tramos']['recarga']['llamadas'] == RECARGAS + 1
+    assert datos['contadores']['backend_leer'] == 1
+    assert instr.recargas[-1].perfil and 'cumulative' in instr.recargas[-1].perfil
+    prometheus = instr.a_prometheus()
+    for s in SECCIONES:
+        assert f'gesti_tramo_segundos_count{{tramo="{s}"}}' in prometheus
+    assert 'gesti_backend_leer_total 1' in prometheus
+    print("JSON y Prometheus con todas las secciones; perfil de cProfile capturado")
+    print("secciones más caras:", ", ".join(f"{n} {v['media_ms']:.2f} ms"
+                                           for n, v in list(datos['tramos'].items())[:4]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Modelo normalizado (plantillas, instancias y asignaciones) frente a la tabla plana.
+
+Migra una tabla sintética de 50k filas y comprueba que la vista plana es la
+misma. Después compara, contra BackendSQLite con la tabla plana:
+- leer el stock de un contador (obtener_stock_real recorre la tabla; el
+  modelo lee una fila de 'instancias');
+- asignar unidades de contadores y tareas normales con el almacén (la tabla
+  plana comprueba el stock contando filas y borra la maestra de las normales);
+y que tras las mismas operaciones las dos vistas planas son iguales.
+Uso: python benchmarks/bench_modelo.py
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from almacen import AlmacenTareas, ejecutar_con_reintentos  # noqa: E402
+from esquema import aplicar_esquema, quitar_esquema  # noqa: E402
+from logica import TIPOS_CONTADOR, calcular_indice_stock, obtener_stock_real  # noqa: E402
+from modelo import BackendNormalizado  # noqa: E402
+from persistencia import AsignadorIDs, BackendSQLite  # noqa: E402
+from datos_sinteticos import USUARIOS, mismas_filas, tabla_sintetica  # noqa: E402
+
+FILAS = 50_000
+CONSULTAS = 500
+ASIGNACIONES = 300
+
+
+def plana(df):
+    return quitar_esquema(aplicar_esquema(df))
+
+
+def asignar_varias(backend, ids_tareas):
+    recargar = lambda: AlmacenTareas(backend.leer(), ids=AsignadorIDs(backend))  # noqa: E731
+    almacen = recargar()
+    t0 = time.perf_counter()
+    for n, id_tarea in enumerate(ids_tareas):
+        almacen, _ = ejecutar_con_reintentos(
+            almacen, lambda a: a.asignar(id_tarea, USUARIOS[n % len(USUARIOS)], 'Tarde'), backend, recargar)
+    return (time.perf_counter() - t0) / len(ids_tareas)
+
+
+def main():
+    df = tabla_sintetica(FILAS, ratio_contador=0.3, ratio_puntual=0.5)
+    with tempfile.TemporaryDirectory() as carpeta:
+        sqlite = BackendSQLite(os.path.join(carpeta, 'plana.db'))
+        sqlite.escribir_todo(df)
+        normalizado = BackendNormalizado(os.path.join(carpeta, 'normalizado.db'))
+        t0 = time.perf_counter()
+        normalizado.escribir_todo(df)
+        t_migrar = time.perf_counter() - t0
+        assert mismas_filas(plana(normalizado.leer()), plana(df))
+        print(f"{FILAS} filas migradas en {t_migrar:.2f}s; la vista plana es igual a la hoja")
+
+        # --- Stock de un contador ---
+        rnd = random.Random(0)
+        maestras = df[(df['Frecuencia'] != 'Puntual') & df['Tipo'].isin(TIPOS_CONTADOR)]
+        tareas = [rnd.choice(list(maestras['Tarea'])) for _ in range(CONSULTAS)]
+        t0 = time.perf_counter()
+        plano = [obtener_stock_real(df, t) for t in tareas]
+        t_plano = (time.perf_counter() - t0) / CONSULTAS
+        t0 = time.perf_counter()
+        fila = [normalizado.stock(t) for t in tareas]
+        t_fila = (time.perf_counter() - t0) / CONSULTAS
+        assert plano == fila
+        print(f"stock de un contador: obtener_stock_real {t_plano * 1000:.2f} ms, "
+              f"instancia del día {t_fila * 1000:.3f} ms (x{t_plano / t_fila:.0f})")
+
+        # --- Asignar (mismas tareas y mismos IDs en los dos backends) ---
+        libres = df[(df['Frecuencia'] != 'Puntual') & (df['Responsable'] == 'Sin asignar')]
+        stock = calcular_indice_stock(df)
+        contadores = [i for i, t, tipo in zip(libres['ID'], libres['Tarea'], libres['Tipo'])
+                      if tipo in TIPOS_CONTADOR and stock[t] > 0]
+        normales = list(libres.loc[libres['Tipo'] == 'Normal', 'ID'])
+        for nombre, ids_tareas in (("contadores", rnd.sample(contadores, ASIGNACIONES)),
+                                   ("normales", rnd.sample(normales, ASIGNACIONES))):
+            t_sqlite = asignar_varias(sqlite, ids_tareas)
+            t_normalizado = asignar_varias(normalizado, ids_tareas)
+            print(f"asignar {nombre}: tabla plana {t_sqlite * 1000:.2f} ms, "
+                  f"normalizado {t_normalizado * 1000:.2f} ms por asignación")
+        assert mismas_filas(plana(sqlite.leer()), plana(normalizado.leer()))
+        print("tras las mismas asignaciones las dos tablas planas son iguales")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Coste por operación: copia + concat + diff (antes) frente al almacén in-place.
+
+Uso: python benchmarks/bench_mutaciones.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from almacen import AlmacenTareas  # noqa: E402
+from persistencia import calcular_delta  # noqa: E402
+from datos_sinteticos import tabla_sintetica  # noqa: E402
+
+OPERACIONES = 50
+
+
+def antes(df):
+    """Asignar una tarea como lo hacía app.py: copia, concat y copia al guardar."""
+    for n in range(OPERACIONES):
+        df_temp = df.copy()
+        nueva = pd.DataFrame([{**df_temp.iloc[n].to_dict(), 'ID': df_temp['ID'].max() + 1,
+                               'Frecuencia': 'Puntual', 'Responsable': 'Cris'}])
+        df_temp = pd.concat([df_temp, nueva], ignore_index=True)
+        df_final = df_temp.copy().reset_index(drop=True).fillna("-")
+        calcular_delta(df, df_final)
+        df = df_final
+
+
+def asignables(almacen):
+    """Filas que se pueden asignar (maestras libres y contadores con stock)."""
+    p = almacen._pos
+    return [i for i, f in almacen._filas.items()
+            if f[p['Frecuencia']] != 'Puntual' and f[p['Responsable']] == 'Sin asignar'
+            and (f[p['Tipo']] == 'Normal' or almacen.stock(f[p['Tarea']]) >= OPERACIONES)][:OPERACIONES]
+
+
+def despues(args):
+    almacen, ids = args
+    for id_tarea in ids:
+        almacen.asignar(id_tarea, 'Cris', 'Tarde')
+        almacen.cambios_pendientes()
+        almacen.confirmar()
+
+
+def medir(funcion, arg):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    funcion(arg)
+    t = time.perf_counter() - t0
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return t / OPERACIONES * 1000, pico / 1024 / 1024
+
+
+if __name__ == "__main__":
+    print(f"{'filas':>8} | {'antes ms/op':>11} {'pico MB':>8} | {'almacén ms/op':>13} {'pico MB':>8}")
+    for n in (1_000, 10_000, 100_000):
+        df = tabla_sintetica(n).fillna("-")
+        ms_antes, mb_antes = medir(antes, df)
+        almacen = AlmacenTareas(df)
+        ms_desp, mb_desp = medir(despues, (almacen, asignables(almacen)))
+        print(f"{n:>8} | {ms_antes:>11.3f} {mb_antes:>8.1f} | {ms_desp:>13.4f} {mb_desp:>8.2f}")
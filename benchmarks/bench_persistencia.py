@@ -0,0 +1,48 @@
+"""Compara la reescritura completa de la hoja con el guardado por deltas.
+
+Uso: python benchmarks/bench_persistencia.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from persistencia import BackendMemoria, calcular_delta  # noqa: E402
+from datos_sinteticos import tabla_sintetica  # noqa: E402
+
+# Red simulada: 150 ms por llamada y ~1 MB/s de subida
+LATENCIA = 0.15
+SEGUNDOS_POR_KB = 0.001
+
+
+def clic_hecho(df):
+    """Simula el botón '✅ Hecho' sobre una fila cualquiera."""
+    df_temp = df.copy()
+    i = len(df_temp) // 2
+    df_temp.at[i, 'Estado'] = 'Hecho' if df_temp.at[i, 'Estado'] == 'Pendiente' else 'Pendiente'
+    return df_temp
+
+
+def medir(n):
+    df = tabla_sintetica(n)
+    df_nuevo = clic_hecho(df)
+
+    completo = BackendMemoria(df, LATENCIA, SEGUNDOS_POR_KB)
+    t0 = time.perf_counter()
+    completo.escribir_todo(df_nuevo)
+    t_completo = time.perf_counter() - t0
+
+    parcial = BackendMemoria(df, LATENCIA, SEGUNDOS_POR_KB)
+    t0 = time.perf_counter()
+    parcial.aplicar_delta(calcular_delta(df, df_nuevo))
+    t_delta = time.perf_counter() - t0
+
+    assert parcial.df.equals(completo.df)
+    return completo.bytes_enviados, t_completo, parcial.bytes_enviados, t_delta
+
+
+if __name__ == "__main__":
+    print(f"{'filas':>8} | {'bytes todo':>11} {'t todo':>8} | {'bytes delta':>11} {'t delta':>8}")
+    for n in (1_000, 5_000, 20_000):
+        b_todo, t_todo, b_delta, t_delta = medir(n)
+        print(f"{n:>8} | {b_todo:>11} {t_todo:>7.3f}s | {b_delta:>11} {t_delta:>7.3f}s")
@@ -0,0 +1,53 @@
+"""¿Qué toca hoy? Recorrer todas las plantillas frente al índice de recurrencias.
+
+Uso: python benchmarks/bench_recurrencias.py
+"""
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+from itertools import islice
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from recurrencias import expandir, indice_de_tabla, leer_frecuencia  # noqa: E402
+from datos_sinteticos import tabla_sintetica  # noqa: E402
+
+FILAS = 100_000
+FRECUENCIAS = ['Diaria', 'Semanal', 'Semanal: L,X,V', 'Semanal: S,D', 'Mensual', 'Mensual: 15',
+               'Mensual: 31', 'Quincenal', 'Cada 3 días', 'Cada 10 días']
+DIAS = 30
+
+
+def main():
+    rnd = random.Random(0)
+    df = tabla_sintetica(FILAS, ratio_puntual=0.0)
+    df['Frecuencia'] = [rnd.choice(FRECUENCIAS) for _ in range(len(df))]
+    dias = [date(2026, 10, 1) + timedelta(days=d) for d in range(DIAS)]
+
+    t0 = time.perf_counter()
+    recorrido = [{i for i, f in zip(df['ID'], df['Frecuencia']) if leer_frecuencia(f).toca(d)} for d in dias]
+    t_recorrido = (time.perf_counter() - t0) / DIAS
+
+    t0 = time.perf_counter()
+    indice = indice_de_tabla(df)
+    t_construir = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    con_indice = [indice.debidas(d) for d in dias]
+    t_indice = (time.perf_counter() - t0) / DIAS
+    assert recorrido == con_indice
+
+    media = sum(map(len, con_indice)) / DIAS
+    print(f"{FILAS} plantillas, ~{media:.0f} tocan cada día")
+    print(f"recorrer todas: {t_recorrido * 1000:7.1f} ms/día")
+    print(f"índice:         {t_indice * 1000:7.1f} ms/día (construirlo una vez: {t_construir * 1000:.0f} ms)"
+          f"  ×{t_recorrido / t_indice:.0f}")
+
+    # Las instancias salen bajo demanda: la primera semana no genera el año entero
+    t0 = time.perf_counter()
+    primeras = list(islice(expandir(df.head(1000), date(2026, 1, 1), date(2026, 12, 31)), 100))
+    print(f"primeras {len(primeras)} instancias de un año: {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
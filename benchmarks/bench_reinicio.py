@@ -0,0 +1,87 @@
+"""Reinicio diario (MODO 2) sobre una tabla de 100k filas con un día de uso.
+
+Compara:
+- antes:     filtrar la tabla, reescribir tres columnas en todas las filas y
+             reescribir la hoja entera (lo que hacía app.py);
+- recorrido: el almacén recorriendo todas las filas para sacar el delta;
+- sucias:    el almacén recorriendo solo las filas que cambiaron en el día.
+Uso: python benchmarks/bench_reinicio.py
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from almacen import AlmacenTareas  # noqa: E402
+from persistencia import AsignadorIDs, BackendMemoria, BackendSQLite, bytes_payload  # noqa: E402
+from datos_sinteticos import FRANJAS, USUARIOS, mismas_filas, tabla_sintetica  # noqa: E402
+
+FILAS = 100_000
+ASIGNACIONES = 2_000
+
+
+def dia_de_uso(df, semilla=0):
+    """Almacén con la tabla base tras un día de asignaciones y tareas hechas."""
+    rnd = random.Random(semilla)
+    almacen = AlmacenTareas(df, ids=AsignadorIDs())
+    libres = [i for i, f in almacen._filas.items() if f[almacen._pos['Responsable']] == 'Sin asignar']
+    for id_tarea in rnd.sample(libres, ASIGNACIONES):
+        id_nuevo = almacen.asignar(id_tarea, rnd.choice(USUARIOS), rnd.choice(FRANJAS))
+        if rnd.random() < 0.6:
+            almacen.completar(id_nuevo)
+    almacen.confirmar()
+    return almacen
+
+
+def main():
+    df = tabla_sintetica(FILAS, ratio_puntual=0.0)
+    print(f"{FILAS} filas, {ASIGNACIONES} asignaciones en el día")
+
+    almacen = dia_de_uso(df)
+    tabla = almacen.tabla()
+    t0 = time.perf_counter()
+    df_reset = tabla[tabla['Frecuencia'] != 'Puntual'].copy()
+    df_reset['Responsable'], df_reset['Estado'], df_reset['Franja'] = 'Sin asignar', 'Pendiente', '-'
+    backend = BackendMemoria(tabla)
+    backend.escribir_todo(df_reset)
+    t_antes = time.perf_counter() - t0
+    print(f"antes:     {t_antes * 1000:7.1f} ms  {backend.bytes_enviados / 1e6:6.2f} MB enviados")
+
+    almacen = dia_de_uso(df)
+    almacen._sucias = set(almacen._filas)
+    t0 = time.perf_counter()
+    almacen.reinicio_diario()
+    delta = almacen.cambios_pendientes()
+    t_recorrido = time.perf_counter() - t0
+    print(f"recorrido: {t_recorrido * 1000:7.1f} ms  {bytes_payload(delta.payload()) / 1e6:6.2f} MB enviados")
+
+    almacen = dia_de_uso(df)
+    esperado = almacen.tabla()
+    t0 = time.perf_counter()
+    almacen.reinicio_diario()
+    delta = almacen.cambios_pendientes()
+    t_sucias = time.perf_counter() - t0
+    print(f"sucias:    {t_sucias * 1000:7.1f} ms  {bytes_payload(delta.payload()) / 1e6:6.2f} MB enviados  "
+          f"({len(delta.actualizados)} filas actualizadas, {len(delta.borrados)} borradas)  "
+          f"×{t_recorrido / t_sucias:.0f} frente al recorrido")
+
+    # Mismo resultado que la versión de antes, aplicado en los backends
+    backend = BackendMemoria(esperado)
+    t0 = time.perf_counter()
+    backend.aplicar_delta(delta)
+    t_mem = time.perf_counter() - t0
+    assert mismas_filas(backend.leer(), df_reset)
+    with tempfile.TemporaryDirectory() as tmp:
+        sqlite = BackendSQLite(os.path.join(tmp, 'tareas.db'))
+        sqlite.escribir_todo(esperado)
+        t0 = time.perf_counter()
+        sqlite.aplicar_delta(delta)
+        t_sql = time.perf_counter() - t0
+        assert len(sqlite.leer()) == len(df_reset)
+    print(f"aplicar el delta: memoria {t_mem * 1000:.1f} ms, sqlite {t_sql * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
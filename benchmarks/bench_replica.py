@@ -0,0 +1,151 @@
+"""Réplica local offline-first frente a leer de una hoja lenta o caída.
+
+Mide la carga de página (CacheTabla.obtener) sobre la réplica con la hoja
+respondiendo en 200 ms y después con la hoja caída, y comprueba que:
+- las páginas se sirven desde disco/memoria en menos de 1 ms (p99);
+- sin hoja se sigue pudiendo leer y guardar, y los cambios llegan al volver;
+- una copia nueva que no puede traer la hoja no se hace pasar por una tabla vacía;
+- los cambios hechos en la hoja por otro proceso llegan a la copia local;
+- si la hoja rechaza un cambio por conflicto, la copia vuelve a ser la hoja.
+Uso: python benchmarks/bench_replica.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from almacen import AlmacenTareas, ejecutar_con_reintentos  # noqa: E402
+from persistencia import AsignadorIDs, BackendMemoria, CacheTabla, calcular_delta  # noqa: E402
+from replica import BackendReplica, ReplicaSinDatos  # noqa: E402
+from datos_sinteticos import mismas_filas, tabla_sintetica  # noqa: E402
+
+FILAS = 10_000
+CARGAS = 5_000
+LATENCIA = 0.2
+
+
+class HojaInestable(BackendMemoria):
+    """Backend en memoria con latencia que se puede 'caer' (ConnectionError)."""
+
+    caida = False
+
+    def _simular_red(self, n_bytes):
+        if self.caida:
+            raise ConnectionError("Sin conexión con la hoja")
+        super()._simular_red(n_bytes)
+
+    def version(self):
+        if self.caida:
+            raise ConnectionError("Sin conexión con la hoja")
+        return super().version()
+
+
+def percentiles(tiempos):
+    tiempos = sorted(tiempos)
+    return 1000 * tiempos[len(tiempos) // 2], 1000 * tiempos[int(len(tiempos) * 0.99)]
+
+
+def cargas_de_pagina(cache):
+    tiempos = []
+    for _ in range(CARGAS):
+        t0 = time.perf_counter()
+        df = cache.obtener()
+        tiempos.append(time.perf_counter() - t0)
+    return df, percentiles(tiempos)
+
+
+def guardar(replica, cache, operacion):
+    almacen = AlmacenTareas(cache.obtener(), ids=AsignadorIDs())
+    recargar = lambda: AlmacenTareas(cache.obtener(forzar=True), ids=AsignadorIDs())  # noqa: E731
+    _, delta = ejecutar_con_reintentos(almacen, operacion, replica, recargar)
+    cache.registrar_escritura(delta)
+    return delta
+
+
+def libre(df):
+    return int(df.loc[(df['Responsable'] == 'Sin asignar') & (df['Tipo'] == 'Normal'), 'ID'].iloc[0])
+
+
+def main():
+    df = tabla_sintetica(FILAS)
+    hoja = HojaInestable(df, latencia=LATENCIA)
+    t0 = time.perf_counter()
+    CacheTabla(hoja).obtener()
+    print(f"sin réplica: primera carga {1000 * (time.perf_counter() - t0):.0f} ms y cada recarga igual")
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        # --- Copia nueva con la hoja caída: leer falla en vez de dar una tabla vacía ---
+        hoja.caida = True
+        nueva = BackendReplica(hoja, ruta=os.path.join(carpeta, 'nueva.db'), iniciar=False)
+        try:
+            nueva.leer()
+            raise AssertionError("la copia vacía se ha servido como si no hubiera tareas")
+        except ReplicaSinDatos:
+            pass
+        assert nueva.estado()['sin_datos']
+        hoja.caida = False
+        nueva.sincronizar()
+        assert not nueva.estado()['sin_datos'] and len(nueva.leer()) == FILAS
+        nueva.detener()
+        print("copia nueva sin hoja: leer() avisa hasta que se llena")
+
+        t0 = time.perf_counter()
+        replica = BackendReplica(hoja, ruta=os.path.join(carpeta, 'replica.db'), iniciar=False,
+                                 intervalo_envio=0.05, espera_base=0.05, espera_tope=0.2)
+        print(f"réplica creada y llena desde la hoja en {1000 * (time.perf_counter() - t0):.0f} ms")
+        cache = CacheTabla(replica)
+        tabla, (p50, p99) = cargas_de_pagina(cache)
+        print(f"con réplica, hoja a {LATENCIA * 1000:.0f} ms: carga de página p50 {p50:.4f} ms, p99 {p99:.4f} ms")
+        assert mismas_filas(tabla, hoja.leer()) and p99 < 1.0
+
+        # --- La hoja se cae: se sigue leyendo y guardando en local ---
+        hoja.caida = True
+        id_libre = libre(tabla)
+        tarea = tabla.loc[tabla['ID'] == id_libre, 'Tarea'].iloc[0]
+        # Una tarea normal conserva su fila maestra: asignarla añade la 'Puntual'
+        filas = len(tabla) + int((tabla.loc[tabla['ID'] == id_libre, 'Frecuencia'] != 'Puntual').any())
+        guardar(replica, cache, lambda a: a.asignar(id_libre, 'Papá', 'Mañana'))
+        tabla, (p50, p99) = cargas_de_pagina(cache)
+        assert replica.sincronizar() is False  # hay cambios por enviar: no se trae nada
+        time.sleep(0.3)
+        estado = replica.estado()
+        print(f"hoja caída: carga de página p50 {p50:.4f} ms, p99 {p99:.4f} ms, "
+              f"{estado['pendientes']} cambios en cola, error: {estado['ultimo_error']}")
+        assert len(tabla) == filas and estado['pendientes'] == 1 and estado['ultimo_error']
+        assert (tabla.loc[tabla['Tarea'] == tarea, 'Responsable'] == 'Papá').any()
+
+        # --- Vuelve: la cola se envía y la hoja queda igual que la copia ---
+        hoja.caida = False
+        hoja.latencia = 0.0
+        assert replica.cola.vaciar(timeout=10)
+        replica.sincronizar()
+        assert mismas_filas(hoja.leer(), replica.leer())
+        print("hoja recuperada: cambios enviados, hoja y copia local iguales")
+
+        # --- Cambios de otro proceso en la hoja ---
+        antes = hoja.leer()
+        despues = antes.copy()
+        despues.loc[despues['ID'] == libre(antes), ['Responsable', 'Estado']] = ['Mamá', 'Hecho']
+        hoja.aplicar_delta(calcular_delta(antes, despues))
+        assert replica.sincronizar() is True
+        assert mismas_filas(cache.obtener(forzar=True), hoja.leer())
+        print("cambio hecho en la hoja por otro proceso: traído a la copia local")
+
+        # --- Conflicto: otro proceso cambia la misma fila antes de que llegue la nuestra ---
+        antes = hoja.leer()
+        id_disputado = libre(antes)
+        despues = antes.copy()
+        despues.loc[despues['ID'] == id_disputado, 'Cantidad'] = 3
+        hoja.aplicar_delta(calcular_delta(antes, despues))
+        guardar(replica, cache, lambda a: a.ajustar_cantidad(id_disputado, 7))
+        assert replica.cola.vaciar(timeout=10)
+        replica.sincronizar()
+        assert replica.estado()['descartados'] == 1
+        assert mismas_filas(replica.leer(), hoja.leer())
+        print("conflicto con la hoja: el cambio local se descarta y la copia vuelve a ser la hoja")
+        replica.detener()
+
+
+if __name__ == "__main__":
+    main()
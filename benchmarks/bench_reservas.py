@@ -0,0 +1,122 @@
+"""Muchas sesiones cogiendo a la vez unidades de los mismos contadores.
+
+Cada sesión pulsa sin parar en contadores con stock según su copia de la
+tabla (que se queda vieja en cuanto otra sesión asigna). Se compara:
+- antes: el guardado condicionado con reintento; si otra sesión se llevó
+  la unidad hay ConflictoConcurrencia, se relee la tabla y se repite;
+- reserva: backend.reservar() resta si queda stock y dice sí o no en la
+  misma llamada.
+Con la tabla plana en SQLite y con el modelo normalizado, se mide cuántos
+clics por segundo se atienden y se comprueba que no se asigna ni una unidad
+de más y que al final se han repartido todas.
+Uso: python benchmarks/bench_reservas.py
+"""
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from almacen import AlmacenTareas, TareaNoDisponible, ejecutar_con_reintentos  # noqa: E402
+from logica import COLUMNAS  # noqa: E402
+from modelo import BackendNormalizado  # noqa: E402
+from persistencia import AsignadorIDs, BackendSQLite, ConflictoConcurrencia  # noqa: E402
+from datos_sinteticos import FRANJAS, USUARIOS  # noqa: E402
+
+SESIONES = 16
+CONTADORES = 10
+UNIDADES = 40
+
+
+def tabla_contadores():
+    return pd.DataFrame([[n + 1, f"Contador {n}", 'Diaria', 'Contador', 'Todos', 'Sin asignar', 'Pendiente',
+                          '-', UNIDADES] for n in range(CONTADORES)], columns=COLUMNAS)
+
+
+def guardar_antes(almacen, operacion, backend, recargar, intentos=3):
+    """El guardado de antes: aplicar_delta y, si hay conflicto, releer y repetir."""
+    for intento in range(intentos):
+        try:
+            operacion(almacen)
+            backend.aplicar_delta(almacen.cambios_pendientes())
+            almacen.confirmar()
+            return almacen
+        except ConflictoConcurrencia:
+            almacen.revertir()
+            if intento == intentos - 1:
+                raise
+            almacen = recargar()
+        except Exception:
+            almacen.revertir()
+            raise
+
+
+def sesion(backend, ids, guardar, stats, n):
+    rnd = random.Random(n)
+    usuario = USUARIOS[n % len(USUARIOS)]
+    recargar = lambda: AlmacenTareas(backend.leer(), ids=ids)  # noqa: E731
+    almacen = recargar()
+    while True:
+        con_stock = [i for i in range(1, CONTADORES + 1) if almacen.stock(f"Contador {i - 1}") > 0]
+        if not con_stock:
+            # La copia dice que no queda nada: se comprueba con el backend antes de rendirse
+            almacen = recargar()
+            if not any(almacen.stock(f"Contador {i}") > 0 for i in range(CONTADORES)):
+                return
+            continue
+        id_tarea = rnd.choice(con_stock)
+        franja = rnd.choice(FRANJAS)
+        t0 = time.perf_counter()
+        try:
+            almacen = guardar(almacen, lambda a: a.asignar(id_tarea, usuario, franja), backend, recargar)
+            stats['ok'] += 1
+        except (TareaNoDisponible, ConflictoConcurrencia):
+            stats['sin_stock'] += 1
+            almacen = recargar()
+        stats['segundos'] += time.perf_counter() - t0
+        stats['clics'] += 1
+
+
+def asignadas_por_tarea(backend):
+    df = backend.leer()
+    return Counter(df.loc[df['Frecuencia'] == 'Puntual', 'Tarea'])
+
+
+def medir(backend, guardar):
+    backend.escribir_todo(tabla_contadores())
+    ids = AsignadorIDs(backend)
+    stats = Counter()
+    hilos = [threading.Thread(target=sesion, args=(backend, ids, guardar, stats, n)) for n in range(SESIONES)]
+    t0 = time.perf_counter()
+    for h in hilos: h.start()
+    for h in hilos: h.join()
+    total = time.perf_counter() - t0
+    asignadas = asignadas_por_tarea(backend)
+    exceso = sum(max(0, n - UNIDADES) for n in asignadas.values())
+    return stats, total, exceso, sum(asignadas.values())
+
+
+def guardar_con_reserva(almacen, operacion, backend, recargar):
+    return ejecutar_con_reintentos(almacen, operacion, backend, recargar)[0]
+
+
+def main():
+    print(f"{SESIONES} sesiones, {CONTADORES} contadores de {UNIDADES} unidades ({CONTADORES * UNIDADES} en total)")
+    with tempfile.TemporaryDirectory() as carpeta:
+        for nombre, crear in (("tabla plana (SQLite)", lambda r: BackendSQLite(os.path.join(carpeta, f'{r}.db'))),
+                              ("normalizado", lambda r: BackendNormalizado(os.path.join(carpeta, f'n{r}.db')))):
+            for modo, guardar in (("antes", guardar_antes), ("reserva", guardar_con_reserva)):
+                stats, total, exceso, asignadas = medir(crear(modo), guardar)
+                print(f"{nombre:22} {modo:8} {stats['ok'] / total:7.0f} unidades/s, "
+                      f"{stats['clics'] / total:7.0f} clics/s, {1000 * stats['segundos'] / stats['clics']:.2f} ms "
+                      f"por clic, {stats['sin_stock']} sin stock, exceso {exceso}")
+                assert exceso == 0 and asignadas == stats['ok'] == CONTADORES * UNIDADES
+
+
+if __name__ == "__main__":
+    main()
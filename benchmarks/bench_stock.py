@@ -0,0 +1,50 @@
+"""Compara obtener_stock_real fila a fila con el índice de stock precalculado.
+
+Reproduce el bucle de 'Tareas Libres' sobre una tabla sintética de 50k filas.
+Uso: python benchmarks/bench_stock.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from logica import TIPOS_CONTADOR, calcular_indice_stock, obtener_stock_real  # noqa: E402
+from datos_sinteticos import tabla_sintetica  # noqa: E402
+
+FILAS = 50_000
+
+
+def render_por_fila(df, libres):
+    stocks = {}
+    for _, row in libres.iterrows():
+        if row['Tipo'] in TIPOS_CONTADOR and row['Frecuencia'] != 'Puntual':
+            stocks[row['Tarea']] = obtener_stock_real(df, row['Tarea'])
+    return stocks
+
+
+def render_con_indice(df, libres):
+    indice = calcular_indice_stock(df)
+    stocks = {}
+    for _, row in libres.iterrows():
+        if row['Tipo'] in TIPOS_CONTADOR and row['Frecuencia'] != 'Puntual':
+            stocks[row['Tarea']] = indice.get(row['Tarea'], 0)
+    return stocks
+
+
+if __name__ == "__main__":
+    df = tabla_sintetica(FILAS, ratio_contador=0.3, ratio_puntual=0.9)
+    libres = df[df['Responsable'] == 'Sin asignar']
+    n_contadores = int((libres['Tipo'].isin(TIPOS_CONTADOR)).sum())
+
+    t0 = time.perf_counter()
+    por_fila = render_por_fila(df, libres)
+    t_fila = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    con_indice = render_con_indice(df, libres)
+    t_indice = time.perf_counter() - t0
+
+    assert por_fila == con_indice
+    print(f"{FILAS} filas, {len(libres)} libres ({n_contadores} contadores)")
+    print(f"obtener_stock_real por fila: {t_fila:.3f}s")
+    print(f"índice precalculado:         {t_indice:.3f}s  (x{t_fila / t_indice:.0f})")
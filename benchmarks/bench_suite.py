@@ -0,0 +1,255 @@
+"""Las rutas principales de la app a 1k, 10k y 100k filas, con informe JSON.
+
+Genera hogares sintéticos (hogares, usuarios, proporción de contadores y de
+asignaciones del día configurables) y mide, para cada tamaño de tabla:
+- cargar: leer de SQLite y montar el almacén de cada hogar;
+- filtrar: mis pendientes y la vista de libres de un usuario;
+- stock: el stock de todos los contadores recorriendo la tabla y con el índice;
+- asignar / completar: operaciones de la sesión guardadas en SQLite;
+- reinicio: el reinicio diario del almacén y su delta;
+- serializar: el payload de escribir la tabla entera y el del delta del reinicio.
+El informe (--salida) guarda mediana y mínimo de cada caso junto con la
+versión y los parámetros; con --comparar se contrasta el mínimo con el de
+otro informe y se sale con error si algún caso es más lento que el umbral.
+Los casos muy rápidos se repiten en bucle hasta durar --tiempo-minimo por
+medición, y los que quedan por debajo de --piso-ms se muestran pero no
+cuentan como regresión (su variación es ruido de la máquina). Los casos se
+miden por rondas, una medición de cada uno por ronda, y el umbral de cada
+caso crece con la dispersión (mediana / mínimo) que ya tenía en el informe
+anterior: un caso ruidoso necesita empeorar más para contar.
+
+Uso: python benchmarks/bench_suite.py [--filas 1000 10000 100000] [--salida informe.json]
+                                      [--comparar anterior.json] [--umbral 1.25] [--piso-ms 0.2]
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from almacen import AlmacenTareas  # noqa: E402
+from logica import TIPOS_CONTADOR, calcular_indice_stock  # noqa: E402
+from persistencia import AsignadorIDs, BackendSQLite, bytes_payload  # noqa: E402
+from servicio import Configuracion, Sesion, crear_inquilino  # noqa: E402
+from datos_sinteticos import FRANJAS, hogares_sinteticos  # noqa: E402
+
+# Operaciones de la sesión que se guardan en cada repetición de asignar/completar
+OPERACIONES = 20
+
+
+def medir(funcion, preparar=None, minimo=0.0):
+    """Segundos de una medición de funcion(estado); 'preparar()' da el estado y no cuenta.
+
+    Cada medición dura al menos 'minimo' segundos: sin 'preparar' se llama a
+    funcion en bucle y cuenta la media; con 'preparar' se repite con un estado
+    nuevo y cuenta la mejor. Así un caso de microsegundos no se mide de una vez.
+    """
+    tiempos = []
+    total = 0.0
+    while True:
+        estado = preparar() if preparar is not None else None
+        llamadas = 0
+        # Como timeit: sin pausas del recolector de basura en mitad de la medición
+        gc.collect()
+        gc.disable()
+        try:
+            t0 = time.perf_counter()
+            while True:
+                funcion(estado)
+                llamadas += 1
+                transcurrido = time.perf_counter() - t0
+                if preparar is not None or transcurrido >= minimo:
+                    break
+        finally:
+            gc.enable()
+        tiempos.append(transcurrido / llamadas)
+        total += transcurrido
+        if total >= minimo:
+            return min(tiempos)
+
+
+def medir_por_rondas(casos, repeticiones):
+    """{caso: [segundos]} de {caso: (funcion, preparar, minimo)}, una medición de cada caso por ronda.
+
+    Con las repeticiones de cada caso repartidas por toda la ejecución, un rato
+    en que la máquina va más cargada no se lleva todas las de un mismo caso.
+    """
+    tiempos = {caso: [] for caso in casos}
+    for _ in range(repeticiones):
+        for caso, (funcion, preparar, minimo) in casos.items():
+            tiempos[caso].append(medir(funcion, preparar, minimo))
+    return tiempos
+
+
+def casos_de_tamano(filas, args, carpeta):
+    """{caso: [segundos]} para tablas de 'filas' filas."""
+    hogares = hogares_sinteticos(args.hogares, filas, n_usuarios=args.usuarios,
+                                 ratio_contador=args.ratio_contador, ratio_puntual=args.ratio_puntual)
+    backends = {}
+    for id_hogar, (_, tabla) in hogares.items():
+        backends[id_hogar] = BackendSQLite(os.path.join(carpeta, f"{id_hogar}_{filas}.db"))
+        backends[id_hogar].escribir_todo(tabla)
+    hogar, tabla = next(iter(hogares.values()))
+    # Las operaciones de la sesión cambian la tabla: se miden una vez por ronda, sin bucle
+    minimo = args.tiempo_minimo
+    rnd = random.Random(0)
+    nuevo_almacen = lambda: AlmacenTareas(tabla, ids=AsignadorIDs())  # noqa: E731
+    casos = {}
+
+    casos['cargar'] = (lambda _: [AlmacenTareas(b.leer(), ids=AsignadorIDs()) for b in backends.values()],
+                       None, minimo)
+
+    almacen = nuevo_almacen()
+    usuario, grupos = hogar.usuarios[0], ['Padres', 'Todos']
+    debidas = almacen.debidas(datetime.now().date())
+    casos['filtrar_pendientes'] = (lambda _: almacen.filas_de(usuario, 'Pendiente'), None, minimo)
+    # El almacén guarda la vista de libres: cada medición la monta desde cero en uno nuevo
+    casos['filtrar_libres'] = (lambda a: a.tareas_libres(grupos, debidas), nuevo_almacen, minimo)
+
+    contadores = list(tabla.loc[(tabla['Frecuencia'] != 'Puntual') & tabla['Tipo'].isin(TIPOS_CONTADOR), 'Tarea'])
+    casos['stock_tabla'] = (lambda _: calcular_indice_stock(tabla), None, minimo)
+    casos['stock_indice'] = (lambda _: [almacen.stock(t) for t in contadores], None, minimo)
+
+    # Sesión real sobre SQLite: cada ronda guarda OPERACIONES asignaciones y las completa
+    conf = Configuracion(backend='sqlite', ruta_sqlite=os.path.join(carpeta, f"sesion_{filas}.db"),
+                         hora_reinicio='', ruta_historial=os.path.join(carpeta, 'historial'))
+    inquilino = crear_inquilino(hogar, conf)
+    inquilino.backend.escribir_todo(tabla)
+    sesion = Sesion(inquilino, usuario)
+    sesion.al_dia()
+
+    def asignar(_):
+        libres = list(sesion.libres()['ID'])
+        for id_tarea in rnd.sample(libres, min(OPERACIONES, len(libres))):
+            sesion.asignar(id_tarea, rnd.choice(FRANJAS))
+
+    def completar(_):
+        for id_tarea in list(sesion.pendientes()['ID'])[:OPERACIONES]:
+            sesion.completar(id_tarea)
+    casos['asignar'] = (asignar, None, 0.0)
+    casos['completar'] = (completar, None, 0.0)
+
+    def reiniciar(a):
+        a.reinicio_diario()
+        return a.cambios_pendientes()
+    casos['reinicio'] = (reiniciar, nuevo_almacen, minimo)
+
+    delta_reinicio = reiniciar(nuevo_almacen())
+    casos['serializar_tabla'] = (lambda _: bytes_payload(tabla.values.tolist()), None, minimo)
+    casos['serializar_delta'] = (lambda _: bytes_payload(delta_reinicio.payload()), None, minimo)
+    try:
+        return medir_por_rondas(casos, args.repeticiones)
+    finally:
+        inquilino.cerrar()
+
+
+def version():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def informe(args):
+    resultados = {}
+    with tempfile.TemporaryDirectory() as carpeta:
+        for filas in args.filas:
+            t0 = time.perf_counter()
+            casos = casos_de_tamano(filas, args, carpeta)
+            resultados[str(filas)] = {
+                caso: {'mediana_ms': 1000 * statistics.median(t), 'min_ms': 1000 * min(t), 'repeticiones': len(t)}
+                for caso, t in casos.items()
+            }
+            print(f"{filas} filas medidas en {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+    return {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'version': version(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'maquina': platform.machine(),
+        'parametros': {'hogares': args.hogares, 'usuarios': args.usuarios, 'ratio_contador': args.ratio_contador,
+                       'ratio_puntual': args.ratio_puntual, 'repeticiones': args.repeticiones,
+                       'tiempo_minimo': args.tiempo_minimo, 'operaciones_por_repeticion': OPERACIONES},
+        'resultados': resultados,
+    }
+
+
+def mostrar(datos):
+    tabla = pd.DataFrame({f"{filas} filas": {caso: r['mediana_ms'] for caso, r in casos.items()}
+                          for filas, casos in datos['resultados'].items()})
+    print(f"mediana en ms ({datos['version'] or 'sin versión'}, {datos['fecha']})")
+    print(tabla.round(3).to_string())
+
+
+def comparar(actual, anterior, umbral, piso_ms=0.0):
+    """Casos más lentos que 'umbral' veces el informe anterior: [(filas, caso, factor)].
+
+    Se compara el mínimo, que varía menos entre ejecuciones que la mediana (esta
+    recoge las interrupciones de la máquina). El umbral de cada caso se
+    multiplica por la dispersión que tenía en el informe anterior, y los casos
+    que no llegan a 'piso_ms' en ninguno de los dos informes no cuentan.
+    """
+    peores = []
+    print(f"\nmínimo frente a {anterior['version'] or 'sin versión'} ({anterior['fecha']}):")
+    if anterior.get('parametros') != actual['parametros']:
+        print("⚠️  los parámetros no coinciden; la comparación es orientativa")
+    for filas, casos in actual['resultados'].items():
+        for caso, r in casos.items():
+            antes = anterior['resultados'].get(filas, {}).get(caso)
+            if not antes or not antes['min_ms']:
+                continue
+            factor = r['min_ms'] / antes['min_ms']
+            limite = umbral * max(1.0, antes['mediana_ms'] / antes['min_ms'])
+            ruido = max(r['min_ms'], antes['min_ms']) < piso_ms
+            regresion = factor > limite and not ruido
+            marca = "  ⚠️" if regresion else ("  (bajo el piso de ruido)" if ruido else "")
+            print(f"  {filas:>7} {caso:18} {antes['min_ms']:10.3f} → {r['min_ms']:10.3f} ms  "
+                  f"x{factor:.2f} (límite x{limite:.2f}){marca}")
+            if regresion:
+                peores.append((filas, caso, factor))
+    return peores
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filas", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--hogares", type=int, default=1, help="hogares que se cargan en 'cargar'")
+    parser.add_argument("--usuarios", type=int, default=5, help="usuarios por hogar")
+    parser.add_argument("--ratio-contador", type=float, default=0.3)
+    parser.add_argument("--ratio-puntual", type=float, default=0.5,
+                        help="parte de la tabla que son asignaciones del día")
+    parser.add_argument("--repeticiones", type=int, default=7)
+    parser.add_argument("--tiempo-minimo", type=float, default=0.05,
+                        help="segundos que dura como mínimo cada medición de las consultas")
+    parser.add_argument("--salida", help="fichero JSON donde guardar el informe")
+    parser.add_argument("--comparar", help="informe JSON anterior con el que comparar")
+    parser.add_argument("--umbral", type=float, default=1.25, help="factor a partir del cual es una regresión")
+    parser.add_argument("--piso-ms", type=float, default=0.2,
+                        help="casos más rápidos que esto no cuentan como regresión")
+    args = parser.parse_args(argv)
+
+    datos = informe(args)
+    mostrar(datos)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            json.dump(datos, f, ensure_ascii=False, indent=2)
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            peores = comparar(datos, json.load(f), args.umbral, args.piso_ms)
+        if peores:
+            sys.exit(f"{len(peores)} casos más lentos que x{args.umbral} frente al informe anterior")
+
+
+if __name__ == "__main__":
+    main()
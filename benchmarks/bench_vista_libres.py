@@ -0,0 +1,49 @@
+"""Compara el bucle iterrows original de 'Tareas Libres' con la vista vectorizada.
+
+Que dan las mismas filas lo comprueba tests/test_logica.py.
+
+Uso: python benchmarks/bench_vista_libres.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from logica import TIPOS_CONTADOR, calcular_indice_stock, vista_tareas_libres  # noqa: E402
+from datos_sinteticos import tabla_sintetica  # noqa: E402
+
+FILTRO = ['Hijos', 'Todos']
+
+
+def vista_por_fila(df, indice_stock):
+    """Lógica que antes iba mezclada con los widgets de app.py."""
+    filas = []
+    libres = df[(df['Responsable'] == 'Sin asignar') & (df['Para'].isin(FILTRO))]
+    for i, row in libres.iterrows():
+        stock = 1
+        if row['Tipo'] in TIPOS_CONTADOR:
+            if row['Frecuencia'] == 'Puntual': continue
+            stock = indice_stock.get(row['Tarea'], 0)
+            if stock <= 0: continue
+        badge = "🔢" if row['Tipo'] in TIPOS_CONTADOR else "📋"
+        txt = f"{badge} **{row['Tarea']}**"
+        if row['Tipo'] in TIPOS_CONTADOR:
+            txt += f"  \n*(Disponibles: {stock})*"
+        filas.append((i, txt))
+    return filas
+
+
+if __name__ == "__main__":
+    for n in (1_000, 10_000, 100_000):
+        df = tabla_sintetica(n, ratio_puntual=0.5)
+        indice = calcular_indice_stock(df)
+
+        t0 = time.perf_counter()
+        por_fila = vista_por_fila(df, indice)
+        t_fila = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        vista = vista_tareas_libres(df, FILTRO, indice)
+        t_vector = time.perf_counter() - t0
+
+        print(f"{n:>7} filas: iterrows {t_fila:.3f}s | vectorizado {t_vector:.3f}s")
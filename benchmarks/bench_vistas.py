@@ -0,0 +1,59 @@
+"""Vistas por usuario y grupo mantenidas por el almacén frente a filtrar con máscaras.
+
+Mide lo que cuesta preparar las listas de una página. Que las vistas
+coinciden con el filtrado tras cualquier secuencia de operaciones lo
+comprueba tests/test_almacen.py.
+Uso: python benchmarks/bench_vistas.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from almacen import AlmacenTareas  # noqa: E402
+from logica import calcular_indice_stock, vista_tareas_libres  # noqa: E402
+from persistencia import AsignadorIDs  # noqa: E402
+from datos_sinteticos import tabla_sintetica  # noqa: E402
+
+GRUPOS = [['Padres', 'Todos'], ['Hijos', 'Todos']]
+FILAS = 100_000
+REPETICIONES = 20
+
+
+def con_mascaras(df, usuario, grupo):
+    libres = vista_tareas_libres(df, grupo, calcular_indice_stock(df))
+    pendientes = df[(df['Responsable'] == usuario) & (df['Estado'] == 'Pendiente')]
+    finalizadas = df[(df['Responsable'] == usuario) & (df['Estado'] == 'Hecho')]
+    return libres, pendientes, finalizadas
+
+
+def con_vistas(almacen, usuario, grupo):
+    return almacen.tareas_libres(grupo), almacen.filas_de(usuario, 'Pendiente'), almacen.filas_de(usuario, 'Hecho')
+
+
+def medir(funcion, *args):
+    t0 = time.perf_counter()
+    for _ in range(REPETICIONES):
+        funcion(*args)
+    return (time.perf_counter() - t0) / REPETICIONES
+
+
+def rendimiento():
+    almacen = AlmacenTareas(tabla_sintetica(FILAS, ratio_puntual=0.2), ids=AsignadorIDs())
+    df = almacen.tabla()
+    libres, pendientes, finalizadas = con_vistas(almacen, 'Cris', GRUPOS[1])
+    print(f"{FILAS} filas ({len(libres)} libres, {len(pendientes)} pendientes, {len(finalizadas)} hechas)")
+    # Las listas del usuario por separado: la de libres cuesta sobre todo pintar su texto
+    t_mascaras = medir(lambda: (df[(df['Responsable'] == 'Cris') & (df['Estado'] == 'Pendiente')],
+                                df[(df['Responsable'] == 'Cris') & (df['Estado'] == 'Hecho')]))
+    t_vistas = medir(lambda: (almacen.filas_de('Cris', 'Pendiente'), almacen.filas_de('Cris', 'Hecho')))
+    print(f"mis listas:  máscaras {t_mascaras * 1000:7.1f} ms   vistas {t_vistas * 1000:7.1f} ms   "
+          f"×{t_mascaras / t_vistas:.1f}")
+    t_mascaras = medir(con_mascaras, df, 'Cris', GRUPOS[1])
+    t_vistas = medir(con_vistas, almacen, 'Cris', GRUPOS[1])
+    print(f"página:      máscaras {t_mascaras * 1000:7.1f} ms   vistas {t_vistas * 1000:7.1f} ms   "
+          f"×{t_mascaras / t_vistas:.1f}")
+
+
+if __name__ == '__main__':
+    rendimiento()
@@ -0,0 +1,70 @@
+"""Generador de tablas de tareas sintéticas con el mismo formato que la hoja."""
+import os
+import random
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from hogares import Hogar  # noqa: E402
+from logica import COLUMNAS  # noqa: E402
+
+USUARIOS = ["Papá", "Mamá", "Jesús", "Cris", "María"]
+FRANJAS = ["Mañana", "Mediodía", "Tarde", "Noche"]
+
+
+def tabla_sintetica(n, ratio_contador=0.3, ratio_puntual=0.5, semilla=0, usuarios=USUARIOS):
+    """Tabla de 'n' filas: maestras (Normal/Contador/Multi-Franja) y asignaciones 'Puntual'.
+
+    'ratio_puntual' es la parte de la tabla que son asignaciones del día (lo
+    que el reinicio borra y se vuelve a crear al día siguiente), repartidas
+    entre 'usuarios'.
+    """
+    rnd = random.Random(semilla)
+    n_puntual = int(n * ratio_puntual)
+    n_maestras = max(1, n - n_puntual)
+    filas = []
+    contadores = []
+    for i in range(n_maestras):
+        tipo = 'Normal'
+        if rnd.random() < ratio_contador:
+            tipo = rnd.choice(['Contador', 'Multi-Franja'])
+        tarea = f"Tarea {i}"
+        cantidad = rnd.randint(1, 10) if tipo != 'Normal' else 1
+        filas.append([len(filas) + 1, tarea, 'Diaria', tipo, rnd.choice(['Todos', 'Padres', 'Hijos']),
+                      'Sin asignar', 'Pendiente', '-', cantidad])
+        if tipo != 'Normal':
+            contadores.append(filas[-1])
+    for _ in range(n - n_maestras):
+        if contadores:
+            maestra = rnd.choice(contadores)
+            tarea, tipo, para = maestra[1], maestra[3], maestra[4]
+        else:
+            tarea, tipo, para = f"Tarea {rnd.randrange(n_maestras)}", 'Normal', 'Todos'
+        filas.append([len(filas) + 1, tarea, 'Puntual', tipo, para, rnd.choice(usuarios),
+                      rnd.choice(['Pendiente', 'Hecho']), rnd.choice(FRANJAS), 1])
+    return pd.DataFrame(filas, columns=COLUMNAS)
+
+
+def usuarios_sinteticos(n):
+    """Los usuarios de siempre o, si hacen falta más, 'Usuario 1'...'Usuario n'."""
+    return USUARIOS[:n] if n <= len(USUARIOS) else [f"Usuario {i + 1}" for i in range(n)]
+
+
+def hogares_sinteticos(n_hogares, filas, n_usuarios=5, semilla=0, **opciones):
+    """{id: (Hogar, tabla)} con 'n_hogares' hogares de 'filas' filas cada uno.
+
+    Cada hogar tiene su propia tabla (otra semilla) y sus usuarios; los dos
+    primeros administran. 'opciones' van a tabla_sintetica.
+    """
+    usuarios = usuarios_sinteticos(n_usuarios)
+    hogares = {}
+    for n in range(n_hogares):
+        hogar = Hogar(f"hogar{n}", nombre=f"Hogar {n}", usuarios=usuarios, admins=usuarios[:2])
+        hogares[hogar.id] = (hogar, tabla_sintetica(filas, semilla=semilla + n, usuarios=usuarios, **opciones))
+    return hogares
+
+
+def mismas_filas(a, b):
+    """Mismos valores en el mismo orden, sin mirar dtypes (categorías, int32...) ni el índice."""
+    return list(a.columns) == list(b.columns) and a.values.tolist() == b.values.tolist()
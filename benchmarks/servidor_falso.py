@@ -0,0 +1,92 @@
+"""Servidor HTTP local que imita los límites de la API de Sheets.
+
+Responde a GET (lectura) y POST (escritura) con latencia configurable y
+devuelve 429 si se pasa de la cuota por segundo o al azar con 'prob_429',
+y 503 mientras 'caido' sea True. Sirve para probar GestorConexiones sin red.
+"""
+import json
+import random
+import threading
+import time
+import urllib.request
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class ServidorFalso:
+    def __init__(self, latencia=0.01, cuota_por_segundo=50, prob_429=0.0, semilla=0):
+        self.latencia = latencia
+        self.cuota_por_segundo = cuota_por_segundo
+        self.prob_429 = prob_429
+        self.caido = False
+        self.atendidas = 0
+        self.errores_429 = 0
+        self.errores_503 = 0
+        self._rnd = random.Random(semilla)
+        self._recientes = deque()
+        self._lock = threading.Lock()
+        servidor = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            def _responder(self):
+                codigo = servidor._decidir()
+                time.sleep(servidor.latencia)
+                cuerpo = json.dumps({'ok': codigo == 200}).encode()
+                self.send_response(codigo)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            do_GET = _responder
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                self._responder()
+
+            def log_message(self, *args):
+                pass
+
+        self._http = ThreadingHTTPServer(('127.0.0.1', 0), Manejador)
+        self._http.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._http.server_port}"
+        self._hilo = threading.Thread(target=self._http.serve_forever, daemon=True)
+
+    def _decidir(self):
+        with self._lock:
+            if self.caido:
+                self.errores_503 += 1
+                return 503
+            ahora = time.monotonic()
+            while self._recientes and ahora - self._recientes[0] > 1.0:
+                self._recientes.popleft()
+            if len(self._recientes) >= self.cuota_por_segundo or self._rnd.random() < self.prob_429:
+                self.errores_429 += 1
+                return 429
+            self._recientes.append(ahora)
+            self.atendidas += 1
+            return 200
+
+    def __enter__(self):
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._http.shutdown()
+        self._http.server_close()
+
+
+class ClienteHTTP:
+    """Cliente mínimo del servidor falso (hace de 'conexión' del pool)."""
+
+    def __init__(self, url):
+        self.url = url
+
+    def leer(self):
+        with urllib.request.urlopen(self.url + '/leer', timeout=10) as r:
+            return json.loads(r.read())
+
+    def escribir(self, datos):
+        peticion = urllib.request.Request(self.url + '/escribir', data=json.dumps(datos).encode(), method='POST')
+        with urllib.request.urlopen(peticion, timeout=10) as r:
+            return json.loads(r.read())
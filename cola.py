@@ -0,0 +1,218 @@
+import json
+import os
+import random
+import threading
+import time
+
+from persistencia import ConflictoConcurrencia, Delta, fusionar_deltas
+
+# ==========================================
+# ESCRITURA DIFERIDA (WRITE-BEHIND)
+# ==========================================
+# El clic aplica el cambio en local y lo deja en una cola en disco; un hilo
+# en segundo plano junta los cambios pendientes y los envía por lotes, así que
+# la latencia del clic no depende de la API de Google Sheets.
+
+
+class ColaLlena(Exception):
+    """Demasiados cambios sin enviar: se frena al usuario en lugar de crecer sin límite."""
+
+
+class ColaSinEnviar(Exception):
+    """vaciar() no ha podido enviar todo y la operación necesita la cola vacía."""
+
+
+class ColaDetenida(Exception):
+    """La cola ya se ha detenido (p.ej. su hogar se ha descargado): el cambio no se enviaría."""
+
+
+class ColaEscritura:
+    """Cola duradera de deltas con envío por lotes, reintentos y contrapresión.
+
+    - Cada delta se añade a 'ruta' (una línea JSON) antes de confirmar el clic,
+      así que si el proceso se reinicia los cambios pendientes se reenvían.
+    - Cada 'intervalo' segundos se fusionan hasta 'max_lote' deltas en uno.
+    - Si el backend falla, se reintenta con espera exponencial con jitter.
+    - Si el lote choca con cambios de otra sesión, se envían uno a uno y los
+      que siguen en conflicto se descartan (quedan contados en el estado).
+    - Con 'max_pendientes' en cola, encolar() espera hasta 'espera_max' y
+      después lanza ColaLlena.
+    - Después de detener() encolar() lanza ColaDetenida: el cambio no se
+      escribe en 'ruta', que puede ser ya de otra cola.
+    - Tras cada lote se llama a 'al_enviar(descartados, escrituras)', si se
+      indica; 'escrituras' es cuántas llamadas al backend han guardado algo.
+    """
+
+    def __init__(self, backend, ruta='cola_escrituras.jsonl', intervalo=2.0, max_lote=50,
+                 max_pendientes=500, espera_max=5.0, espera_base=1.0, espera_tope=60.0,
+                 al_enviar=None):
+        self.backend = backend
+        self.ruta = ruta
+        self.intervalo = intervalo
+        self.max_lote = max_lote
+        self.max_pendientes = max_pendientes
+        self.espera_max = espera_max
+        self.espera_base = espera_base
+        self.espera_tope = espera_tope
+        self.al_enviar = al_enviar
+        self.enviados = 0
+        self.lotes = 0
+        self.descartados = 0
+        self.reintentos = 0
+        self.ultimo_error = None
+        self.ultimo_envio = None
+        self.proximo_intento = 0.0
+        self._pendientes = self._leer_disco()
+        self._cond = threading.Condition()
+        self._parar = False
+        self._urgente = False
+        self._hilo = threading.Thread(target=self._bucle, name="cola-escritura", daemon=True)
+        self._hilo.start()
+
+    # --- Disco ---
+    def _leer_disco(self):
+        if not os.path.exists(self.ruta):
+            return []
+        with open(self.ruta, encoding='utf-8') as f:
+            return [Delta.desde_dict(json.loads(linea)) for linea in f if linea.strip()]
+
+    def _reescribir_disco(self):
+        temporal = self.ruta + '.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            for delta in self._pendientes:
+                f.write(json.dumps(delta.a_dict(), default=str, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporal, self.ruta)
+
+    # --- API ---
+    def encolar(self, delta):
+        if delta.vacio:
+            return
+        with self._cond:
+            limite = time.monotonic() + self.espera_max
+            while not self._parar and len(self._pendientes) >= self.max_pendientes:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    raise ColaLlena(f"{len(self._pendientes)} cambios sin enviar")
+                self._cond.wait(restante)
+            if self._parar:
+                raise ColaDetenida("El hogar se ha vuelto a cargar; el cambio no se ha guardado")
+            with open(self.ruta, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(delta.a_dict(), default=str, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self._pendientes.append(delta)
+            self._cond.notify_all()
+
+    def vaciar(self, timeout=30.0):
+        """Espera a que se envíe todo lo pendiente (p.ej. antes de un reinicio diario)."""
+        limite = time.monotonic() + timeout
+        with self._cond:
+            self.proximo_intento = 0.0
+            self._urgente = True
+            self._cond.notify_all()
+            while self._pendientes and time.monotonic() < limite:
+                self._cond.wait(0.05)
+            if self._pendientes:
+                # Sin enviar a tiempo: el hilo vuelve a su ritmo (y a su espera si el backend falla)
+                self._urgente = False
+            return not self._pendientes
+
+    def detener(self):
+        with self._cond:
+            self._parar = True
+            self._cond.notify_all()
+        self._hilo.join()
+
+    def estado(self):
+        with self._cond:
+            return {
+                'pendientes': len(self._pendientes),
+                'enviados': self.enviados,
+                'lotes': self.lotes,
+                'descartados': self.descartados,
+                'reintentos': self.reintentos,
+                'ultimo_error': self.ultimo_error,
+                'ultimo_envio': self.ultimo_envio,
+                'reintento_en': max(0.0, self.proximo_intento - time.monotonic()),
+            }
+
+    # --- Hilo de envío ---
+    def _bucle(self):
+        fallos_seguidos = 0
+        while True:
+            with self._cond:
+                # Se espera el intervalo completo para juntar clics en un mismo lote
+                fin = time.monotonic() + self.intervalo
+                while not (self._parar or self._urgente) and time.monotonic() < fin:
+                    self._cond.wait(fin - time.monotonic())
+                if not self._pendientes:
+                    self._urgente = False
+                if self._parar and not self._pendientes:
+                    return
+                if not self._pendientes:
+                    continue
+                espera = self.proximo_intento - time.monotonic()
+                if espera > 0:
+                    # Backend caído: se duerme hasta el reintento, también con prisa
+                    # (vaciar() lo adelanta y despierta al hilo)
+                    self._cond.wait(espera)
+                    continue
+                lote = self._pendientes[:self.max_lote]
+            try:
+                descartados, escrituras = self._enviar(lote)
+            except Exception as e:
+                fallos_seguidos += 1
+                espera = min(self.espera_tope, self.espera_base * 2 ** (fallos_seguidos - 1))
+                with self._cond:
+                    self.reintentos += 1
+                    self.ultimo_error = str(e)
+                    self.proximo_intento = time.monotonic() + espera * random.uniform(0.5, 1.0)
+                continue
+            fallos_seguidos = 0
+            with self._cond:
+                del self._pendientes[:len(lote)]
+                self._reescribir_disco()
+                self.enviados += len(lote) - descartados
+                self.descartados += descartados
+                self.lotes += 1
+                self.ultimo_error = None
+                self.ultimo_envio = time.time()
+                self._cond.notify_all()
+            if self.al_enviar is not None:
+                self.al_enviar(descartados, escrituras)
+
+    def _enviar(self, lote):
+        """Envía el lote fusionado; si hay conflicto, delta a delta.
+
+        Devuelve (descartados, escrituras que han llegado al backend).
+        """
+        fusionado = fusionar_deltas(lote)
+        try:
+            self.backend.aplicar_delta(fusionado)
+            return 0, 0 if fusionado.vacio else 1
+        except ConflictoConcurrencia:
+            pass
+        descartados = escrituras = 0
+        for delta in lote:
+            try:
+                self.backend.aplicar_delta(delta)
+                escrituras += not delta.vacio
+            except ConflictoConcurrencia:
+                descartados += 1
+        return descartados, escrituras
+
+
+def ejecutar_diferido(almacen, operacion, cola):
+    """Como ejecutar_con_reintentos, pero deja el delta en la cola en vez de
+    esperar al backend. Devuelve (almacén, delta encolado)."""
+    try:
+        operacion(almacen)
+        delta = almacen.cambios_pendientes()
+        cola.encolar(delta)
+        almacen.confirmar()
+        return almacen, delta
+    except Exception:
+        almacen.revertir()
+        raise
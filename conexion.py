@@ -0,0 +1,307 @@
+import queue
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# ==========================================
+# ACCESO CONTROLADO A LA API DE GOOGLE SHEETS
+# ==========================================
+# Todas las peticiones a la API pasan por un GestorConexiones que:
+# - presta conexiones de un pool acotado (como mucho 'tam_pool' en uso);
+# - reparte las peticiones con un cubo de tokens por tipo (lectura/escritura)
+#   al ritmo de la cuota de la API, en lugar de chocar con ella;
+# - reintenta los 429 y errores de servidor con espera exponencial con jitter;
+# - corta las llamadas (disyuntor) cuando la API lleva varios fallos seguidos,
+#   para que las sesiones no se queden esperando a un servicio caído;
+# - cuenta peticiones, reintentos, errores y latencias.
+
+# Cuota por defecto de Sheets: 60 lecturas y 60 escrituras por minuto y usuario
+LECTURAS_POR_MINUTO = 60
+ESCRITURAS_POR_MINUTO = 60
+CODIGOS_REINTENTABLES = {429, 500, 502, 503, 504}
+
+
+class CircuitoAbierto(Exception):
+    """La API ha fallado varias veces seguidas: no se llama hasta que pase el enfriamiento."""
+
+    def __init__(self, reintento_en):
+        super().__init__(f"Servicio no disponible; se reintentará en {reintento_en:.0f}s")
+        self.reintento_en = reintento_en
+
+
+class SinConexion(Exception):
+    """No ha quedado libre ninguna conexión del pool a tiempo."""
+
+
+def codigo_http(e):
+    """Código HTTP de un error de gspread, requests o urllib (None si no lo tiene)."""
+    codigo = getattr(e, 'code', None)
+    if codigo is None:
+        codigo = getattr(getattr(e, 'response', None), 'status_code', None)
+    try:
+        return int(codigo)
+    except (TypeError, ValueError):
+        return None
+
+
+def es_fallo_servicio(e):
+    """Error del servicio (cuota, servidor o red), no de la petición en sí."""
+    codigo = codigo_http(e)
+    if codigo is not None:
+        return codigo in CODIGOS_REINTENTABLES
+    return isinstance(e, (ConnectionError, TimeoutError, OSError))
+
+
+def espera_indicada(e):
+    """Segundos de la cabecera Retry-After, si el servidor la manda."""
+    cabeceras = getattr(getattr(e, 'response', None), 'headers', None) or getattr(e, 'headers', None) or {}
+    try:
+        return float(cabeceras.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+class CuboTokens:
+    """'por_segundo' tokens por segundo con ráfagas de hasta 'capacidad'."""
+
+    def __init__(self, por_segundo, capacidad, reloj=time.monotonic):
+        self.por_segundo = por_segundo
+        self.capacidad = capacidad
+        self.reloj = reloj
+        self._tokens = float(capacidad)
+        self._ultimo = reloj()
+        self._lock = threading.Lock()
+
+    def _rellenar(self):
+        ahora = self.reloj()
+        self._tokens = min(self.capacidad, self._tokens + (ahora - self._ultimo) * self.por_segundo)
+        self._ultimo = ahora
+
+    def reservar(self, n=1):
+        """Gasta 'n' tokens y devuelve cuántos segundos hay que esperar a que existan."""
+        with self._lock:
+            self._rellenar()
+            self._tokens -= n
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.por_segundo
+
+    def intentar(self, n=1):
+        """Gasta 'n' tokens si los hay ya; si no, no gasta nada y devuelve False."""
+        with self._lock:
+            self._rellenar()
+            if self._tokens < n:
+                return False
+            self._tokens -= n
+            return True
+
+    def tomar(self, n=1):
+        """Espera a que haya 'n' tokens. Devuelve los segundos esperados."""
+        espera = self.reservar(n)
+        if espera:
+            time.sleep(espera)
+        return espera
+
+
+class Disyuntor:
+    """Circuit breaker: 'umbral' fallos seguidos lo abren durante 'enfriamiento' segundos.
+
+    Pasado el enfriamiento deja pasar una sola petición de prueba (semiabierto):
+    si sale bien se cierra y si falla vuelve a abrirse.
+    """
+
+    def __init__(self, umbral=5, enfriamiento=30.0, reloj=time.monotonic):
+        self.umbral = umbral
+        self.enfriamiento = enfriamiento
+        self.reloj = reloj
+        self.estado = 'cerrado'
+        self.aperturas = 0
+        self._fallos = 0
+        self._abierto_hasta = 0.0
+        self._probando = False
+        self._lock = threading.Lock()
+
+    def permitir(self):
+        """Lanza CircuitoAbierto si no se puede llamar ahora; True si es la petición de prueba."""
+        with self._lock:
+            if self.estado == 'cerrado':
+                return False
+            ahora = self.reloj()
+            if self.estado == 'abierto' and ahora >= self._abierto_hasta:
+                self.estado = 'semiabierto'
+                self._probando = False
+            if self.estado == 'semiabierto' and not self._probando:
+                self._probando = True
+                return True
+            raise CircuitoAbierto(max(0.0, self._abierto_hasta - ahora))
+
+    def exito(self):
+        with self._lock:
+            self._fallos = 0
+            self._probando = False
+            self.estado = 'cerrado'
+
+    def fallo(self):
+        with self._lock:
+            self._fallos += 1
+            self._probando = False
+            if self.estado == 'semiabierto' or self._fallos >= self.umbral:
+                if self.estado != 'abierto':
+                    self.aperturas += 1
+                self.estado = 'abierto'
+                self._abierto_hasta = self.reloj() + self.enfriamiento
+
+    def reintento_en(self):
+        with self._lock:
+            if self.estado != 'abierto':
+                return 0.0
+            return max(0.0, self._abierto_hasta - self.reloj())
+
+
+class GestorConexiones:
+    """Pool de conexiones creadas con 'crear()' y peticiones con cuota, reintentos y disyuntor.
+
+    Uso:
+        with gestor.conexion() as conn:
+            datos = gestor.peticion('lectura', lambda: conn.leer(...))
+
+    Las lecturas se reintentan ante cualquier fallo del servicio; las escrituras
+    solo ante 429, porque un 5xx o un corte de red no dicen si la escritura
+    llegó a hacerse y repetirla podría duplicar filas.
+
+    Los sondeos en segundo plano (réplicas de todos los hogares) comparten
+    además un presupuesto de 'fraccion_sondeo' de las lecturas: permitir_sondeo()
+    dice si queda, sin esperar, para que nunca hagan cola delante de los usuarios.
+    """
+
+    def __init__(self, crear, tam_pool=4, lecturas_por_minuto=LECTURAS_POR_MINUTO,
+                 escrituras_por_minuto=ESCRITURAS_POR_MINUTO, rafaga=10, intentos=5,
+                 espera_base=0.5, espera_tope=30.0, umbral_fallos=5, enfriamiento=30.0,
+                 espera_pool=30.0, muestras_latencia=1000, fraccion_sondeo=0.25):
+        self.crear = crear
+        self.tam_pool = tam_pool
+        self.intentos = intentos
+        self.espera_base = espera_base
+        self.espera_tope = espera_tope
+        self.espera_pool = espera_pool
+        self.cubos = {
+            'lectura': CuboTokens(lecturas_por_minuto / 60.0, rafaga),
+            'escritura': CuboTokens(escrituras_por_minuto / 60.0, rafaga),
+        }
+        self.sondeo = CuboTokens(lecturas_por_minuto * fraccion_sondeo / 60.0, 1)
+        self.disyuntor = Disyuntor(umbral_fallos, enfriamiento)
+        self._libres = queue.LifoQueue()
+        self._creadas = 0
+        self._en_uso = 0
+        self._lock = threading.Lock()
+        self._latencias = deque(maxlen=muestras_latencia)
+        self._contadores = {
+            'peticiones': 0, 'lecturas': 0, 'escrituras': 0, 'reintentos': 0, 'fallos': 0,
+            'rechazadas': 0, 'errores_429': 0, 'errores_5xx': 0, 'espera_cuota': 0.0,
+            'espera_pool': 0.0, 'sondeos_omitidos': 0,
+        }
+
+    def _contar(self, clave, n=1):
+        with self._lock:
+            self._contadores[clave] += n
+
+    # --- Pool ---
+    @contextmanager
+    def conexion(self):
+        """Presta una conexión; se crean bajo demanda hasta 'tam_pool'."""
+        t0 = time.monotonic()
+        conn = None
+        with self._lock:
+            if self._libres.empty() and self._creadas < self.tam_pool:
+                self._creadas += 1
+                crear = True
+            else:
+                crear = False
+        if crear:
+            try:
+                conn = self.crear()
+            except Exception:
+                with self._lock:
+                    self._creadas -= 1
+                raise
+        else:
+            try:
+                conn = self._libres.get(timeout=self.espera_pool)
+            except queue.Empty:
+                raise SinConexion(f"Las {self.tam_pool} conexiones siguen ocupadas") from None
+        with self._lock:
+            self._en_uso += 1
+            self._contadores['espera_pool'] += time.monotonic() - t0
+        try:
+            yield conn
+        finally:
+            with self._lock:
+                self._en_uso -= 1
+            self._libres.put(conn)
+
+    def permitir_sondeo(self):
+        """True si un sondeo en segundo plano puede leer ahora; si no, se salta esa vuelta."""
+        if self.sondeo.intentar():
+            return True
+        self._contar('sondeos_omitidos')
+        return False
+
+    # --- Peticiones ---
+    def _espera(self, intento, error):
+        indicada = espera_indicada(error)
+        if indicada is not None:
+            return indicada
+        # Full jitter: reparte los reintentos de varias sesiones en el tiempo
+        return random.uniform(0, min(self.espera_tope, self.espera_base * 2 ** intento))
+
+    def peticion(self, tipo, funcion, coste=1):
+        """Ejecuta 'funcion()' (una llamada a la API) respetando cuota, reintentos y disyuntor."""
+        for intento in range(self.intentos):
+            try:
+                prueba = self.disyuntor.permitir()
+            except CircuitoAbierto:
+                self._contar('rechazadas')
+                raise
+            self._contar('espera_cuota', self.cubos[tipo].tomar(coste))
+            t0 = time.monotonic()
+            try:
+                resultado = funcion()
+            except Exception as e:
+                if not es_fallo_servicio(e):
+                    # Error de la propia petición (404, datos...): el servicio responde bien
+                    self.disyuntor.exito()
+                    raise
+                codigo = codigo_http(e)
+                self._contar('errores_429' if codigo == 429 else 'errores_5xx')
+                # La prueba del semiabierto no se reintenta: su fallo vuelve a abrir el circuito
+                reintentable = (codigo == 429 or tipo == 'lectura') and not prueba
+                if not reintentable or intento == self.intentos - 1:
+                    self._contar('fallos')
+                    self.disyuntor.fallo()
+                    raise
+                self._contar('reintentos')
+                time.sleep(self._espera(intento, e))
+                continue
+            with self._lock:
+                self._latencias.append(time.monotonic() - t0)
+                self._contadores['peticiones'] += 1
+                self._contadores['lecturas' if tipo == 'lectura' else 'escrituras'] += 1
+            self.disyuntor.exito()
+            return resultado
+
+    def metricas(self):
+        with self._lock:
+            latencias = sorted(self._latencias)
+            datos = dict(self._contadores)
+            datos['conexiones'] = self._creadas
+            datos['en_uso'] = self._en_uso
+        datos['tam_pool'] = self.tam_pool
+        datos['circuito'] = self.disyuntor.estado
+        datos['aperturas'] = self.disyuntor.aperturas
+        datos['reintento_en'] = self.disyuntor.reintento_en()
+        if latencias:
+            datos['latencia_media_ms'] = 1000 * sum(latencias) / len(latencias)
+            datos['latencia_p95_ms'] = 1000 * latencias[int(0.95 * (len(latencias) - 1))]
+        else:
+            datos['latencia_media_ms'] = datos['latencia_p95_ms'] = 0.0
+        return datos
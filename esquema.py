@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+
+from logica import COLUMNAS
+
+# ==========================================
+# ESQUEMA DE LA TABLA DE TAREAS
+# ==========================================
+# conn.read() devuelve todo como object (o float si hay huecos). Al cargar se
+# fijan los tipos: los textos que se repiten (responsable, estado, franja...)
+# como categorías, e ID y Cantidad como int32. Ocupa varias veces menos y las
+# comparaciones de la app (df['Responsable'] == usuario) trabajan sobre
+# códigos enteros. Al guardar se vuelve a tipos simples.
+
+COLUMNAS_CATEGORIA = ['Tarea', 'Frecuencia', 'Tipo', 'Para', 'Responsable', 'Estado', 'Franja']
+COLUMNAS_ENTERAS = ['ID', 'Cantidad']
+TIPO_ENTERO = 'int32'
+
+
+class ErrorEsquema(ValueError):
+    """La hoja no tiene el formato esperado (columnas que faltan, IDs inválidos...)."""
+
+
+def _enteros(serie, columna, vacio=None):
+    """Convierte a int32; 'vacio' es el valor para celdas vacías o '-' (None = no se admiten)."""
+    limite = np.iinfo(TIPO_ENTERO)
+    if pd.api.types.is_integer_dtype(serie.dtype):
+        # Ya son enteros (tabla generada por la app): solo falta el rango
+        if len(serie) and (serie.min() < limite.min or serie.max() > limite.max):
+            raise ErrorEsquema(f"'{columna}' se sale del rango de {TIPO_ENTERO}")
+        return serie.astype(TIPO_ENTERO)
+    texto = serie.astype(str).str.strip()
+    vacias = serie.isna() | texto.isin(['', '-', 'nan'])
+    numeros = pd.to_numeric(serie.where(~vacias), errors='coerce')
+    malas = numeros.isna() & ~vacias
+    if vacio is None:
+        malas |= vacias
+    malas |= numeros.notna() & (numeros != numeros.round())
+    if malas.any():
+        ejemplos = ", ".join(repr(v) for v in serie[malas].head(3))
+        raise ErrorEsquema(f"Valores no válidos en '{columna}' ({int(malas.sum())} filas): {ejemplos}")
+    numeros = numeros.fillna(vacio if vacio is not None else 0)
+    if len(numeros) and (numeros.min() < limite.min or numeros.max() > limite.max):
+        raise ErrorEsquema(f"'{columna}' se sale del rango de {TIPO_ENTERO}")
+    return numeros.astype(TIPO_ENTERO)
+
+
+def _categoria(serie):
+    # factorize + from_codes es varias veces más rápido que astype('category')
+    codigos, valores = pd.factorize(serie)
+    return pd.Categorical.from_codes(codigos, valores)
+
+
+def aplicar_esquema(df, validar=True):
+    """Tabla con los tipos compactos. Con 'validar' comprueba columnas e IDs únicos.
+
+    Las celdas vacías de texto quedan como '-', igual que hacía fillna("-").
+    """
+    if validar:
+        faltan = [c for c in COLUMNAS if c not in df.columns]
+        if faltan and len(df.columns):
+            raise ErrorEsquema(f"Faltan columnas en la hoja: {', '.join(faltan)}")
+    if df.empty and not len(df.columns):
+        return df
+    df = df.copy()
+    for c in COLUMNAS_CATEGORIA:
+        if c not in df.columns or isinstance(df[c].dtype, pd.CategoricalDtype):
+            continue
+        serie = df[c]
+        if not (pd.api.types.is_string_dtype(serie.dtype) and not serie.isna().any()):
+            serie = serie.astype(object).where(serie.notna(), '-').astype(str)
+        df[c] = _categoria(serie)
+    if 'ID' in df.columns:
+        df['ID'] = _enteros(df['ID'], 'ID')
+        if validar and df['ID'].duplicated().any():
+            repetidos = df.loc[df['ID'].duplicated(), 'ID'].head(3).tolist()
+            raise ErrorEsquema(f"IDs duplicados en la hoja: {repetidos}")
+    if 'Cantidad' in df.columns:
+        df['Cantidad'] = _enteros(df['Cantidad'], 'Cantidad', vacio=0)
+    return df
+
+
+def quitar_esquema(df):
+    """Vuelta a tipos simples (texto y enteros de Python) para escribir en la hoja."""
+    df = df.copy()
+    for c in df.columns:
+        if isinstance(df[c].dtype, pd.CategoricalDtype):
+            df[c] = df[c].astype(object)
+        elif c in COLUMNAS_ENTERAS and pd.api.types.is_integer_dtype(df[c]):
+            df[c] = df[c].astype('int64')
+    return df
+
+
+def conservar_tipos(df, referencia):
+    """Devuelve 'df' con los tipos compactos de 'referencia' (tras un concat o un alta)."""
+    for c in df.columns:
+        if c not in referencia.columns:
+            continue
+        tipo = referencia[c].dtype
+        if isinstance(tipo, pd.CategoricalDtype) and not isinstance(df[c].dtype, pd.CategoricalDtype):
+            df[c] = _categoria(df[c].astype(str))
+        elif c in COLUMNAS_ENTERAS and tipo == TIPO_ENTERO and df[c].dtype != TIPO_ENTERO:
+            df[c] = pd.to_numeric(df[c], errors='coerce').fillna(0).astype(TIPO_ENTERO)
+    return df
+
+
+def asignar_en_categoria(df, mascara, columna, valores):
+    """df.loc[mascara, columna] = valores, añadiendo antes las categorías nuevas."""
+    if isinstance(df[columna].dtype, pd.CategoricalDtype):
+        nuevas = set(valores) - set(df[columna].cat.categories)
+        if nuevas:
+            df[columna] = df[columna].cat.add_categories(sorted(nuevas, key=str))
+    elif pd.api.types.is_integer_dtype(df[columna].dtype):
+        # pandas no convierte solo una lista de int64 a la columna compacta
+        valores = pd.to_numeric(pd.Series(valores), errors='coerce').fillna(0).astype(df[columna].dtype).to_numpy()
+    df.loc[mascara, columna] = valores
@@ -0,0 +1,132 @@
+"""Las tareas del hogar desde la terminal, con el mismo núcleo que la app.
+
+Usa la configuración GESTI_* de la app (o --backend/--sqlite). Google Sheets
+necesita la conexión de Streamlit, así que aquí solo sirven 'sqlite' y
+'normalizado'.
+
+  python gesti.py --usuario Papá libres
+  python gesti.py --usuario Papá asignar 12 Tarde
+  python gesti.py --usuario Papá --hogar garcia pendientes
+  python gesti.py --usuario Mamá nueva "Poner lavadora" --tipo Contador --cantidad 2
+"""
+import argparse
+import sys
+
+from almacen import TareaNoDisponible
+from cola import ColaSinEnviar
+from hogares import cargar_hogares
+from recurrencias import DIAS_SEMANA, Regla
+from servicio import Configuracion, Sesion, SinPermiso, crear_inquilino
+
+FRANJAS = ["Mañana", "Mediodía", "Tarde", "Noche"]
+COLUMNAS_LISTA = ['ID', 'Tarea', 'Tipo', 'Para', 'Responsable', 'Estado', 'Franja', 'Cantidad']
+
+
+def _regla(args, dia):
+    if args.frecuencia == 'semanal':
+        return Regla('semanal', dias=sorted(DIAS_SEMANA.index(d) for d in args.dias or ['L']))
+    if args.frecuencia == 'mensual':
+        return Regla('mensual', dia=args.dia_mes)
+    if args.frecuencia == 'cada':
+        return Regla('cada', n=args.cada, ancla=dia)
+    return Regla('diaria')
+
+
+def _mostrar(tabla, columnas=COLUMNAS_LISTA):
+    if tabla.empty:
+        print("(ninguna)")
+    else:
+        print(tabla[[c for c in columnas if c in tabla.columns]].to_string(index=False))
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(prog="gesti", description="Tareas del hogar desde la terminal")
+    parser.add_argument("--usuario", help="quién usa la app (por defecto el primero del hogar)")
+    parser.add_argument("--hogar", help="id del hogar (hace falta si hay varios)")
+    parser.add_argument("--backend", choices=["sqlite", "normalizado"], help="manda sobre GESTI_BACKEND")
+    parser.add_argument("--sqlite", help="ruta del .db (manda sobre GESTI_SQLITE)")
+    ordenes = parser.add_subparsers(dest="orden", required=True)
+
+    ordenes.add_parser("libres", help="tareas que puedes coger hoy")
+    ordenes.add_parser("pendientes", help="tus tareas pendientes")
+    ordenes.add_parser("hechas", help="tus tareas terminadas")
+    ordenes.add_parser("resumen", help="la tabla entera")
+    p = ordenes.add_parser("stock", help="unidades libres de un contador")
+    p.add_argument("tarea")
+    p = ordenes.add_parser("asignar", help="coger una tarea libre")
+    p.add_argument("id", type=int)
+    p.add_argument("franja", choices=FRANJAS)
+    for orden, ayuda in (("completar", "marcar como hecha"), ("liberar", "soltar una tarea"),
+                         ("reabrir", "deshacer un 'hecha'")):
+        ordenes.add_parser(orden, help=ayuda).add_argument("id", type=int)
+
+    p = ordenes.add_parser("nueva", help="crear una tarea (admin)")
+    p.add_argument("tarea")
+    p.add_argument("--para", choices=["Todos", "Padres", "Hijos"], default="Todos")
+    p.add_argument("--tipo", choices=["Normal", "Contador", "Multi-Franja"], default="Normal")
+    p.add_argument("--cantidad", type=int, default=1)
+    p.add_argument("--frecuencia", choices=["diaria", "semanal", "mensual", "cada"], default="diaria")
+    p.add_argument("--dias", nargs="+", choices=DIAS_SEMANA, help="días de la semana (semanal)")
+    p.add_argument("--dia-mes", type=int, default=1, help="día del mes (mensual)")
+    p.add_argument("--cada", type=int, default=2, help="cada cuántos días (cada)")
+    p = ordenes.add_parser("ajustar", help="cambiar el objetivo de un contador (admin)")
+    p.add_argument("id", type=int)
+    p.add_argument("cantidad", type=int)
+    ordenes.add_parser("reinicio", help="cerrar el día a mano (admin)")
+    return parser
+
+
+def ejecutar(sesion, args):
+    """Hace la orden de 'args' con la sesión e imprime el resultado."""
+    if args.orden == "libres":
+        _mostrar(sesion.libres(), ['ID', 'Texto'])
+    elif args.orden == "pendientes":
+        _mostrar(sesion.pendientes())
+    elif args.orden == "hechas":
+        _mostrar(sesion.finalizadas())
+    elif args.orden == "resumen":
+        _mostrar(sesion.tabla())
+    elif args.orden == "stock":
+        print(sesion.stock(args.tarea))
+    elif args.orden == "asignar":
+        sesion.asignar(args.id, args.franja)
+    elif args.orden in ("completar", "liberar", "reabrir"):
+        getattr(sesion, args.orden)(args.id)
+    elif args.orden == "nueva":
+        sesion.nueva_tarea(args.tarea, args.para, args.tipo, args.cantidad, _regla(args, sesion.dia()))
+    elif args.orden == "ajustar":
+        sesion.ajustar_cantidad(args.id, args.cantidad)
+    elif args.orden == "reinicio":
+        sesion.reinicio_diario()
+
+
+def main(argv=None):
+    args = crear_parser().parse_args(argv)
+    opciones = {k: v for k, v in (('backend', args.backend), ('ruta_sqlite', args.sqlite)) if v}
+    conf = Configuracion.desde_entorno(**opciones)
+    if conf.usa_gsheets():
+        sys.exit("La CLI no puede usar Google Sheets: elige --backend sqlite o normalizado "
+                 "(con el normalizado, GESTI_MIGRAR_DESDE='' o un CSV).")
+    hogares = cargar_hogares(conf.ruta_hogares)
+    id_hogar = args.hogar or (next(iter(hogares)) if len(hogares) == 1 else None)
+    if id_hogar is None:
+        sys.exit(f"Hay varios hogares; elige uno con --hogar ({', '.join(hogares)})")
+    if id_hogar not in hogares:
+        sys.exit(f"No existe el hogar '{id_hogar}'.")
+    inquilino = crear_inquilino(hogares[id_hogar], conf)
+    try:
+        # Sin la app en marcha nadie más hace el reinicio automático: si toca, se hace ahora
+        if inquilino.planificador is not None:
+            inquilino.planificador.comprobar()
+        sesion = Sesion(inquilino, args.usuario)
+        sesion.al_dia()
+        ejecutar(sesion, args)
+    except (ValueError, SinPermiso, TareaNoDisponible, ColaSinEnviar) as e:
+        sys.exit(f"❌ {e}")
+    finally:
+        # Con escritura diferida, los cambios se envían antes de salir
+        inquilino.cerrar()
+
+
+if __name__ == "__main__":
+    main()
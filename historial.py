@@ -0,0 +1,286 @@
+import json
+import os
+import threading
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# ==========================================
+# HISTORIAL DE TAREAS HECHAS (SOLO AÑADIR)
+# ==========================================
+# Una carpeta por día y un fichero binario por columna. Los textos se guardan
+# como códigos int32 de un diccionario común (una línea JSON por texto), así
+# que añadir filas es escribir unos bytes al final de cada fichero y leer un
+# rango de días es un np.fromfile por columna, sin cargar todo el historial.
+#
+# Lo que se completa durante el día se apunta al momento (con su hora) en
+# hechas_del_dia.jsonl y se pasa a la partición del día al cerrarlo.
+#
+#   historial/
+#     diccionario.jsonl
+#     hechas_del_dia.jsonl
+#     2026-10-18/ID.i8  Momento.i8  Tarea.i4  Responsable.i4  Franja.i4  Para.i4
+
+COLUMNAS_NUMERICAS = {'ID': np.int64, 'Momento': np.int64}
+COLUMNAS_TEXTO = ['Tarea', 'Responsable', 'Franja', 'Para']
+COLUMNAS_HISTORIAL = ['ID', 'Momento'] + COLUMNAS_TEXTO
+
+
+def _tipo(columna):
+    return COLUMNAS_NUMERICAS.get(columna, np.int32)
+
+
+def _fichero(carpeta, columna):
+    return os.path.join(carpeta, f"{columna}.{'i8' if _tipo(columna) == np.int64 else 'i4'}")
+
+
+def _dia(valor):
+    if valor is None:
+        return None
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return date.fromisoformat(str(valor))
+
+
+def hechas_de(df):
+    """Asignaciones completadas de la tabla de tareas (lo que se archiva al cerrar el día)."""
+    if df.empty:
+        return df
+    return df[(df['Estado'] == 'Hecho') & (df['Responsable'] != 'Sin asignar')]
+
+
+def _recortar_linea_incompleta(ruta):
+    """Si una escritura se cortó a medias, quita la última línea sin '\\n'."""
+    with open(ruta, 'rb+') as f:
+        datos = f.read()
+        if datos and not datos.endswith(b'\n'):
+            f.truncate(datos.rfind(b'\n') + 1)
+
+
+class Historial:
+    """Registro por días de las asignaciones completadas.
+
+    registrar() es idempotente por ID dentro de cada día: repetir el cierre
+    del día (p. ej. tras un fallo al guardar) no duplica filas. 'Momento' es
+    la hora a la que se completó cada tarea si se apuntó con apuntar_hecha().
+    """
+
+    def __init__(self, ruta='historial'):
+        self.ruta = ruta
+        os.makedirs(ruta, exist_ok=True)
+        self._ruta_diccionario = os.path.join(ruta, 'diccionario.jsonl')
+        self._ruta_abiertas = os.path.join(ruta, 'hechas_del_dia.jsonl')
+        self._lock = threading.Lock()
+        # (marca, DataFrame) de la última llamada a ultimos_dias()
+        self._ultimos = None
+        self._textos = []
+        self._codigos = {}
+        if os.path.exists(self._ruta_diccionario):
+            _recortar_linea_incompleta(self._ruta_diccionario)
+            with open(self._ruta_diccionario, encoding='utf-8') as f:
+                for linea in f:
+                    texto = json.loads(linea)
+                    self._codigos[texto] = len(self._textos)
+                    self._textos.append(texto)
+
+    # --- Diccionario de textos ---
+    def _codificar(self, valores):
+        """Códigos de los textos; los nuevos se añaden al diccionario (y a disco) primero."""
+        nuevos = []
+        codigos = np.empty(len(valores), dtype=np.int32)
+        for n, v in enumerate(valores):
+            v = str(v)
+            codigo = self._codigos.get(v)
+            if codigo is None:
+                codigo = self._codigos[v] = len(self._textos)
+                self._textos.append(v)
+                nuevos.append(v)
+            codigos[n] = codigo
+        if nuevos:
+            with open(self._ruta_diccionario, 'a', encoding='utf-8') as f:
+                f.writelines(json.dumps(v, ensure_ascii=False) + '\n' for v in nuevos)
+                f.flush()
+                os.fsync(f.fileno())
+        return codigos
+
+    # --- Particiones por día ---
+    def _carpeta(self, dia):
+        return os.path.join(self.ruta, dia.isoformat())
+
+    def _filas_validas(self, carpeta):
+        """Filas completas de la partición (las columnas pueden diferir si se cortó un append)."""
+        tamanos = []
+        for c in COLUMNAS_HISTORIAL:
+            ruta = _fichero(carpeta, c)
+            tamano = os.path.getsize(ruta) if os.path.exists(ruta) else 0
+            tamanos.append(tamano // np.dtype(_tipo(c)).itemsize)
+        return min(tamanos)
+
+    def dias(self):
+        """Días con historial, ordenados."""
+        dias = []
+        for nombre in os.listdir(self.ruta):
+            try:
+                dias.append(date.fromisoformat(nombre))
+            except ValueError:
+                continue
+        return sorted(dias)
+
+    def marca(self, desde=None):
+        """Filas archivadas en cada día desde 'desde': cambia cada vez que se archiva algo."""
+        desde = _dia(desde)
+        return tuple((dia, self._filas_validas(self._carpeta(dia))) for dia in self.dias()
+                     if not desde or dia >= desde)
+
+    def registrar(self, df_hechas, momento=None):
+        """Añade las filas al día de 'momento' (por defecto, ahora). Devuelve cuántas añadió.
+
+        Las filas con columna 'Momento' guardan esa hora; las demás, 'momento'.
+        """
+        momento = (momento or datetime.now()).replace(tzinfo=None)
+        carpeta = self._carpeta(momento.date())
+        os.makedirs(carpeta, exist_ok=True)
+        n_validas = self._filas_validas(carpeta)
+        # Deja todas las columnas con el mismo número de filas antes de añadir
+        for c in COLUMNAS_HISTORIAL:
+            ruta = _fichero(carpeta, c)
+            if os.path.exists(ruta):
+                with open(ruta, 'rb+') as f:
+                    f.truncate(n_validas * np.dtype(_tipo(c)).itemsize)
+        ids = pd.to_numeric(df_hechas['ID'], errors='coerce').fillna(-1).astype(np.int64).to_numpy()
+        ya = np.fromfile(_fichero(carpeta, 'ID'), dtype=np.int64, count=n_validas) if n_validas else []
+        nuevas = ~np.isin(ids, ya)
+        # Un mismo ID repetido en la entrada también cuenta una sola vez
+        nuevas &= ~pd.Series(ids).duplicated().to_numpy()
+        if not nuevas.any():
+            return 0
+        momentos = pd.Series(momento, index=df_hechas.index)
+        if 'Momento' in df_hechas:
+            momentos = pd.to_datetime(df_hechas['Momento'], errors='coerce').fillna(momento)
+        columnas = {
+            'ID': ids[nuevas],
+            # Hora local tal cual (sin zona), en segundos
+            'Momento': momentos.to_numpy(dtype='datetime64[s]')[nuevas].astype(np.int64),
+        }
+        for c in COLUMNAS_TEXTO:
+            valores = df_hechas[c] if c in df_hechas else pd.Series('-', index=df_hechas.index)
+            columnas[c] = self._codificar(list(valores.fillna('-').to_numpy()[nuevas]))
+        for c in COLUMNAS_HISTORIAL:
+            with open(_fichero(carpeta, c), 'ab') as f:
+                f.write(np.ascontiguousarray(columnas[c], dtype=_tipo(c)).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+        return int(nuevas.sum())
+
+    # --- Hechas del día abierto ---
+    def _apuntar(self, entrada):
+        with self._lock, open(self._ruta_abiertas, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entrada, default=str, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+    def apuntar_hecha(self, fila, momento=None):
+        """Apunta una tarea recién completada ('fila' como dict) con la hora a la que se hizo."""
+        entrada = {c: fila.get(c, '-') for c in ['ID'] + COLUMNAS_TEXTO}
+        entrada['Momento'] = (momento or datetime.now()).replace(tzinfo=None).isoformat(timespec='seconds')
+        self._apuntar(entrada)
+
+    def anular_hecha(self, id_tarea):
+        """Deshace apuntar_hecha (la tarea se ha reabierto)."""
+        self._apuntar({'ID': id_tarea, 'Anulada': True})
+
+    def _leer_abiertas(self):
+        """(hechas apuntadas y no anuladas, bytes leídos del fichero)."""
+        if not os.path.exists(self._ruta_abiertas):
+            return pd.DataFrame(columns=COLUMNAS_HISTORIAL), 0
+        _recortar_linea_incompleta(self._ruta_abiertas)
+        with open(self._ruta_abiertas, 'rb') as f:
+            datos = f.read()
+        ultimas = {}
+        for linea in datos.decode('utf-8').splitlines():
+            if linea.strip():
+                entrada = json.loads(linea)
+                ultimas[int(entrada['ID'])] = entrada
+        filas = [e for e in ultimas.values() if not e.get('Anulada')]
+        return pd.DataFrame(filas, columns=COLUMNAS_HISTORIAL), len(datos)
+
+    def _olvidar_abiertas(self, n_bytes):
+        """Quita del fichero lo ya archivado (lo apuntado después se queda)."""
+        with open(self._ruta_abiertas, 'rb') as f:
+            resto = f.read()[n_bytes:]
+        temporal = self._ruta_abiertas + '.tmp'
+        with open(temporal, 'wb') as f:
+            f.write(resto)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporal, self._ruta_abiertas)
+
+    def cerrar_dia(self, df_tabla, momento=None):
+        """Archiva lo hecho en el día que se cierra (en la partición de 'momento').
+
+        Las tareas apuntadas van con su hora, salvo las que en la tabla ya no
+        están hechas (reabiertas en otra sesión); las filas 'Hecho' de la tabla
+        que no se apuntaron aquí (p. ej. desde otro proceso), con 'momento'.
+        Devuelve cuántas filas añadió.
+        """
+        with self._lock:
+            apuntadas, leido = self._leer_abiertas()
+            hechas = hechas_de(df_tabla)
+            if not df_tabla.empty:
+                ids_tabla = pd.to_numeric(df_tabla['ID'], errors='coerce')
+                reabiertas = set(ids_tabla[df_tabla['Estado'] != 'Hecho'])
+                apuntadas = apuntadas[~apuntadas['ID'].isin(reabiertas)]
+                hechas = hechas[~pd.to_numeric(hechas['ID'], errors='coerce').isin(apuntadas['ID'])]
+            n = self.registrar(pd.concat([apuntadas, hechas.astype(object)], ignore_index=True), momento)
+            if leido:
+                self._olvidar_abiertas(leido)
+        return n
+
+    def leer(self, desde=None, hasta=None, columnas=None):
+        """Historial entre dos días (incluidos) como DataFrame; solo lee las columnas pedidas."""
+        desde, hasta = _dia(desde), _dia(hasta)
+        columnas = columnas or COLUMNAS_HISTORIAL
+        partes = {c: [] for c in columnas}
+        for dia in self.dias():
+            if (desde and dia < desde) or (hasta and dia > hasta):
+                continue
+            carpeta = self._carpeta(dia)
+            n = self._filas_validas(carpeta)
+            for c in columnas:
+                partes[c].append(np.fromfile(_fichero(carpeta, c), dtype=_tipo(c), count=n))
+        datos = {}
+        textos = np.array(self._textos, dtype=object)
+        for c in columnas:
+            valores = np.concatenate(partes[c]) if partes[c] else np.empty(0, dtype=_tipo(c))
+            if c == 'Momento':
+                datos[c] = pd.to_datetime(valores, unit='s')
+            elif c in COLUMNAS_TEXTO:
+                # El diccionario es común a todas las columnas: cada una se queda con sus textos
+                datos[c] = pd.Categorical.from_codes(valores, categories=textos).remove_unused_categories()
+            else:
+                datos[c] = valores
+        return pd.DataFrame(datos, columns=columnas)
+
+    def resumen_por_usuario(self, desde=None, hasta=None):
+        """Tareas hechas por cada persona en el rango."""
+        df = self.leer(desde, hasta, columnas=['Responsable'])
+        return df['Responsable'].value_counts().rename('Hechas')
+
+    def ultimos_dias(self, n=30):
+        """Historial de los últimos 'n' días.
+
+        Se guarda con la marca() del rango y no se vuelve a leer de disco
+        hasta que esta cambia. El DataFrame es compartido: no hay que modificarlo.
+        """
+        desde = date.today() - timedelta(days=n - 1)
+        marca = (desde, self.marca(desde))
+        with self._lock:
+            if self._ultimos is not None and self._ultimos[0] == marca:
+                return self._ultimos[1]
+        df = self.leer(desde=desde)
+        with self._lock:
+            self._ultimos = (marca, df)
+        return df
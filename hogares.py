@@ -0,0 +1,219 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+# ==========================================
+# VARIOS HOGARES EN UN MISMO PROCESO
+# ==========================================
+# Cada hogar tiene su tabla, sus usuarios y sus administradores. El proceso
+# guarda un 'Inquilino' por hogar (backend, caché, IDs, cola, historial,
+# reinicio, réplica) que se crea la primera vez que alguien entra en ese
+# hogar, así que una sesión solo carga los datos de su casa. Como mucho hay
+# 'max_activos' hogares cargados: el que lleva más tiempo sin usarse se descarga.
+#
+#   hogares.json
+#   {"garcia": {"nombre": "Casa García", "usuarios": ["Ana", "Luis", "Leo"],
+#               "admins": ["Ana", "Luis"], "libro": "https://...", "pestana": "Tareas"}}
+
+USUARIOS_POR_DEFECTO = ["Papá", "Mamá", "Jesús", "Cris", "María"]
+ADMINS_POR_DEFECTO = ["Papá", "Mamá"]
+HOGAR_POR_DEFECTO = 'casa'
+
+
+class HogarDesconocido(KeyError):
+    """El hogar pedido no está en la configuración."""
+
+
+class Hogar:
+    """Configuración de un hogar: quién lo usa, quién administra y dónde están sus datos."""
+
+    def __init__(self, id_hogar, nombre=None, usuarios=None, admins=None, libro=None, pestana=None):
+        self.id = id_hogar
+        self.nombre = nombre or id_hogar
+        self.usuarios = list(usuarios or USUARIOS_POR_DEFECTO)
+        self.admins = [u for u in (ADMINS_POR_DEFECTO if admins is None else admins) if u in self.usuarios]
+        self.libro = libro
+        self.pestana = pestana
+
+    def es_admin(self, usuario):
+        return usuario in self.admins
+
+    def __repr__(self):
+        return f"Hogar({self.id!r}, {len(self.usuarios)} usuarios)"
+
+
+def cargar_hogares(ruta='hogares.json'):
+    """{id: Hogar} del fichero de configuración; sin fichero, un único hogar como hasta ahora."""
+    if not ruta or not os.path.exists(ruta):
+        return {HOGAR_POR_DEFECTO: Hogar(HOGAR_POR_DEFECTO, nombre="Mi casa")}
+    with open(ruta, encoding='utf-8') as f:
+        datos = json.load(f)
+    hogares = {}
+    for id_hogar, conf in datos.items():
+        if not conf.get('usuarios'):
+            raise ValueError(f"El hogar '{id_hogar}' no tiene usuarios")
+        hogares[id_hogar] = Hogar(id_hogar, conf.get('nombre'), conf['usuarios'], conf.get('admins', []),
+                                  conf.get('libro'), conf.get('pestana'))
+    return hogares
+
+
+class Inquilino:
+    """Recursos de un hogar cargado en el proceso (los comparten todas sus sesiones)."""
+
+    def __init__(self, hogar, cache, ids, historial=None, cola=None, planificador=None, replica=None):
+        self.hogar = hogar
+        self.cache = cache
+        self.backend = cache.backend
+        self.ids = ids
+        self.historial = historial
+        self.cola = cola
+        self.planificador = planificador
+        self.replica = replica
+
+    def ocupado(self):
+        """Tiene cambios sin enviar: no se puede descargar todavía."""
+        colas = [self.cola, self.replica.cola if self.replica is not None else None]
+        return any(c is not None and c.estado()['pendientes'] > 0 for c in colas)
+
+    def cerrar(self):
+        if self.cola is not None:
+            self.cola.vaciar()
+            self.cola.detener()
+        if self.replica is not None:
+            self.replica.cola.vaciar()
+            self.replica.detener()
+
+
+class RegistroHogares:
+    """Inquilinos del proceso por hogar, creados bajo demanda con 'fabrica(hogar)'.
+
+    - obtener() devuelve siempre el mismo Inquilino para un hogar mientras
+      esté cargado; dos sesiones que entran a la vez no lo crean dos veces.
+    - Con más de 'max_activos' cargados se descarga el usado hace más tiempo
+      (salvo los que tienen escrituras en cola). Se cierra con el lock de su
+      hogar tomado, así que si alguien vuelve a entrar, el inquilino nuevo no
+      se crea hasta que el viejo ha soltado sus ficheros (cola, réplica). Las
+      sesiones que aún tengan el viejo reciben ColaDetenida al escribir.
+    - Un solo hilo comprueba cada 'comprobar_cada' segundos el reinicio
+      diario de los hogares cargados; los demás lo recuperan al cargarse,
+      porque el planificador se pone al día con la marca del backend.
+    """
+
+    def __init__(self, hogares, fabrica, max_activos=200, comprobar_cada=60.0, iniciar=True):
+        self.hogares = hogares
+        self.fabrica = fabrica
+        self.max_activos = max_activos
+        self.comprobar_cada = comprobar_cada
+        self.cargas = 0
+        self.descargas = 0
+        self._activos = OrderedDict()
+        self._lock = threading.Lock()
+        # Un lock por hogar para crear su inquilino sin bloquear a los demás
+        self._creando = {}
+        self._parar = threading.Event()
+        self._despertar = threading.Event()
+        self._hilo = threading.Thread(target=self._bucle, name="reinicio-hogares", daemon=True)
+        if iniciar:
+            self._hilo.start()
+
+    def hogar(self, id_hogar):
+        try:
+            return self.hogares[id_hogar]
+        except KeyError:
+            raise HogarDesconocido(id_hogar) from None
+
+    def obtener(self, id_hogar):
+        hogar = self.hogar(id_hogar)
+        with self._lock:
+            inquilino = self._activos.get(id_hogar)
+            if inquilino is not None:
+                self._activos.move_to_end(id_hogar)
+                return inquilino
+            lock_hogar = self._creando.setdefault(id_hogar, threading.Lock())
+        with lock_hogar:
+            with self._lock:
+                inquilino = self._activos.get(id_hogar)
+            if inquilino is None:
+                inquilino = self.fabrica(hogar)
+                with self._lock:
+                    self._activos[id_hogar] = inquilino
+                    self.cargas += 1
+                    sobrantes = self._sobrantes()
+                for viejo, lock_viejo in sobrantes:
+                    try:
+                        viejo.cerrar()
+                    finally:
+                        lock_viejo.release()
+                # El reinicio pendiente de este hogar se hace en el hilo, no en la petición
+                self._despertar.set()
+        return inquilino
+
+    def _sobrantes(self):
+        """Saca del registro los inquilinos que sobran (con el lock tomado).
+
+        Devuelve [(inquilino, lock de su hogar)], con ese lock ya tomado: hay
+        que soltarlo después de cerrar el inquilino.
+        """
+        sobrantes = []
+        for id_hogar in list(self._activos):
+            if len(self._activos) <= self.max_activos:
+                break
+            inquilino = self._activos[id_hogar]
+            if inquilino.ocupado():
+                continue
+            lock_hogar = self._creando.setdefault(id_hogar, threading.Lock())
+            # Sin esperar: si está ocupado (p.ej. es el hogar que se está creando) se deja
+            if not lock_hogar.acquire(blocking=False):
+                continue
+            del self._activos[id_hogar]
+            self.descargas += 1
+            sobrantes.append((inquilino, lock_hogar))
+        return sobrantes
+
+    def activos(self):
+        with self._lock:
+            return list(self._activos)
+
+    def comprobar_reinicios(self):
+        """Reinicio diario de todos los hogares cargados. Devuelve cuántos se reiniciaron."""
+        with self._lock:
+            inquilinos = list(self._activos.values())
+        hechos = 0
+        for inquilino in inquilinos:
+            planificador = inquilino.planificador
+            if planificador is None:
+                continue
+            try:
+                hechos += planificador.comprobar()
+                planificador.ultimo_error = None
+            except Exception as e:
+                planificador.ultimo_error = str(e)
+        return hechos
+
+    def detener(self):
+        self._parar.set()
+        self._despertar.set()
+        if self._hilo.is_alive():
+            self._hilo.join()
+        with self._lock:
+            inquilinos = list(self._activos.values())
+            self._activos.clear()
+        for inquilino in inquilinos:
+            inquilino.cerrar()
+
+    def estado(self):
+        with self._lock:
+            return {
+                'hogares': len(self.hogares),
+                'activos': len(self._activos),
+                'cargas': self.cargas,
+                'descargas': self.descargas,
+            }
+
+    # --- Hilo ---
+    def _bucle(self):
+        while not self._parar.is_set():
+            self._despertar.clear()
+            self.comprobar_reinicios()
+            self._despertar.wait(self.comprobar_cada)
@@ -0,0 +1,284 @@
+import cProfile
+import io
+import json
+import pstats
+import re
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+from persistencia import bytes_payload
+
+# ==========================================
+# INSTRUMENTACIÓN (TIEMPOS Y CONTADORES)
+# ==========================================
+# Tramos con nombre alrededor de cada parte de una recarga (cargar datos,
+# calcular vistas, pintar cada sección, guardar...) y contadores de llamadas
+# y bytes del backend. Se acumulan para todo el proceso y se guarda el
+# desglose de las últimas recargas. Se puede perfilar una recarga entera con
+# cProfile. Todo se exporta como JSON o como texto de Prometheus.
+#
+#   instr = Instrumentacion()
+#   instr.iniciar_recarga()
+#   with instr.tramo('cargar_datos'):
+#       ...
+#   instr.terminar_recarga()
+
+# Límites (segundos) de los histogramas de Prometheus
+LIMITES = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+class Recarga:
+    """Tramos de una ejecución del script (una recarga de la página)."""
+
+    def __init__(self, perfilar=False):
+        self.inicio = time.time()
+        self._t0 = time.perf_counter()
+        self.fin = self._t0
+        self.tramos = []
+        self.terminada = False
+        self.perfil = None
+        self._perfilador = cProfile.Profile() if perfilar else None
+
+    @property
+    def duracion(self):
+        return self.fin - self._t0
+
+    def a_dict(self):
+        return {
+            'inicio': self.inicio,
+            'duracion_ms': 1000 * self.duracion,
+            'terminada': self.terminada,
+            'tramos': [{'tramo': n, 'ms': 1000 * s} for n, s in self.tramos],
+        }
+
+
+class _Estadistica:
+    def __init__(self):
+        self.llamadas = 0
+        self.total = 0.0
+        self.maximo = 0.0
+        self.cubetas = [0] * len(LIMITES)
+
+    def anotar(self, segundos):
+        self.llamadas += 1
+        self.total += segundos
+        self.maximo = max(self.maximo, segundos)
+        for n, limite in enumerate(LIMITES):
+            if segundos <= limite:
+                self.cubetas[n] += 1
+                break
+
+
+def _nombre_prometheus(texto):
+    return re.sub(r'[^a-zA-Z0-9_]', '_', texto)
+
+
+def _etiqueta(texto):
+    return str(texto).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Instrumentacion:
+    """Tiempos por tramo y contadores del proceso, y el desglose de las últimas recargas.
+
+    La recarga en curso es por hilo (Streamlit ejecuta cada sesión en su
+    hilo); los tramos de hilos sin recarga (cola, réplica...) solo suman a
+    los totales. Con 'activa=False' tramo() no mide nada.
+    """
+
+    def __init__(self, activa=True, max_recargas=50):
+        self.activa = activa
+        self.recargas = deque(maxlen=max_recargas)
+        self._tramos = defaultdict(_Estadistica)
+        self._contadores = defaultdict(float)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # Solo un perfilador a la vez en todo el proceso
+        self._perfilando = threading.Lock()
+
+    # --- Recargas ---
+    def iniciar_recarga(self, perfilar=False, anterior=None):
+        """Empieza a medir una recarga en este hilo.
+
+        'anterior' (o la última de este hilo) se cierra si quedó abierta:
+        st.rerun() y st.stop() cortan el script antes de llegar al final, y
+        Streamlit puede ejecutar la siguiente recarga en otro hilo.
+        """
+        anterior = anterior or getattr(self._local, 'recarga', None)
+        if anterior is not None and not anterior.terminada:
+            self._cerrar(anterior)
+        self._local.seccion = None
+        if not self.activa:
+            self._local.recarga = None
+            return None
+        perfilar = perfilar and self._perfilando.acquire(blocking=False)
+        recarga = Recarga(perfilar)
+        self._local.recarga = recarga
+        if recarga._perfilador is not None:
+            recarga._perfilador.enable()
+        return recarga
+
+    def terminar_recarga(self):
+        self._cerrar_seccion()
+        recarga = getattr(self._local, 'recarga', None)
+        if recarga is not None and not recarga.terminada:
+            recarga.fin = time.perf_counter()
+            self._cerrar(recarga)
+        return recarga
+
+    def _cerrar(self, recarga):
+        recarga.terminada = True
+        if recarga._perfilador is not None:
+            recarga._perfilador.disable()
+            salida = io.StringIO()
+            pstats.Stats(recarga._perfilador, stream=salida).sort_stats('cumulative').print_stats(30)
+            recarga.perfil = salida.getvalue()
+            recarga._perfilador = None
+            self._perfilando.release()
+        with self._lock:
+            self._tramos['recarga'].anotar(recarga.duracion)
+            self.recargas.append(recarga)
+
+    def recarga_actual(self):
+        return getattr(self._local, 'recarga', None)
+
+    # --- Tramos y contadores ---
+    @contextmanager
+    def tramo(self, nombre):
+        if not self.activa:
+            yield
+            return
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._anotar(nombre, t0)
+
+    def seccion(self, nombre):
+        """Cierra la sección en curso de la recarga y empieza 'nombre'.
+
+        Para scripts lineales como app.py: marca dónde empieza cada parte sin
+        tener que sangrarla dentro de un 'with'.
+        """
+        self._cerrar_seccion()
+        if self.activa:
+            self._local.seccion = (nombre, time.perf_counter())
+
+    def _cerrar_seccion(self):
+        seccion = getattr(self._local, 'seccion', None)
+        if seccion is None:
+            return
+        self._local.seccion = None
+        self._anotar(*seccion)
+
+    def _anotar(self, nombre, t0):
+        fin = time.perf_counter()
+        with self._lock:
+            self._tramos[nombre].anotar(fin - t0)
+        recarga = getattr(self._local, 'recarga', None)
+        if recarga is not None and not recarga.terminada:
+            recarga.tramos.append((nombre, fin - t0))
+            recarga.fin = fin
+
+    def medir(self, nombre):
+        """Decorador: mide cada llamada a la función como un tramo."""
+        def decorador(funcion):
+            def envoltura(*args, **kwargs):
+                with self.tramo(nombre):
+                    return funcion(*args, **kwargs)
+            envoltura.__name__ = funcion.__name__
+            envoltura.__doc__ = funcion.__doc__
+            return envoltura
+        return decorador
+
+    def contar(self, nombre, n=1):
+        if self.activa:
+            with self._lock:
+                self._contadores[nombre] += n
+
+    def reiniciar(self):
+        with self._lock:
+            self._tramos.clear()
+            self._contadores.clear()
+            self.recargas.clear()
+
+    # --- Exportación ---
+    def resumen(self):
+        """{'tramos': {nombre: estadísticas}, 'contadores': {...}} ordenado por tiempo total."""
+        with self._lock:
+            tramos = {
+                nombre: {
+                    'llamadas': e.llamadas,
+                    'total_ms': 1000 * e.total,
+                    'media_ms': 1000 * e.total / e.llamadas if e.llamadas else 0.0,
+                    'max_ms': 1000 * e.maximo,
+                }
+                for nombre, e in sorted(self._tramos.items(), key=lambda x: -x[1].total)
+            }
+            contadores = dict(sorted(self._contadores.items()))
+        return {'tramos': tramos, 'contadores': contadores}
+
+    def a_json(self, recargas=10):
+        datos = self.resumen()
+        with self._lock:
+            datos['recargas'] = [r.a_dict() for r in list(self.recargas)[-recargas:]]
+        return json.dumps(datos, ensure_ascii=False, indent=2)
+
+    def a_prometheus(self, prefijo='gesti'):
+        """Texto en el formato de exposición de Prometheus (histograma por tramo y contadores)."""
+        lineas = [f"# HELP {prefijo}_tramo_segundos Duración de cada tramo instrumentado",
+                  f"# TYPE {prefijo}_tramo_segundos histogram"]
+        with self._lock:
+            tramos = sorted(self._tramos.items())
+            contadores = sorted(self._contadores.items())
+            for nombre, e in tramos:
+                etiqueta = f'tramo="{_etiqueta(nombre)}"'
+                acumulado = 0
+                for limite, n in zip(LIMITES, e.cubetas):
+                    acumulado += n
+                    lineas.append(f'{prefijo}_tramo_segundos_bucket{{{etiqueta},le="{limite}"}} {acumulado}')
+                lineas.append(f'{prefijo}_tramo_segundos_bucket{{{etiqueta},le="+Inf"}} {e.llamadas}')
+                lineas.append(f'{prefijo}_tramo_segundos_sum{{{etiqueta}}} {e.total}')
+                lineas.append(f'{prefijo}_tramo_segundos_count{{{etiqueta}}} {e.llamadas}')
+        for nombre, valor in contadores:
+            metrica = f"{prefijo}_{_nombre_prometheus(nombre)}_total"
+            lineas.append(f"# TYPE {metrica} counter")
+            lineas.append(f"{metrica} {valor:g}")
+        return "\n".join(lineas) + "\n"
+
+
+class BackendMedido:
+    """Envuelve un backend y apunta tiempo, llamadas y bytes de cada operación.
+
+    Los contadores quedan como 'backend_<operacion>' y 'backend_bytes_enviados';
+    los tiempos como tramos 'backend.<operacion>'.
+    """
+
+    _OPERACIONES = ('leer', 'version', 'aplicar_delta', 'reservar', 'escribir_todo', 'leer_marca_ids',
+                    'reservar_ids', 'leer_ultimo_reinicio', 'reclamar_reinicio')
+
+    def __init__(self, backend, instrumentacion):
+        self.backend = backend
+        self.instrumentacion = instrumentacion
+
+    def __getattr__(self, nombre):
+        atributo = getattr(self.backend, nombre)
+        if nombre not in self._OPERACIONES:
+            return atributo
+        instr = self.instrumentacion
+
+        def medida(*args, **kwargs):
+            instr.contar(f"backend_{nombre}")
+            with instr.tramo(f"backend.{nombre}"):
+                resultado = atributo(*args, **kwargs)
+            if nombre in ('aplicar_delta', 'reservar') and args and not args[0].vacio:
+                instr.contar('backend_bytes_enviados', bytes_payload(args[0].payload()))
+                if resultado is False:
+                    instr.contar('backend_reservas_sin_stock')
+            elif nombre == 'escribir_todo' and args:
+                instr.contar('backend_bytes_enviados', bytes_payload(args[0].values.tolist()))
+            elif nombre == 'leer':
+                instr.contar('backend_filas_leidas', len(resultado))
+            return resultado
+        return medida
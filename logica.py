@@ -0,0 +1,107 @@
+import pandas as pd
+
+# ==========================================
+# LÓGICA DE NEGOCIO (SIN STREAMLIT)
+# ==========================================
+COLUMNAS = ['ID', 'Tarea', 'Frecuencia', 'Tipo', 'Para', 'Responsable', 'Estado', 'Franja', 'Cantidad']
+TIPOS_CONTADOR = ['Contador', 'Multi-Franja']
+COLUMNAS_LIBRES = ['ID', 'Tarea', 'Tipo', 'Para', 'Stock', 'Badge', 'Texto']
+
+
+def obtener_stock_real(df_actual, nombre_tarea):
+    """Calcula el stock restando las filas puntuales de la fila maestra.
+
+    Una tarea normal cuenta como un contador de una unidad: asignada hoy, no le queda stock.
+    """
+    maestra = df_actual[(df_actual['Tarea'] == nombre_tarea) & (df_actual['Frecuencia'] != 'Puntual')]
+    if maestra.empty: return 0
+    total_objetivo = int(maestra.iloc[0]['Cantidad']) if maestra.iloc[0]['Tipo'] in TIPOS_CONTADOR else 1
+    asignadas = len(df_actual[(df_actual['Tarea'] == nombre_tarea) & (df_actual['Frecuencia'] == 'Puntual')])
+    return max(0, total_objetivo - asignadas)
+
+
+def calcular_indice_stock(df_actual):
+    """Stock restante de todas las tareas de una pasada: {Tarea: stock}.
+
+    Equivale a llamar a obtener_stock_real para cada tarea, pero recorre la
+    tabla una sola vez (se calcula una vez por recarga y se consulta en O(1)).
+    """
+    if df_actual.empty:
+        return {}
+    es_puntual = df_actual['Frecuencia'] == 'Puntual'
+    # Como en obtener_stock_real, manda la primera fila maestra de cada tarea
+    maestras = df_actual.loc[~es_puntual, ['Tarea', 'Tipo', 'Cantidad']].drop_duplicates('Tarea')
+    objetivo = pd.to_numeric(maestras['Cantidad'], errors='coerce').fillna(0).astype(int)
+    objetivo = objetivo.where(maestras['Tipo'].isin(TIPOS_CONTADOR), 1)
+    objetivo.index = maestras['Tarea']
+    asignadas = df_actual.loc[es_puntual, 'Tarea'].value_counts()
+    stock = objetivo - asignadas.reindex(objetivo.index, fill_value=0)
+    return stock.clip(lower=0).to_dict()
+
+
+def vista_tareas_libres(df_actual, filtro_grupo, indice_stock=None, debidas=None):
+    """Tabla compacta con lo que hay que pintar en 'Tareas Libres'.
+
+    Columnas: ID, Tarea, Tipo, Para, Stock, Badge y Texto; cada fila se
+    identifica por su 'ID' (claves de los botones y asignar), no por el índice.
+    Se omiten las filas puntuales de los contadores y las maestras sin stock
+    (contadores agotados y tareas normales ya asignadas hoy).
+    Con 'debidas' (IDs de las maestras que tocan hoy) se ocultan las demás.
+    AlmacenTareas.tareas_libres da lo mismo manteniendo la vista fila a fila
+    con fila_vista_libre, sin recalcularla entera tras cada cambio.
+    """
+    columnas = COLUMNAS_LIBRES
+    if df_actual.empty:
+        return pd.DataFrame(columns=columnas)
+    if indice_stock is None:
+        indice_stock = calcular_indice_stock(df_actual)
+
+    libres = df_actual[(df_actual['Responsable'] == 'Sin asignar') & (df_actual['Para'].isin(filtro_grupo))]
+    es_contador = libres['Tipo'].isin(TIPOS_CONTADOR)
+    # Solo la fila MAESTRA de cada contador
+    libres = libres[~(es_contador & (libres['Frecuencia'] == 'Puntual'))]
+    if debidas is not None:
+        libres = libres[(libres['Frecuencia'] == 'Puntual') | libres['ID'].isin(list(debidas))]
+    es_contador = es_contador.loc[libres.index]
+
+    # Las 'Puntual' libres (normales soltadas en hojas antiguas) son una unidad cada una
+    stock = libres['Tarea'].map(indice_stock).fillna(0).astype(int).where(libres['Frecuencia'] != 'Puntual', 1)
+    visibles = stock > 0
+    libres, es_contador, stock = libres[visibles], es_contador[visibles], stock[visibles]
+
+    vista = libres[['ID', 'Tarea', 'Tipo', 'Para']].copy()
+    vista['Stock'] = stock
+    vista['Badge'] = es_contador.map({True: "🔢", False: "📋"})
+    disponibles = ("  \n*(Disponibles: " + stock.astype(str) + ")*").where(es_contador, "")
+    vista['Texto'] = vista['Badge'] + " **" + vista['Tarea'].astype(str) + "**" + disponibles
+    return vista[columnas]
+
+
+def fila_vista_libre(id_tarea, tarea, tipo, para, stock):
+    """Una fila de vista_tareas_libres (mismas columnas, badge y texto)."""
+    es_contador = tipo in TIPOS_CONTADOR
+    badge = "🔢" if es_contador else "📋"
+    disponibles = f"  \n*(Disponibles: {stock})*" if es_contador else ""
+    return (id_tarea, tarea, tipo, para, stock, badge, f"{badge} **{tarea}**{disponibles}")
+
+
+# ==========================================
+# PAGINACIÓN Y BÚSQUEDA
+# ==========================================
+def filtrar_por_texto(df_actual, texto, columna='Tarea'):
+    """Filas cuya 'columna' contiene el texto buscado (sin distinguir mayúsculas)."""
+    if not texto:
+        return df_actual
+    coincide = df_actual[columna].astype(str).str.contains(texto, case=False, regex=False, na=False)
+    return df_actual[coincide]
+
+
+def numero_paginas(n_filas, tam_pagina):
+    return max(1, -(-n_filas // tam_pagina))
+
+
+def paginar(df_actual, pagina, tam_pagina):
+    """Filas de la página indicada (empezando en 1); fuera de rango se ajusta."""
+    pagina = min(max(1, int(pagina)), numero_paginas(len(df_actual), tam_pagina))
+    inicio = (pagina - 1) * tam_pagina
+    return df_actual.iloc[inicio:inicio + tam_pagina]
@@ -0,0 +1,317 @@
+from datetime import date
+
+import pandas as pd
+
+from esquema import aplicar_esquema, quitar_esquema
+from logica import COLUMNAS, TIPOS_CONTADOR
+from persistencia import BackendSQLite, ConflictoConcurrencia, _normalizar, bytes_payload, valor_celda
+
+# ==========================================
+# MODELO NORMALIZADO: PLANTILLAS, INSTANCIAS Y ASIGNACIONES
+# ==========================================
+# En la hoja plana el stock de un contador se calcula contando sus filas
+# 'Puntual' (una tarea normal es un contador de una unidad). Aquí cada cosa
+# va en su tabla:
+# - plantillas: la tarea tal como la define el administrador (la fila maestra);
+# - instancias: la tarea en un día concreto, con el contador de unidades
+#   libres ('Libres'). Se crean llenas la primera vez que se usa el día;
+# - asignaciones: quién ha cogido una unidad, en qué franja y en qué estado.
+# Leer el stock es leer una fila de 'instancias' y asignar es insertar una
+# asignación y restar una unidad a su instancia, sin recorrer la tabla y sin
+# borrar ni recrear la maestra.
+#
+# Hacia fuera se sigue viendo la tabla plana de siempre (vista 'tabla_plana'),
+# así que la caché, el almacén y la app no cambian.
+
+COLUMNAS_PLANTILLA = ['ID', 'Tarea', 'Frecuencia', 'Tipo', 'Para', 'Cantidad']
+COLUMNAS_ASIGNACION = ['ID', 'Plantilla', 'Responsable', 'Estado', 'Franja']
+# Columnas de la tabla plana que solo tienen sentido en una asignación
+_COLUMNAS_ASIGNACION_PLANA = {'Responsable': 'Sin asignar', 'Estado': 'Pendiente', 'Franja': '-'}
+
+_ES_CONTADOR = "Tipo IN ({})".format(", ".join(f"'{t}'" for t in TIPOS_CONTADOR))
+# Unidades que tiene cada día una plantilla (una si es una tarea normal)
+_OBJETIVO = f"CASE WHEN {_ES_CONTADOR} THEN Cantidad ELSE 1 END"
+_VISTA_PLANA = """CREATE VIEW tabla_plana AS
+    SELECT ID, Tarea, Frecuencia, Tipo, Para, 'Sin asignar' AS Responsable, 'Pendiente' AS Estado,
+           '-' AS Franja, Cantidad
+    FROM plantillas
+    UNION ALL
+    SELECT a.ID, p.Tarea, 'Puntual', p.Tipo, p.Para, a.Responsable, a.Estado, a.Franja, 1
+    FROM asignaciones a JOIN plantillas p ON p.ID = a.Plantilla"""
+_SQL_INSTANCIAS = f"""
+    INSERT OR {{}} INTO instancias (Plantilla, Dia, Objetivo, Libres)
+    SELECT ID, :dia, {_OBJETIVO}, {_OBJETIVO} - (
+        SELECT COUNT(*) FROM asignaciones a WHERE a.Plantilla = plantillas.ID AND a.Dia = :dia)
+    FROM plantillas"""
+
+
+def migrar_tabla(df, previas=None):
+    """Pasa la tabla plana de la hoja a (plantillas, asignaciones).
+
+    - Cada fila maestra es una plantilla con su mismo ID.
+    - Cada fila 'Puntual' es una asignación de la primera plantilla con su
+      nombre, que es como contaba el stock obtener_stock_real.
+    - Una 'Puntual' sin maestra (las tareas normales asignadas, cuya maestra
+      se borraba) recupera la plantilla de 'previas' {Tarea: fila} si está, o
+      crea una diaria con un ID nuevo.
+    - Una maestra asignada a alguien (hojas antiguas) queda como plantilla
+      libre y su asignación pasa a ser una fila aparte con un ID nuevo.
+    """
+    if not len(df.columns):
+        df = pd.DataFrame(columns=COLUMNAS)
+    df = quitar_esquema(aplicar_esquema(df))
+    siguiente = int(df['ID'].max()) + 1 if len(df) else 1
+    previas = previas or {}
+    plantillas, asignaciones, por_nombre = [], [], {}
+
+    def nuevo_id():
+        nonlocal siguiente
+        siguiente += 1
+        return siguiente - 1
+
+    ids_tabla = set(df['ID'])
+    puntual = df['Frecuencia'] == 'Puntual'
+    for fila in df[~puntual].itertuples(index=False):
+        plantillas.append([fila.ID, fila.Tarea, fila.Frecuencia, fila.Tipo, fila.Para, fila.Cantidad])
+        por_nombre.setdefault(fila.Tarea, fila.ID)
+        if fila.Responsable != 'Sin asignar':
+            asignaciones.append([nuevo_id(), fila.ID, fila.Responsable, fila.Estado, fila.Franja])
+    for fila in df[puntual].itertuples(index=False):
+        id_plantilla = por_nombre.get(fila.Tarea)
+        if id_plantilla is None:
+            previa = previas.get(fila.Tarea)
+            if previa is not None and previa[0] not in ids_tabla:
+                plantillas.append(list(previa))
+                id_plantilla = previa[0]
+            else:
+                id_plantilla = nuevo_id()
+                plantillas.append([id_plantilla, fila.Tarea, 'Diaria', fila.Tipo, fila.Para, 1])
+            por_nombre[fila.Tarea] = id_plantilla
+        asignaciones.append([fila.ID, id_plantilla, fila.Responsable, fila.Estado, fila.Franja])
+    return (pd.DataFrame(plantillas, columns=COLUMNAS_PLANTILLA),
+            pd.DataFrame(asignaciones, columns=COLUMNAS_ASIGNACION))
+
+
+class BackendNormalizado(BackendSQLite):
+    """Modelo normalizado en SQLite con la misma interfaz que los demás backends.
+
+    - leer() devuelve la tabla plana: las plantillas como maestras y las
+      asignaciones como filas 'Puntual'.
+    - aplicar_delta() traduce los cambios del almacén a operaciones de una
+      fila: asignar inserta la asignación y resta una unidad a la instancia
+      (UPDATE ... WHERE Libres > 0), liberar o el reinicio la borran y la
+      devuelven, ajustar el objetivo toca la plantilla y su instancia.
+    - reservar() es ese mismo decremento condicionado para una asignación
+      de un contador: devuelve False si no quedan unidades.
+    - escribir_todo() migra una tabla plana completa (migrar_tabla).
+    - El día en curso es el del último reinicio (reclamar_reinicio) o, si
+      no ha habido ninguno, el de la migración.
+    Revisión, marca de IDs y marca de reinicio funcionan como en BackendSQLite.
+    """
+
+    def __init__(self, ruta='tareas_normalizadas.db', dia=None):
+        self.ruta = ruta
+        self.columnas = list(COLUMNAS)
+        self.bytes_enviados = 0
+        self.llamadas = 0
+        dia = (dia or date.today()).toordinal()
+        with self._conectar() as con:
+            con.execute("CREATE TABLE IF NOT EXISTS plantillas (ID INTEGER PRIMARY KEY, Tarea TEXT, "
+                        "Frecuencia TEXT, Tipo TEXT, Para TEXT, Cantidad INTEGER)")
+            con.execute("CREATE INDEX IF NOT EXISTS idx_plantillas_tarea ON plantillas (Tarea)")
+            con.execute("CREATE TABLE IF NOT EXISTS instancias (Plantilla INTEGER, Dia INTEGER, "
+                        "Objetivo INTEGER, Libres INTEGER, PRIMARY KEY (Plantilla, Dia))")
+            con.execute("CREATE TABLE IF NOT EXISTS asignaciones (ID INTEGER PRIMARY KEY, Plantilla INTEGER, "
+                        "Dia INTEGER, Responsable TEXT, Estado TEXT, Franja TEXT)")
+            con.execute("CREATE INDEX IF NOT EXISTS idx_asignaciones_plantilla ON asignaciones (Plantilla, Dia)")
+            con.execute("CREATE TABLE IF NOT EXISTS meta (clave TEXT PRIMARY KEY, valor INTEGER)")
+            con.execute("INSERT OR IGNORE INTO meta VALUES ('revision', 0), ('marca_ids', 0), "
+                        "('ultimo_reinicio', 0), ('dia', ?), ('dia_instancias', 0)", (dia,))
+            # La tabla plana: maestras (también las normales ya asignadas, como en la
+            # hoja) y asignaciones. Las bases de antes ocultaban las normales sin unidades
+            vista = con.execute("SELECT sql FROM sqlite_master WHERE type = 'view' AND name = 'tabla_plana'").fetchone()
+            if vista is None or _VISTA_PLANA not in vista[0]:
+                con.execute("BEGIN IMMEDIATE")
+                con.execute("DROP VIEW IF EXISTS tabla_plana")
+                con.execute(_VISTA_PLANA)
+                con.execute("COMMIT")
+
+    def _abrir_dia(self, con):
+        """Día en curso (ordinal). La primera vez que se usa se crean sus instancias."""
+        meta = dict(con.execute("SELECT clave, valor FROM meta WHERE clave IN "
+                                "('dia', 'ultimo_reinicio', 'dia_instancias')"))
+        dia = meta['ultimo_reinicio'] or meta['dia']
+        if meta['dia_instancias'] != dia:
+            # Idempotente: dos procesos que abren el mismo día crean las mismas filas
+            con.execute(_SQL_INSTANCIAS.format('IGNORE'), {'dia': dia})
+            con.execute("UPDATE meta SET valor = ? WHERE clave = 'dia_instancias'", (dia,))
+        return dia
+
+    def _recalcular_instancia(self, con, id_plantilla, dia):
+        """Rehace la instancia del día de una plantilla (alta o cambio de objetivo)."""
+        con.execute(_SQL_INSTANCIAS.format('REPLACE') + " WHERE ID = :id", {'dia': dia, 'id': id_plantilla})
+
+    # --- Lectura ---
+    def leer(self):
+        with self._conectar() as con:
+            self._abrir_dia(con)
+            return pd.read_sql_query("SELECT * FROM tabla_plana ORDER BY ID", con)
+
+    def stock(self, tarea):
+        """Unidades libres hoy de 'tarea' (la primera plantilla con ese nombre): una fila."""
+        with self._conectar() as con:
+            dia = self._abrir_dia(con)
+            fila = con.execute(
+                "SELECT MAX(i.Libres, 0) FROM plantillas p JOIN instancias i ON i.Plantilla = p.ID "
+                "AND i.Dia = ? WHERE p.Tarea = ? ORDER BY p.ID LIMIT 1", (dia, tarea)).fetchone()
+        return fila[0] if fila else 0
+
+    # --- Escritura ---
+    def escribir_todo(self, df):
+        con = self._conectar()
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            previas = {}
+            for fila in con.execute("SELECT * FROM plantillas ORDER BY ID DESC"):
+                previas[fila[1]] = fila
+            plantillas, asignaciones = migrar_tabla(df, previas)
+            dia = self._abrir_dia(con)
+            for tabla in ('asignaciones', 'instancias', 'plantillas'):
+                con.execute(f"DELETE FROM {tabla}")
+            con.executemany("INSERT INTO plantillas VALUES (?, ?, ?, ?, ?, ?)",
+                            [[valor_celda(v) for v in f] for f in plantillas.itertuples(index=False)])
+            con.executemany("INSERT INTO asignaciones (ID, Plantilla, Dia, Responsable, Estado, Franja) "
+                            "VALUES (?, ?, ?, ?, ?, ?)",
+                            [[valor_celda(f[0]), valor_celda(f[1]), dia, *f[2:]]
+                             for f in asignaciones.itertuples(index=False)])
+            con.execute(_SQL_INSTANCIAS.format('IGNORE'), {'dia': dia})
+            # Los IDs nuevos de la migración no se pueden volver a repartir
+            max_id = max([0, *plantillas['ID'], *asignaciones['ID']])
+            con.execute("UPDATE meta SET valor = MAX(valor, ?) WHERE clave = 'marca_ids'", (int(max_id),))
+            self._subir_revision(con)
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+        finally:
+            con.close()
+        self.bytes_enviados += bytes_payload(df.values.tolist())
+        self.llamadas += 1
+
+    def _comprobar(self, con, delta, clave):
+        # Las reservas de stock no se comprueban aquí: las garantiza el
+        # UPDATE ... WHERE Libres > 0 de cada asignación nueva
+        for id_fila, esperados in delta.condiciones.items():
+            cols = list(esperados)
+            fila = con.execute(f"SELECT {', '.join(self._q(c) for c in cols)} FROM tabla_plana WHERE ID = ?",
+                               (id_fila,)).fetchone()
+            if fila is None:
+                raise ConflictoConcurrencia(f"La fila {id_fila} ya no existe")
+            for col, actual in zip(cols, fila):
+                if _normalizar(actual) != _normalizar(esperados[col]):
+                    raise ConflictoConcurrencia(f"La fila {id_fila} ha cambiado ({col})")
+
+    def aplicar_delta(self, delta, clave='ID'):
+        if delta.vacio:
+            return
+        con = self._conectar()
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            dia = self._abrir_dia(con)
+            self._comprobar(con, delta, clave)
+            self._traducir(con, delta, dia)
+            self._subir_revision(con)
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+        finally:
+            con.close()
+        self.bytes_enviados += bytes_payload(delta.payload())
+        self.llamadas += 1
+
+    def _plantilla_de(self, con, id_fila):
+        """(ID de plantilla, Tarea, es asignación) de una fila de la tabla plana, o None."""
+        fila = con.execute("SELECT p.ID, p.Tarea FROM asignaciones a JOIN plantillas p ON p.ID = a.Plantilla "
+                           "WHERE a.ID = ?", (id_fila,)).fetchone()
+        if fila is not None:
+            return fila[0], fila[1], True
+        fila = con.execute("SELECT ID, Tarea FROM plantillas WHERE ID = ?", (id_fila,)).fetchone()
+        return None if fila is None else (fila[0], fila[1], False)
+
+    def _traducir(self, con, delta, dia):
+        pos = {c: n for n, c in enumerate(delta.columnas)}
+        borradas = {i: self._plantilla_de(con, i) for i in delta.borrados}
+        # Una 'Puntual' nueva es de la plantilla de la fila que sustituye (una
+        # asignación liberada, o la maestra en los deltas de cuando asignar la
+        # borraba); si no, de la primera con su nombre, como el stock de la hoja
+        origen = {}
+        for datos in borradas.values():
+            if datos is not None:
+                origen.setdefault(datos[1], datos[0])
+        maestras = [f for f in delta.insertados if f[pos['Frecuencia']] != 'Puntual']
+        puntuales = []
+        for fila in delta.insertados:
+            if fila[pos['Frecuencia']] != 'Puntual':
+                continue
+            tarea = fila[pos['Tarea']]
+            id_plantilla = origen.get(tarea)
+            if id_plantilla is None:
+                id_plantilla = next((f[pos['ID']] for f in maestras if f[pos['Tarea']] == tarea), None)
+            if id_plantilla is None:
+                encontrada = con.execute("SELECT ID FROM plantillas WHERE Tarea = ? ORDER BY ID LIMIT 1",
+                                         (tarea,)).fetchone()
+                if encontrada is None:
+                    raise ConflictoConcurrencia(f"La tarea '{tarea}' ya no existe")
+                id_plantilla = encontrada[0]
+            puntuales.append((fila, id_plantilla))
+        asignadas = {id_plantilla for _, id_plantilla in puntuales}
+
+        for id_fila, datos in borradas.items():
+            if datos is None:
+                continue
+            id_plantilla, _, es_asignacion = datos
+            if es_asignacion:
+                # Se devuelve la unidad a la instancia del día en que se cogió
+                con.execute("UPDATE instancias SET Libres = Libres + 1 WHERE (Plantilla, Dia) = "
+                            "(SELECT Plantilla, Dia FROM asignaciones WHERE ID = ?)", (id_fila,))
+                con.execute("DELETE FROM asignaciones WHERE ID = ?", (id_fila,))
+            elif id_plantilla not in asignadas:
+                # Borrar una maestra (sin asignación que la sustituya) borra la plantilla
+                con.execute("DELETE FROM asignaciones WHERE Plantilla = ?", (id_plantilla,))
+                con.execute("DELETE FROM instancias WHERE Plantilla = ?", (id_plantilla,))
+                con.execute("DELETE FROM plantillas WHERE ID = ?", (id_plantilla,))
+
+        for id_fila, cambios in delta.actualizados.items():
+            datos = self._plantilla_de(con, id_fila)
+            if datos is None:
+                raise KeyError(f"ID {id_fila} no encontrado")
+            es_asignacion = datos[2]
+            tabla, permitidas = (('asignaciones', list(_COLUMNAS_ASIGNACION_PLANA)) if es_asignacion
+                                 else ('plantillas', COLUMNAS_PLANTILLA[1:]))
+            validos = {c: v for c, v in cambios.items() if c in permitidas}
+            for col, valor in cambios.items():
+                # Una maestra solo puede 'cambiar' a los valores de libre (reinicio diario)
+                inocuo = not es_asignacion and _COLUMNAS_ASIGNACION_PLANA.get(col) == valor
+                if col not in validos and not inocuo:
+                    raise ValueError(f"No se puede cambiar '{col}' de la fila {id_fila} en el modelo normalizado")
+            if validos:
+                asignaciones = ", ".join(f"{self._q(c)} = ?" for c in validos)
+                con.execute(f"UPDATE {tabla} SET {asignaciones} WHERE ID = ?", (*validos.values(), id_fila))
+            if not es_asignacion and {'Tipo', 'Cantidad'} & set(validos):
+                self._recalcular_instancia(con, id_fila, dia)
+
+        for fila in maestras:
+            con.execute("INSERT INTO plantillas VALUES (?, ?, ?, ?, ?, ?)",
+                        [fila[pos[c]] for c in COLUMNAS_PLANTILLA])
+            self._recalcular_instancia(con, fila[pos['ID']], dia)
+        for fila, id_plantilla in puntuales:
+            # Decremento condicionado: dos sesiones no pueden llevarse la última unidad
+            cursor = con.execute("UPDATE instancias SET Libres = Libres - 1 "
+                                 "WHERE Plantilla = ? AND Dia = ? AND Libres > 0", (id_plantilla, dia))
+            if cursor.rowcount != 1:
+                raise ConflictoConcurrencia(f"Sin stock suficiente de '{fila[pos['Tarea']]}'")
+            con.execute("INSERT INTO asignaciones (ID, Plantilla, Dia, Responsable, Estado, Franja) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (fila[pos['ID']], id_plantilla, dia, fila[pos['Responsable']], fila[pos['Estado']],
+                         fila[pos['Franja']]))
@@ -0,0 +1,932 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+from conexion import es_fallo_servicio
+from esquema import aplicar_esquema, asignar_en_categoria, conservar_tipos, quitar_esquema
+from logica import COLUMNAS, TIPOS_CONTADOR, obtener_stock_real
+
+# ==========================================
+# PERSISTENCIA POR CAMBIOS (DELTAS)
+# ==========================================
+# En lugar de reescribir la hoja entera en cada clic, se compara la última
+# versión guardada con la nueva (por 'ID') y solo se envían las filas
+# insertadas, las celdas modificadas y las filas borradas.
+
+
+def valor_celda(v):
+    """Convierte tipos de numpy/pandas a tipos nativos serializables."""
+    if hasattr(v, 'item'):
+        v = v.item()
+    if isinstance(v, float) and v.is_integer():
+        return int(v)
+    return v
+
+
+def _clave_texto(v):
+    """Normaliza un ID leído de la hoja ('7', '7.0', 7) para poder compararlo."""
+    try:
+        return str(int(float(v)))
+    except (TypeError, ValueError):
+        return str(v)
+
+
+def _clave_id(v):
+    try:
+        return int(v)
+    except (TypeError, ValueError):
+        return v
+
+
+def _normalizar(v):
+    """Valor comparable entre la copia local y la hoja (que devuelve texto)."""
+    try:
+        f = float(v)
+        return str(int(f)) if f.is_integer() else str(f)
+    except (TypeError, ValueError):
+        return str(v).strip()
+
+
+class ConflictoConcurrencia(Exception):
+    """Otra sesión ha cambiado las mismas filas desde que se leyeron."""
+
+
+def bytes_payload(datos):
+    """Tamaño aproximado (JSON) de lo que viaja por la red."""
+    return len(json.dumps(datos, default=str, ensure_ascii=False).encode('utf-8'))
+
+
+class Delta:
+    """Cambios fila a fila entre dos versiones de la tabla, indexados por ID.
+
+    Opcionalmente lleva las condiciones para escribir (compare-and-swap):
+    'condiciones' {ID: {columna: valor esperado}} de las filas que se tocan y
+    'reservas' {Tarea: unidades} de stock que deben quedar disponibles.
+    """
+
+    def __init__(self, columnas, insertados=None, actualizados=None, borrados=None,
+                 condiciones=None, reservas=None):
+        self.columnas = list(columnas)
+        self.insertados = insertados if insertados is not None else []
+        self.actualizados = actualizados if actualizados is not None else {}
+        self.borrados = borrados if borrados is not None else []
+        self.condiciones = condiciones if condiciones is not None else {}
+        self.reservas = reservas if reservas is not None else {}
+
+    @property
+    def vacio(self):
+        return not (self.insertados or self.actualizados or self.borrados)
+
+    def payload(self):
+        return {
+            'insertados': self.insertados,
+            'actualizados': {str(k): v for k, v in self.actualizados.items()},
+            'borrados': self.borrados,
+            'condiciones': {str(k): v for k, v in self.condiciones.items()},
+            'reservas': self.reservas,
+        }
+
+    def a_dict(self):
+        return {'columnas': self.columnas, **self.payload()}
+
+    @classmethod
+    def desde_dict(cls, datos):
+        """Inverso de a_dict (las claves de JSON vuelven a ser IDs enteros)."""
+        def claves(d):
+            return {_clave_id(k): v for k, v in d.items()}
+        return cls(datos['columnas'], insertados=datos['insertados'],
+                   actualizados=claves(datos['actualizados']), borrados=datos['borrados'],
+                   condiciones=claves(datos.get('condiciones', {})),
+                   reservas=datos.get('reservas', {}))
+
+    def __repr__(self):
+        return (f"Delta(+{len(self.insertados)} ~{len(self.actualizados)} "
+                f"-{len(self.borrados)})")
+
+
+def fusionar_deltas(deltas, clave='ID'):
+    """Une varios deltas consecutivos en uno solo con el mismo efecto final.
+
+    Una fila insertada y luego modificada se envía ya modificada; insertada y
+    luego borrada no se envía. De las condiciones se conserva la primera
+    lectura de cada celda y las reservas de stock se suman.
+    """
+    if not deltas:
+        return None
+    columnas = deltas[0].columnas
+    pos = {c: n for n, c in enumerate(columnas)}
+    insertados, actualizados, borrados = {}, {}, []
+    condiciones, reservas = {}, {}
+    for delta in deltas:
+        for id_fila, esperados in delta.condiciones.items():
+            if id_fila not in insertados:
+                previas = condiciones.setdefault(id_fila, {})
+                for col, valor in esperados.items():
+                    previas.setdefault(col, valor)
+        for tarea, n in delta.reservas.items():
+            reservas[tarea] = reservas.get(tarea, 0) + n
+        for fila in delta.insertados:
+            insertados[fila[pos[clave]]] = list(fila)
+        for id_fila, cambios in delta.actualizados.items():
+            if id_fila in insertados:
+                for col, valor in cambios.items():
+                    insertados[id_fila][pos[col]] = valor
+            else:
+                actualizados.setdefault(id_fila, {}).update(cambios)
+        for id_fila in delta.borrados:
+            if insertados.pop(id_fila, None) is None:
+                actualizados.pop(id_fila, None)
+                borrados.append(id_fila)
+    return Delta(columnas, insertados=list(insertados.values()), actualizados=actualizados,
+                 borrados=borrados, condiciones=condiciones, reservas=reservas)
+
+
+def calcular_delta(df_antes, df_despues, clave='ID'):
+    """Devuelve el Delta entre dos tablas o None si hace falta reescribir todo.
+
+    Se recurre a la reescritura completa cuando cambian las columnas, la clave
+    no es única o las filas que sobreviven han cambiado de orden.
+    """
+    if df_antes is None or df_antes.empty or clave not in df_despues.columns:
+        return None
+    if list(df_antes.columns) != list(df_despues.columns):
+        return None
+    if df_antes[clave].duplicated().any() or df_despues[clave].duplicated().any():
+        return None
+
+    antes = df_antes.fillna("-").set_index(clave, drop=False)
+    despues = df_despues.fillna("-").set_index(clave, drop=False)
+
+    ids_antes = set(antes.index)
+    ids_despues = set(despues.index)
+    comunes_antes = [i for i in antes.index if i in ids_despues]
+    comunes_despues = [i for i in despues.index if i in ids_antes]
+    if comunes_antes != comunes_despues:
+        return None
+    # Las filas nuevas solo pueden ir al final (append en la hoja)
+    n_comunes = len(comunes_despues)
+    if list(despues.index[:n_comunes]) != comunes_despues:
+        return None
+
+    delta = Delta(df_despues.columns)
+    delta.borrados = [valor_celda(i) for i in antes.index if i not in ids_despues]
+    delta.insertados = [
+        [valor_celda(v) for v in fila]
+        for fila in despues.iloc[n_comunes:].itertuples(index=False, name=None)
+    ]
+
+    if n_comunes:
+        viejo = antes.loc[comunes_despues]
+        nuevo = despues.loc[comunes_despues]
+        distintos = viejo.astype(object).ne(nuevo.astype(object))
+        filas = distintos.any(axis=1)
+        for id_fila in distintos.index[filas.to_numpy()]:
+            cols = distintos.columns[distintos.loc[id_fila].to_numpy()]
+            delta.actualizados[valor_celda(id_fila)] = {
+                c: valor_celda(nuevo.at[id_fila, c]) for c in cols
+            }
+    return delta
+
+
+def _tramos(valores_por_posicion):
+    """Agrupa {posición: valor} en tramos consecutivos [(inicio, [valores])]."""
+    tramos = []
+    for pos in sorted(valores_por_posicion):
+        if tramos and tramos[-1][0] + len(tramos[-1][1]) == pos:
+            tramos[-1][1].append(valores_por_posicion[pos])
+        else:
+            tramos.append((pos, [valores_por_posicion[pos]]))
+    return tramos
+
+
+def aplicar_delta_a_tabla(df, delta, clave='ID'):
+    """Devuelve una tabla nueva con el delta aplicado (no modifica 'df')."""
+    if delta.borrados:
+        df = df[~df[clave].isin(delta.borrados)]
+    df = df.reset_index(drop=True)
+    if delta.actualizados:
+        # Una asignación por columna en vez de una por celda (el reinicio toca miles)
+        por_columna = {}
+        for id_fila, cambios in delta.actualizados.items():
+            for col, valor in cambios.items():
+                por_columna.setdefault(col, {})[id_fila] = valor
+        for col, valores in por_columna.items():
+            mascara = df[clave].isin(list(valores))
+            if mascara.any():
+                asignar_en_categoria(df, mascara, col, [valores[i] for i in df.loc[mascara, clave]])
+    if delta.insertados:
+        nuevos = pd.DataFrame(delta.insertados, columns=delta.columnas)
+        df = conservar_tipos(pd.concat([df, nuevos], ignore_index=True), df)
+    return df
+
+
+def _plegar_reservas(marca, reservas):
+    """Marca de IDs tras las reservas [(n, mínimo)] de Meta, en orden, desde la celda B1."""
+    marca = int(float(marca[0][0])) if marca and marca[0] and marca[0][0] else 0
+    for fila in reservas:
+        if not fila or not fila[0]:
+            continue
+        minimo = int(float(fila[1])) if len(fila) > 1 and fila[1] else 0
+        marca = max(marca, minimo) + int(float(fila[0]))
+    return marca
+
+
+# ==========================================
+# BACKENDS
+# ==========================================
+class BackendMemoria:
+    """Hoja falsa en memoria para probar y medir sin conexión.
+
+    'latencia' simula el coste fijo de cada llamada y 'segundos_por_kb' el
+    coste de transferencia, para que los benchmarks reflejen la red.
+    """
+
+    def __init__(self, df_inicial=None, latencia=0.0, segundos_por_kb=0.0):
+        self.df = df_inicial.copy() if df_inicial is not None else pd.DataFrame()
+        self.latencia = latencia
+        self.segundos_por_kb = segundos_por_kb
+        self.bytes_enviados = 0
+        self.llamadas = 0
+        self.lecturas = 0
+        self.revision = 0
+        self.marca_ids = 0
+        self.ultimo_reinicio = 0
+        # Hace atómicas la comprobación y la escritura, como lo haría un servidor
+        self._lock = threading.Lock()
+
+    def _simular_red(self, n_bytes):
+        self.bytes_enviados += n_bytes
+        self.llamadas += 1
+        espera = self.latencia + self.segundos_por_kb * n_bytes / 1024
+        if espera > 0:
+            time.sleep(espera)
+
+    def leer(self):
+        self.lecturas += 1
+        if self.latencia > 0:
+            time.sleep(self.latencia)
+        with self._lock:
+            return self.df.copy()
+
+    def version(self):
+        return self.revision
+
+    def leer_marca_ids(self):
+        return self.marca_ids
+
+    def reservar_ids(self, n, minimo=0):
+        """Sube la marca de IDs en 'n' (desde 'minimo' si es mayor) y devuelve la anterior."""
+        self._simular_red(bytes_payload([n, minimo]))
+        with self._lock:
+            base = max(self.marca_ids, minimo)
+            self.marca_ids = base + n
+            return base
+
+    def leer_ultimo_reinicio(self):
+        return self.ultimo_reinicio
+
+    def reclamar_reinicio(self, anterior, nuevo):
+        """Cambia la marca del último reinicio solo si sigue valiendo 'anterior'."""
+        with self._lock:
+            if self.ultimo_reinicio != anterior:
+                return False
+            self.ultimo_reinicio = nuevo
+            return True
+
+    def escribir_todo(self, df):
+        datos = [list(df.columns)] + [
+            [valor_celda(v) for v in fila] for fila in df.itertuples(index=False, name=None)
+        ]
+        self._simular_red(bytes_payload(datos))
+        with self._lock:
+            self.revision += 1
+            self.df = df.copy().reset_index(drop=True)
+
+    def _comprobar(self, delta, clave):
+        if delta.condiciones:
+            filas = {f[clave]: f for f in
+                     self.df[self.df[clave].isin(list(delta.condiciones))].to_dict('records')}
+            for id_fila, esperados in delta.condiciones.items():
+                if id_fila not in filas:
+                    raise ConflictoConcurrencia(f"La fila {id_fila} ya no existe")
+                for col, valor in esperados.items():
+                    if _normalizar(filas[id_fila][col]) != _normalizar(valor):
+                        raise ConflictoConcurrencia(f"La fila {id_fila} ha cambiado ({col})")
+        for tarea, unidades in delta.reservas.items():
+            if obtener_stock_real(self.df, tarea) < unidades:
+                raise ConflictoConcurrencia(f"Sin stock suficiente de '{tarea}'")
+
+    def aplicar_delta(self, delta, clave='ID'):
+        if delta.vacio:
+            return
+        self._simular_red(bytes_payload(delta.payload()))
+        with self._lock:
+            self._comprobar(delta, clave)
+            self.revision += 1
+            self.df = aplicar_delta_a_tabla(self.df, delta, clave)
+
+    def reservar(self, delta, clave='ID'):
+        """Guarda una asignación con 'reservas' solo si queda stock. True si se ha guardado."""
+        try:
+            self.aplicar_delta(delta, clave)
+        except ConflictoConcurrencia:
+            return False
+        return True
+
+
+class BackendGSheets:
+    """Adaptador sobre GSheetsConnection que sabe escribir solo los cambios.
+
+    Con 'libro' (URL o nombre) y 'pestana' trabaja sobre otra hoja que la de
+    la configuración de la conexión: así varios hogares comparten una sola
+    conexión (un cliente autenticado) con una hoja cada uno. La pestaña de
+    valores internos es 'Meta' o 'Meta_<pestana>' si se indica pestaña.
+
+    Con 'gestor' (conexion.GestorConexiones) las conexiones salen de su pool
+    y cada llamada a la API pasa por su cuota, reintentos y disyuntor; 'conn'
+    no se usa.
+    """
+
+    def __init__(self, conn=None, libro=None, pestana=None, gestor=None):
+        self.conn = conn
+        self.libro = libro
+        self.pestana = pestana
+        self.gestor = gestor
+        self.nombre_meta = f"Meta_{pestana}" if pestana else 'Meta'
+        self.bytes_enviados = 0
+        self.llamadas = 0
+        # Comprobar y escribir sin que se cuele otra sesión del mismo proceso
+        # (entre procesos sigue habiendo una ventana: Sheets no tiene transacciones)
+        self._escritura = threading.Lock()
+        # Worksheets ya abiertos por conexión (id(conn) -> worksheet)
+        self._worksheets = {}
+        self._metas = {}
+
+    @contextmanager
+    def _conexion(self):
+        if self.gestor is None:
+            yield self.conn
+        else:
+            with self.gestor.conexion() as conn:
+                yield conn
+
+    def _api(self, tipo, funcion, coste=1):
+        """Una llamada a la API ('lectura' o 'escritura')."""
+        if self.gestor is None:
+            return funcion()
+        return self.gestor.peticion(tipo, funcion, coste)
+
+    def leer(self):
+        with self._conexion() as conn:
+            return self._api('lectura', lambda: conn.read(spreadsheet=self.libro, worksheet=self.pestana, ttl=0))
+
+    def version(self):
+        """Fecha de última modificación del libro (Drive) o None si no se puede saber."""
+        try:
+            with self._conexion() as conn:
+                libro = self._hoja(conn).spreadsheet
+                if hasattr(libro, 'get_lastUpdateTime'):
+                    return self._api('lectura', libro.get_lastUpdateTime)
+                return self._api('lectura', lambda: libro.lastUpdateTime)
+        except Exception:
+            return None
+
+    def escribir_todo(self, df):
+        df = quitar_esquema(df)
+        self.bytes_enviados += bytes_payload(df.values.tolist())
+        self.llamadas += 1
+        with self._conexion() as conn:
+            # update() borra la hoja y la vuelve a escribir: dos peticiones
+            self._api('escritura', lambda: conn.update(spreadsheet=self.libro, worksheet=self.pestana, data=df),
+                      coste=2)
+
+    def _hoja(self, conn):
+        # Worksheet de gspread que hay detrás de la conexión (cuenta de servicio).
+        # Se abre una vez: abrir el libro por URL es otra llamada a la API.
+        hoja = self._worksheets.get(id(conn))
+        if hoja is None:
+            hoja = self._worksheets[id(conn)] = self._api(
+                'lectura', lambda: conn.client._select_worksheet(spreadsheet=self.libro, worksheet=self.pestana))
+        return hoja
+
+    def _hoja_meta(self, conn):
+        """Pestaña 'Meta' con los valores internos de la app (se crea si no existe)."""
+        hoja = self._metas.get(id(conn))
+        if hoja is not None:
+            return hoja
+        libro = self._hoja(conn).spreadsheet
+        try:
+            hoja = self._api('lectura', lambda: libro.worksheet(self.nombre_meta))
+        except Exception as e:
+            # Solo se crea si de verdad no existe, no porque la API falle
+            if es_fallo_servicio(e):
+                raise
+            hoja = self._api('escritura', lambda: libro.add_worksheet(title=self.nombre_meta, rows=10, cols=5))
+            self._api('escritura', lambda: hoja.update(range_name='A1:B1', values=[['marca_ids', 0]]))
+        if hoja.col_count < 5:
+            # Metas de antes de las reservas de IDs (D:E): solo tenían dos columnas
+            self._api('escritura', lambda: hoja.add_cols(5 - hoja.col_count))
+        self._metas[id(conn)] = hoja
+        return hoja
+
+    def _comprobar(self, hoja, cabecera, fila_de, delta):
+        from gspread.utils import rowcol_to_a1
+
+        if delta.condiciones:
+            ids = list(delta.condiciones)
+            for id_fila in ids:
+                if _clave_texto(id_fila) not in fila_de:
+                    raise ConflictoConcurrencia(f"La fila {id_fila} ya no existe")
+            rangos = [f"{rowcol_to_a1(fila_de[_clave_texto(i)], 1)}:"
+                      f"{rowcol_to_a1(fila_de[_clave_texto(i)], len(cabecera))}" for i in ids]
+            for id_fila, valores in zip(ids, self._api('lectura', lambda: hoja.batch_get(rangos))):
+                actual = dict(zip(cabecera, (valores[0] if valores else [])))
+                for col, valor in delta.condiciones[id_fila].items():
+                    if _normalizar(actual.get(col, '')) != _normalizar(valor):
+                        raise ConflictoConcurrencia(f"La fila {id_fila} ha cambiado ({col})")
+        if delta.reservas:
+            columnas = {c: self._api('lectura', lambda c=c: hoja.col_values(cabecera.index(c) + 1))[1:]
+                        for c in ('Tarea', 'Frecuencia', 'Tipo', 'Cantidad')}
+            largo = max(len(v) for v in columnas.values())
+            df = pd.DataFrame({c: v + [''] * (largo - len(v)) for c, v in columnas.items()})
+            df['Cantidad'] = pd.to_numeric(df['Cantidad'], errors='coerce').fillna(0)
+            for tarea, unidades in delta.reservas.items():
+                if obtener_stock_real(df, tarea) < unidades:
+                    raise ConflictoConcurrencia(f"Sin stock suficiente de '{tarea}'")
+
+    def _leer_meta(self, celda):
+        with self._conexion() as conn:
+            hoja = self._hoja_meta(conn)
+            valor = self._api('lectura', lambda: hoja.acell(celda).value)
+        return int(float(valor)) if valor else 0
+
+    def _guardar_meta(self, rango, fila):
+        with self._conexion() as conn:
+            hoja = self._hoja_meta(conn)
+            self._api('escritura', lambda: hoja.update(range_name=rango, values=[fila]))
+
+    def leer_marca_ids(self):
+        with self._conexion() as conn:
+            hoja = self._hoja_meta(conn)
+            marca, reservas = self._api('lectura', lambda: hoja.batch_get(['B1', 'D:E']))
+        return _plegar_reservas(marca, reservas)
+
+    def reservar_ids(self, n, minimo=0):
+        """Reserva de IDs sin leer y escribir la marca por separado.
+
+        Sheets no tiene transacciones, pero las filas añadidas sí quedan en un
+        orden único: cada reserva es una fila (n, mínimo) en las columnas D:E
+        de Meta y su bloque sale de sumar las anteriores, igual en todos los
+        procesos. B1 es la marca de antes de este registro.
+        """
+        with self._conexion() as conn:
+            hoja = self._hoja_meta(conn)
+            respuesta = self._api('escritura', lambda: hoja.append_row(
+                [int(n), int(minimo)], value_input_option='RAW', table_range='D1:E1'))
+            # 'Meta'!D7:E7 -> 7
+            fila = int(re.search(r'[A-Z]+(\d+)', respuesta['updates']['updatedRange'].split('!')[-1]).group(1))
+            marca, reservas = self._api('lectura', lambda: hoja.batch_get(['B1', f'D1:E{fila}']))
+        return max(_plegar_reservas(marca, reservas[:-1]), int(minimo))
+
+    def leer_ultimo_reinicio(self):
+        return self._leer_meta('B2')
+
+    def reclamar_reinicio(self, anterior, nuevo):
+        # Sin transacciones en Sheets: se relee justo antes de escribir
+        if self.leer_ultimo_reinicio() != anterior:
+            return False
+        self._guardar_meta('A2:B2', ['ultimo_reinicio', int(nuevo)])
+        return True
+
+    def aplicar_delta(self, delta, clave='ID'):
+        if delta.vacio:
+            return
+        with self._escritura, self._conexion() as conn:
+            self._aplicar_delta(self._hoja(conn), delta, clave)
+        self.bytes_enviados += bytes_payload(delta.payload())
+        self.llamadas += 1
+
+    def reservar(self, delta, clave='ID'):
+        """Guarda una asignación con 'reservas' solo si queda stock. True si se ha guardado.
+
+        Atómico solo dentro del proceso: la hoja no permite restar si hay stock
+        en una sola petición.
+        """
+        try:
+            self.aplicar_delta(delta, clave)
+        except ConflictoConcurrencia:
+            return False
+        return True
+
+    def _aplicar_delta(self, hoja, delta, clave):
+        from gspread.utils import rowcol_to_a1
+
+        cabecera = self._api('lectura', lambda: hoja.row_values(1))
+        if cabecera != delta.columnas:
+            raise ValueError("La cabecera de la hoja no coincide con la tabla local")
+        col_clave = cabecera.index(clave) + 1
+        # Solo se descarga la columna ID para localizar las filas por clave
+        ids_hoja = self._api('lectura', lambda: hoja.col_values(col_clave))[1:]
+        fila_de = {_clave_texto(v): n for n, v in enumerate(ids_hoja, start=2)}
+        # Sheets no tiene transacciones: las condiciones se comprueban justo antes
+        # de escribir, lo que deja una ventana mínima en lugar de 'gana el último'
+        self._comprobar(hoja, cabecera, fila_de, delta)
+
+        rangos = []
+        for id_fila, cambios in delta.actualizados.items():
+            n = fila_de.get(_clave_texto(id_fila))
+            if n is None:
+                raise KeyError(f"ID {id_fila} no encontrado en la hoja")
+            # Celdas contiguas de la misma fila en un solo rango
+            for inicio, valores in _tramos({cabecera.index(c) + 1: v for c, v in cambios.items()}):
+                rangos.append({'range': f"{rowcol_to_a1(n, inicio)}:{rowcol_to_a1(n, inicio + len(valores) - 1)}",
+                               'values': [valores]})
+        if rangos:
+            self._api('escritura', lambda: hoja.batch_update(rangos))
+        filas_borrar = [fila_de[_clave_texto(i)] for i in delta.borrados if _clave_texto(i) in fila_de]
+        if filas_borrar:
+            # Todos los borrados en una sola petición, de abajo hacia arriba para
+            # que cada tramo no desplace a los que quedan por borrar
+            tramos = sorted(_tramos({n: None for n in filas_borrar}), reverse=True)
+            self._api('escritura', lambda: hoja.spreadsheet.batch_update({'requests': [
+                {'deleteDimension': {'range': {'sheetId': hoja.id, 'dimension': 'ROWS',
+                                               'startIndex': inicio - 1,
+                                               'endIndex': inicio - 1 + len(valores)}}}
+                for inicio, valores in tramos]}))
+        if delta.insertados:
+            self._api('escritura', lambda: hoja.append_rows(delta.insertados, value_input_option='USER_ENTERED'))
+
+
+class BackendSQLite:
+    """Base de datos SQLite local: actualizaciones por fila dentro de transacciones.
+
+    Pensado para instalaciones con mucho tráfico. La tabla 'tareas' está
+    indexada por ID (clave primaria), Responsable, Estado y Tarea, y la tabla
+    'meta' guarda la revisión (versión para la caché) y la marca de IDs.
+
+    Cada conexión espera hasta 'espera_bloqueo' segundos a que otro escritor
+    suelte la base; las operaciones cortas sobre 'meta' reintentan además
+    'reintentos_bloqueo' veces si aun así la encuentran bloqueada.
+    """
+
+    espera_bloqueo = 10
+    reintentos_bloqueo = 5
+
+    def __init__(self, ruta='tareas.db', columnas=None):
+        self.ruta = ruta
+        self.bytes_enviados = 0
+        self.llamadas = 0
+        with self._conectar() as con:
+            existe = con.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='tareas'").fetchone()
+            if not existe:
+                self._crear_tabla(con, columnas or COLUMNAS)
+            con.execute("CREATE TABLE IF NOT EXISTS meta (clave TEXT PRIMARY KEY, valor INTEGER)")
+            con.execute("INSERT OR IGNORE INTO meta VALUES ('revision', 0), ('marca_ids', 0), "
+                        "('ultimo_reinicio', 0)")
+            self.columnas = [r[1] for r in con.execute("PRAGMA table_info(tareas)")]
+
+    def _conectar(self):
+        # Una conexión por operación: sirve igual para varios hilos y procesos
+        return sqlite3.connect(self.ruta, timeout=self.espera_bloqueo, isolation_level=None)
+
+    def _escribir_meta(self, sql, parametros):
+        """Ejecuta una sentencia sobre 'meta' en su propia transacción y devuelve el cursor.
+
+        BEGIN IMMEDIATE pide el bloqueo de escritura de entrada: una sentencia
+        suelta lo pediría después de leer y SQLite la rechazaría sin esperar si
+        otra conexión ya estaba escribiendo. Si la base sigue bloqueada pasada
+        la espera de la conexión (SQLITE_BUSY), se vuelve a intentar.
+        """
+        for intento in range(self.reintentos_bloqueo + 1):
+            con = self._conectar()
+            try:
+                con.execute("BEGIN IMMEDIATE")
+                cursor = con.execute(sql, parametros)
+                filas = cursor.fetchall()
+                con.execute("COMMIT")
+                return cursor.rowcount, filas
+            except sqlite3.OperationalError as e:
+                if con.in_transaction:
+                    con.execute("ROLLBACK")
+                if 'locked' not in str(e) or intento == self.reintentos_bloqueo:
+                    raise
+            finally:
+                con.close()
+            time.sleep(min(0.05 * 2 ** intento, 1.0))
+
+    @staticmethod
+    def _q(columna):
+        return '"' + str(columna).replace('"', '""') + '"'
+
+    def _crear_tabla(self, con, columnas):
+        tipos = {'ID': 'INTEGER PRIMARY KEY', 'Cantidad': 'NUMERIC'}
+        definicion = ", ".join(f"{self._q(c)} {tipos.get(c, 'TEXT')}" for c in columnas)
+        con.execute(f"CREATE TABLE tareas ({definicion})")
+        for c in ('Responsable', 'Estado', 'Tarea'):
+            if c in columnas:
+                con.execute(f"CREATE INDEX IF NOT EXISTS idx_tareas_{c.lower()} ON tareas ({self._q(c)})")
+
+    def _subir_revision(self, con):
+        con.execute("UPDATE meta SET valor = valor + 1 WHERE clave = 'revision'")
+
+    def leer(self):
+        with self._conectar() as con:
+            # El orden de inserción (rowid) hace de orden de la hoja
+            return pd.read_sql_query("SELECT * FROM tareas ORDER BY rowid", con)
+
+    def version(self):
+        with self._conectar() as con:
+            return con.execute("SELECT valor FROM meta WHERE clave = 'revision'").fetchone()[0]
+
+    def leer_marca_ids(self):
+        with self._conectar() as con:
+            return con.execute("SELECT valor FROM meta WHERE clave = 'marca_ids'").fetchone()[0]
+
+    def reservar_ids(self, n, minimo=0):
+        """Sube la marca de IDs en 'n' (desde 'minimo' si es mayor) y devuelve la anterior.
+
+        Una sola sentencia: dos procesos no pueden leer la misma marca.
+        """
+        _, filas = self._escribir_meta(
+            "UPDATE meta SET valor = MAX(valor, ?) + ? WHERE clave = 'marca_ids' RETURNING valor",
+            (int(minimo), int(n)))
+        return filas[0][0] - n
+
+    def leer_ultimo_reinicio(self):
+        with self._conectar() as con:
+            return con.execute("SELECT valor FROM meta WHERE clave = 'ultimo_reinicio'").fetchone()[0]
+
+    def reclamar_reinicio(self, anterior, nuevo):
+        """Cambia la marca del último reinicio solo si sigue valiendo 'anterior'."""
+        cambiadas, _ = self._escribir_meta("UPDATE meta SET valor = ? WHERE clave = 'ultimo_reinicio' AND valor = ?",
+                                           (int(nuevo), int(anterior)))
+        return cambiadas == 1
+
+    def escribir_todo(self, df):
+        filas = [[valor_celda(v) for v in fila] for fila in df.itertuples(index=False, name=None)]
+        con = self._conectar()
+        try:
+            con.execute("BEGIN IMMEDIATE")
+            con.execute("DROP TABLE IF EXISTS tareas")
+            self._crear_tabla(con, list(df.columns))
+            marcas = ", ".join("?" for _ in df.columns)
+            con.executemany(f"INSERT INTO tareas VALUES ({marcas})", filas)
+            self._subir_revision(con)
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+        finally:
+            con.close()
+        self.columnas = list(df.columns)
+        self.bytes_enviados += bytes_payload(filas)
+        self.llamadas += 1
+
+    def _comprobar(self, con, delta, clave):
+        for id_fila, esperados in delta.condiciones.items():
+            cols = list(esperados)
+            fila = con.execute(
+                f"SELECT {', '.join(self._q(c) for c in cols)} FROM tareas WHERE {self._q(clave)} = ?",
+                (id_fila,)).fetchone()
+            if fila is None:
+                raise ConflictoConcurrencia(f"La fila {id_fila} ya no existe")
+            for col, actual in zip(cols, fila):
+                if _normalizar(actual) != _normalizar(esperados[col]):
+                    raise ConflictoConcurrencia(f"La fila {id_fila} ha cambiado ({col})")
+        for tarea, unidades in delta.reservas.items():
+            maestra = con.execute(
+                "SELECT Cantidad, Tipo FROM tareas WHERE Tarea = ? AND Frecuencia != 'Puntual' "
+                "ORDER BY rowid LIMIT 1", (tarea,)).fetchone()
+            asignadas = con.execute(
+                "SELECT COUNT(*) FROM tareas WHERE Tarea = ? AND Frecuencia = 'Puntual'",
+                (tarea,)).fetchone()[0]
+            objetivo = int(float(maestra[0])) if maestra and maestra[0] not in (None, '-') else 0
+            if maestra and maestra[1] not in TIPOS_CONTADOR:
+                # Una tarea normal es un contador de una unidad
+                objetivo = 1
+            if objetivo - asignadas < unidades:
+                raise ConflictoConcurrencia(f"Sin stock suficiente de '{tarea}'")
+
+    def aplicar_delta(self, delta, clave='ID'):
+        if delta.vacio:
+            return
+        con = self._conectar()
+        try:
+            # BEGIN IMMEDIATE: comprobación y escritura sin que se cuele otro escritor
+            con.execute("BEGIN IMMEDIATE")
+            self._comprobar(con, delta, clave)
+            # Filas con las mismas columnas cambiadas van en un solo executemany
+            grupos = {}
+            for id_fila, cambios in delta.actualizados.items():
+                grupos.setdefault(tuple(cambios), []).append((*cambios.values(), id_fila))
+            for cols, filas in grupos.items():
+                asignaciones = ", ".join(f"{self._q(c)} = ?" for c in cols)
+                con.executemany(f"UPDATE tareas SET {asignaciones} WHERE {self._q(clave)} = ?", filas)
+            if delta.borrados:
+                con.executemany(f"DELETE FROM tareas WHERE {self._q(clave)} = ?",
+                                [(i,) for i in delta.borrados])
+            if delta.insertados:
+                columnas = ", ".join(self._q(c) for c in delta.columnas)
+                marcas = ", ".join("?" for _ in delta.columnas)
+                con.executemany(f"INSERT INTO tareas ({columnas}) VALUES ({marcas})", delta.insertados)
+            self._subir_revision(con)
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+        finally:
+            con.close()
+        self.bytes_enviados += bytes_payload(delta.payload())
+        self.llamadas += 1
+
+    def reservar(self, delta, clave='ID'):
+        """Guarda una asignación con 'reservas' solo si queda stock. True si se ha guardado.
+
+        Comprobación y escritura van en la misma transacción, así que dos
+        sesiones no pueden llevarse la última unidad, y quien llega tarde lo
+        sabe en la misma llamada sin releer la tabla.
+        """
+        try:
+            self.aplicar_delta(delta, clave)
+        except ConflictoConcurrencia:
+            return False
+        return True
+
+
+def crear_backend(tipo, conn=None, ruta_sqlite='tareas.db', libro=None, pestana=None, gestor=None):
+    """Backend según configuración: 'gsheets' (por defecto), 'sqlite', 'normalizado' o 'memoria'."""
+    if tipo == 'sqlite':
+        return BackendSQLite(ruta_sqlite)
+    if tipo == 'normalizado':
+        # modelo.py importa este módulo
+        from modelo import BackendNormalizado
+        return BackendNormalizado(ruta_sqlite)
+    if tipo == 'memoria':
+        return BackendMemoria()
+    if tipo == 'gsheets':
+        return BackendGSheets(conn, libro=libro, pestana=pestana, gestor=gestor)
+    raise ValueError(f"Backend desconocido: {tipo}")
+
+
+# ==========================================
+# CACHÉ COMPARTIDA DE LECTURA
+# ==========================================
+class CacheTabla:
+    """Instantánea de la tabla compartida por todas las sesiones del proceso.
+
+    Solo se vuelve a leer la hoja cuando cambia la versión del backend. Para no
+    preguntar la versión en cada recarga, se comprueba como mucho cada
+    'comprobar_cada' segundos. Las escrituras hechas desde la app se aplican
+    a la instantánea como deltas, sin volver a leer la hoja (write-through).
+
+    La tabla devuelta es compartida: quien quiera modificarla debe copiarla.
+    """
+
+    def __init__(self, backend, comprobar_cada=5.0):
+        self.backend = backend
+        self.comprobar_cada = comprobar_cada
+        self.aciertos = 0
+        self.fallos = 0
+        self._df = None
+        self._pendientes = []
+        self._version = None
+        self._ultima_comprobacion = 0.0
+        self._lock = threading.Lock()
+
+    def _recargar(self):
+        self.fallos += 1
+        self._pendientes = []
+        # La versión se lee antes que la tabla: si alguien escribe entre medias,
+        # la instantánea queda con una versión vieja y se relee en la siguiente
+        # comprobación (al revés se quedaría vieja con la versión nueva)
+        self._version = self.backend.version()
+        self._df = aplicar_esquema(self.backend.leer())
+        self._ultima_comprobacion = time.monotonic()
+
+    def obtener(self, forzar=False):
+        with self._lock:
+            if forzar or self._df is None:
+                self._recargar()
+                return self._df
+            ahora = time.monotonic()
+            if ahora - self._ultima_comprobacion >= self.comprobar_cada:
+                self._ultima_comprobacion = ahora
+                version = self.backend.version()
+                if version is None or version != self._version:
+                    self._recargar()
+                    return self._df
+            self.aciertos += 1
+            if self._pendientes:
+                for delta in self._pendientes:
+                    self._df = aplicar_delta_a_tabla(self._df, delta)
+                self._pendientes = []
+            return self._df
+
+    def registrar_escritura(self, delta, escrituras=1):
+        """Aplica a la instantánea los cambios de un guardado correcto.
+
+        Se aplican en la siguiente lectura y sobre la instantánea compartida, no
+        sobre la tabla de la sesión (que puede no tener los cambios de otras).
+        'escrituras' es cuántas veces ha subido la versión del backend con este
+        guardado (0 si se ha encolado y aún no se ha enviado).
+        """
+        with self._lock:
+            self._pendientes.append(delta)
+            self._avanzar(0 if delta.vacio else escrituras)
+
+    def actualizar_version(self, escrituras=1):
+        """Da por vistas las 'escrituras' de un envío diferido ya hecho."""
+        with self._lock:
+            self._avanzar(escrituras)
+
+    def _avanzar(self, escrituras):
+        # Solo se adopta la versión nueva si es justo la que dejan nuestras
+        # escrituras: si otro proceso ha escrito entre medias (o el backend no
+        # da versiones numeradas, como Sheets) la instantánea se relee entera
+        version = self.backend.version()
+        if escrituras == 0:
+            esperada = version is not None and version == self._version
+        else:
+            esperada = isinstance(self._version, int) and version == self._version + escrituras
+        if esperada:
+            self._version = version
+            self._ultima_comprobacion = time.monotonic()
+        else:
+            self._df = None
+            self._pendientes = []
+            self._version = None
+
+    def invalidar(self):
+        with self._lock:
+            self._df = None
+            self._pendientes = []
+            self._version = None
+
+    def estadisticas(self):
+        total = self.aciertos + self.fallos
+        return {
+            'aciertos': self.aciertos,
+            'fallos': self.fallos,
+            'ratio_aciertos': self.aciertos / total if total else 0.0,
+        }
+
+
+# ==========================================
+# ASIGNACIÓN DE IDS
+# ==========================================
+class AsignadorIDs:
+    """Reparte IDs nuevos en O(1) sin recorrer la columna 'ID'.
+
+    Reserva bloques de 'tam_bloque' IDs subiendo en el backend la marca más
+    alta repartida (backend.reservar_ids, atómica), así que solo hay una
+    escritura cada 'tam_bloque' IDs y dos procesos no reciben nunca el mismo
+    bloque.
+    Dentro del proceso, un lock hace que dos sesiones que asignan a la vez
+    obtengan IDs distintos. Los huecos (bloques sin agotar) no son problema.
+    """
+
+    def __init__(self, backend=None, tam_bloque=50):
+        self.backend = backend
+        self.tam_bloque = tam_bloque
+        self._siguiente = 1
+        self._limite = 0
+        self._lock = threading.Lock()
+
+    def _pedir_bloque(self, n):
+        tam = max(n, self.tam_bloque)
+        base = self._limite
+        if self.backend is not None:
+            # Leer y subir la marca es una sola operación del backend
+            base = self.backend.reservar_ids(tam, minimo=base)
+        self._siguiente = base + 1
+        self._limite = base + tam
+
+    def asegurar_minimo(self, max_id):
+        """Evita repartir IDs que ya existen en la tabla (p.ej. filas añadidas a mano)."""
+        with self._lock:
+            if max_id >= self._siguiente:
+                self._siguiente = max_id + 1
+                self._limite = max(self._limite, max_id)
+
+    def siguiente(self):
+        with self._lock:
+            if self._siguiente > self._limite:
+                self._pedir_bloque(1)
+            id_nuevo = self._siguiente
+            self._siguiente += 1
+            return id_nuevo
+
+    def reservar(self, n):
+        """Bloque de 'n' IDs consecutivos para inserciones en lote."""
+        with self._lock:
+            if self._siguiente + n - 1 > self._limite:
+                self._pedir_bloque(n)
+            ids = range(self._siguiente, self._siguiente + n)
+            self._siguiente += n
+            return ids
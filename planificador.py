@@ -0,0 +1,148 @@
+import threading
+from datetime import date, datetime, time as hora_dia, timedelta
+
+from almacen import AlmacenTareas, ejecutar_con_reintentos
+from cola import ColaSinEnviar
+
+# ==========================================
+# REINICIO DIARIO AUTOMÁTICO
+# ==========================================
+# Un hilo en segundo plano hace el cierre del día (archivar lo hecho en el
+# historial y reiniciar la tabla) a la hora configurada, fuera de cualquier
+# petición de usuario. La marca 'ultimo_reinicio' del backend dice qué día
+# se reinició por última vez: si el proceso estuvo parado se recupera al
+# arrancar, y si hay varios procesos solo uno se queda con cada día. La marca
+# se pone después de guardar el reinicio: si el proceso muere a medias, la
+# siguiente comprobación (de este o de otro proceso) lo repite.
+
+
+class _DiaYaCerrado(Exception):
+    """Otro proceso ha marcado el día mientras este preparaba el reinicio."""
+
+
+def _leer_hora(texto):
+    horas, minutos = (int(x) for x in str(texto).split(':'))
+    return hora_dia(horas, minutos)
+
+
+class PlanificadorReinicio:
+    """Reinicia la tabla una vez al día a partir de 'hora' ('HH:MM').
+
+    - El primer arranque (backend sin marca) solo apunta el día: no reinicia
+      lo que ya hay en la hoja.
+    - Tras una parada de varios días basta un reinicio: la tabla no guarda
+      nada por día, así que no hay que repetirlo por cada día perdido.
+    - Repetirlo es inocuo: el historial no duplica IDs y una tabla ya
+      reiniciada da un delta vacío.
+    - Con 'replica', 'backend' es su remoto: el reinicio y la marca van a la
+      hoja, no a la cola de la copia local. Antes se vacía esa cola y después
+      se trae el resultado a la copia.
+    """
+
+    def __init__(self, backend, ids=None, historial=None, hora='04:00', comprobar_cada=60.0,
+                 al_reiniciar=None, reloj=datetime.now, replica=None, iniciar=True):
+        self.backend = backend
+        self.replica = replica
+        self.ids = ids
+        self.historial = historial
+        self.hora = _leer_hora(hora)
+        self.comprobar_cada = comprobar_cada
+        self.al_reiniciar = al_reiniciar
+        self.reloj = reloj
+        self.reinicios = 0
+        self.ultimo_reinicio = None
+        # Último día reiniciado según el backend (se vuelve a preguntar cuando toca otro día)
+        self.ultimo_dia = None
+        self.ultimo_error = None
+        self._parar = threading.Event()
+        self._hilo = threading.Thread(target=self._bucle, name="reinicio-diario", daemon=True)
+        if iniciar:
+            self._hilo.start()
+
+    def dia_debido(self, ahora=None):
+        """Último día cuyo reinicio ya tocaba a la hora 'ahora'."""
+        ahora = ahora or self.reloj()
+        return ahora.date() if ahora.time() >= self.hora else ahora.date() - timedelta(days=1)
+
+    def proximo(self, ahora=None):
+        """Fecha y hora del próximo reinicio automático."""
+        return datetime.combine(self.dia_debido(ahora) + timedelta(days=1), self.hora)
+
+    def _momento_archivo(self, dia):
+        # Con hora de madrugada se cierra el día anterior; si no, el mismo día
+        if self.hora < hora_dia(12, 0):
+            return datetime.combine(dia - timedelta(days=1), hora_dia(23, 59, 59))
+        return datetime.combine(dia, self.hora)
+
+    def _cargar(self):
+        return AlmacenTareas(self.backend.leer(), ids=self.ids)
+
+    def comprobar(self):
+        """Hace el reinicio si toca. Devuelve True si lo ha hecho este proceso."""
+        debido = self.dia_debido()
+        # La marca solo avanza: hasta que no toque otro día no hace falta preguntarla
+        # (con muchos hogares serían lecturas de la cuota cada minuto)
+        if self.ultimo_dia is not None and self.ultimo_dia >= debido:
+            return False
+        ultimo = self.backend.leer_ultimo_reinicio()
+        if not ultimo:
+            self.backend.reclamar_reinicio(ultimo, debido.toordinal())
+            self.ultimo_dia = debido
+            return False
+        self.ultimo_dia = date.fromordinal(ultimo)
+        if ultimo >= debido.toordinal():
+            return False
+
+        def cargar():
+            # Cada relectura comprueba la marca: si otro proceso ya ha cerrado el
+            # día, volver a reiniciar borraría lo asignado después
+            if self.backend.leer_ultimo_reinicio() != ultimo:
+                raise _DiaYaCerrado()
+            return self._cargar()
+        # Lo que la copia local aún no ha enviado se escribiría después encima del reinicio
+        if self.replica is not None and not self.replica.cola.vaciar():
+            raise ColaSinEnviar("Hay cambios sin enviar a la hoja; el reinicio se reintentará")
+        try:
+            almacen = cargar()
+            if self.historial is not None:
+                self.historial.cerrar_dia(almacen.tabla(), momento=self._momento_archivo(debido))
+            _, delta = ejecutar_con_reintentos(almacen, lambda a: a.reinicio_diario(), self.backend, cargar)
+        except _DiaYaCerrado:
+            self.ultimo_dia = date.fromordinal(self.backend.leer_ultimo_reinicio())
+            return False
+        # Si otro proceso lo ha marcado a la vez, los dos reinicios dejan la misma tabla
+        self.backend.reclamar_reinicio(ultimo, debido.toordinal())
+        if self.replica is not None:
+            self.replica.sincronizar()
+        self.reinicios += 1
+        self.ultimo_reinicio = self.reloj()
+        self.ultimo_dia = debido
+        if self.al_reiniciar is not None:
+            self.al_reiniciar(delta)
+        return True
+
+    def detener(self):
+        self._parar.set()
+        if self._hilo.is_alive():
+            self._hilo.join()
+
+    def estado(self):
+        return {
+            'reinicios': self.reinicios,
+            'ultimo_reinicio': self.ultimo_reinicio,
+            'ultimo_dia': self.ultimo_dia,
+            'proximo': self.proximo(),
+            'ultimo_error': self.ultimo_error,
+        }
+
+    # --- Hilo ---
+    def _bucle(self):
+        # La primera comprobación es inmediata: recupera el reinicio si el proceso estuvo parado
+        while True:
+            try:
+                self.comprobar()
+                self.ultimo_error = None
+            except Exception as e:
+                self.ultimo_error = str(e)
+            if self._parar.wait(self.comprobar_cada):
+                return
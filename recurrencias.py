@@ -0,0 +1,184 @@
+import calendar
+import re
+from collections import defaultdict
+from datetime import date, timedelta
+from functools import lru_cache
+
+# ==========================================
+# RECURRENCIAS (FRECUENCIA DE LAS TAREAS)
+# ==========================================
+# La columna 'Frecuencia' de las filas maestras dice qué días toca cada tarea:
+#   'Diaria' / 'Diario'            todos los días
+#   'Semanal' / 'Semanal: L,X,V'   los lunes / los días indicados (L M X J V S D)
+#   'Mensual' / 'Mensual: 15'      el día 1 / el día indicado (o el último del mes)
+#   'Quincenal'                    cada 14 días
+#   'Cada 3 días [desde AAAA-MM-DD]'
+# 'Puntual' son asignaciones, no plantillas. Un texto que no se entiende se
+# trata como diario, que es lo que hacía la app hasta ahora con todo.
+
+DIAS_SEMANA = ['L', 'M', 'X', 'J', 'V', 'S', 'D']
+# Origen de los 'Cada N días' sin fecha (un lunes, para que 'Quincenal' caiga en lunes)
+ANCLA = date(2024, 1, 1)
+
+
+class Regla:
+    """Cuándo toca una plantilla: 'diaria', 'semanal' (dias), 'mensual' (dia) o 'cada' (n, ancla)."""
+
+    def __init__(self, tipo, dias=(), dia=1, n=1, ancla=ANCLA):
+        self.tipo = tipo
+        self.dias = tuple(dias)
+        self.dia = dia
+        self.n = n
+        self.ancla = ancla
+
+    def toca(self, dia):
+        if self.tipo == 'semanal':
+            return dia.weekday() in self.dias
+        if self.tipo == 'mensual':
+            return dia.day == min(self.dia, calendar.monthrange(dia.year, dia.month)[1])
+        if self.tipo == 'cada':
+            return dia >= self.ancla and (dia - self.ancla).days % self.n == 0
+        return True
+
+    def fechas(self, desde, hasta):
+        """Días en que toca entre 'desde' y 'hasta' (incluidos), uno a uno."""
+        dia = desde
+        if self.tipo == 'cada':
+            # Salta directamente a la primera fecha que cae en el ciclo
+            dia = max(desde, self.ancla)
+            dia += timedelta(days=-(dia - self.ancla).days % self.n)
+            paso = timedelta(days=self.n)
+        else:
+            paso = timedelta(days=1)
+        while dia <= hasta:
+            if self.toca(dia):
+                yield dia
+            dia += paso
+
+    def __repr__(self):
+        return f"Regla({escribir_frecuencia(self)!r})"
+
+
+@lru_cache(maxsize=256)
+def leer_frecuencia(texto):
+    """Regla de un texto de 'Frecuencia'; None para 'Puntual'."""
+    texto = str(texto).strip()
+    if texto == 'Puntual':
+        return None
+    m = re.fullmatch(r'Semanal(?:\s*:\s*(.+))?', texto, re.I)
+    if m:
+        letras = [x.strip().upper() for x in (m.group(1) or 'L').split(',')]
+        dias = sorted({DIAS_SEMANA.index(x) for x in letras if x in DIAS_SEMANA})
+        return Regla('semanal', dias=dias or [0])
+    m = re.fullmatch(r'Mensual(?:\s*:\s*(\d{1,2}))?', texto, re.I)
+    if m:
+        return Regla('mensual', dia=min(31, max(1, int(m.group(1) or 1))))
+    if re.fullmatch(r'Quincenal', texto, re.I):
+        return Regla('cada', n=14)
+    m = re.fullmatch(r'Cada\s+(\d+)\s+d[ií]as?(?:\s+desde\s+(\d{4}-\d{2}-\d{2}))?', texto, re.I)
+    if m:
+        ancla = date.fromisoformat(m.group(2)) if m.group(2) else ANCLA
+        return Regla('cada', n=max(1, int(m.group(1))), ancla=ancla)
+    return Regla('diaria')
+
+
+def escribir_frecuencia(regla):
+    """Texto para la columna 'Frecuencia' (inverso de leer_frecuencia)."""
+    if regla.tipo == 'semanal':
+        return "Semanal: " + ",".join(DIAS_SEMANA[d] for d in regla.dias)
+    if regla.tipo == 'mensual':
+        return f"Mensual: {regla.dia}"
+    if regla.tipo == 'cada':
+        texto = f"Cada {regla.n} días"
+        return texto if regla.ancla == ANCLA else f"{texto} desde {regla.ancla.isoformat()}"
+    return 'Diaria'
+
+
+class IndiceRecurrencias:
+    """Plantillas agrupadas por cuándo tocan, para saber lo de hoy sin recorrerlas todas.
+
+    debidas(dia) mira solo tres cubetas (diarias, día de la semana, día del
+    mes) y una por cada periodo distinto de 'Cada N días'.
+    """
+
+    def __init__(self):
+        self._regla = {}
+        self._diarias = set()
+        self._semana = defaultdict(set)
+        self._mes = defaultdict(set)
+        # {n: {resto del ancla módulo n: IDs}}
+        self._cada = defaultdict(lambda: defaultdict(set))
+
+    def __len__(self):
+        return len(self._regla)
+
+    def __contains__(self, id_plantilla):
+        return id_plantilla in self._regla
+
+    def _cubetas(self, regla):
+        if regla.tipo == 'semanal':
+            return [self._semana[d] for d in regla.dias]
+        if regla.tipo == 'mensual':
+            return [self._mes[regla.dia]]
+        if regla.tipo == 'cada':
+            return [self._cada[regla.n][regla.ancla.toordinal() % regla.n]]
+        return [self._diarias]
+
+    def agregar(self, id_plantilla, frecuencia):
+        regla = leer_frecuencia(frecuencia)
+        if regla is None:
+            return
+        self.quitar(id_plantilla)
+        self._regla[id_plantilla] = regla
+        for cubeta in self._cubetas(regla):
+            cubeta.add(id_plantilla)
+
+    def quitar(self, id_plantilla):
+        regla = self._regla.pop(id_plantilla, None)
+        if regla is not None:
+            for cubeta in self._cubetas(regla):
+                cubeta.discard(id_plantilla)
+
+    def regla(self, id_plantilla):
+        return self._regla.get(id_plantilla)
+
+    def debidas(self, dia):
+        """IDs de las plantillas que tocan el día 'dia'."""
+        debidas = set(self._diarias)
+        debidas |= self._semana.get(dia.weekday(), set())
+        ultimo = calendar.monthrange(dia.year, dia.month)[1]
+        dias_mes = range(dia.day, 32) if dia.day == ultimo else [dia.day]
+        for d in dias_mes:
+            debidas |= self._mes.get(d, set())
+        ordinal = dia.toordinal()
+        for n, por_resto in self._cada.items():
+            for id_plantilla in por_resto.get(ordinal % n, ()):
+                # El ciclo empieza en el ancla: antes de ella no toca
+                if self._regla[id_plantilla].ancla <= dia:
+                    debidas.add(id_plantilla)
+        return debidas
+
+    def instancias(self, desde, hasta):
+        """Genera (día, ID de plantilla) de todo lo que toca entre dos días, día a día."""
+        dia = desde
+        while dia <= hasta:
+            for id_plantilla in sorted(self.debidas(dia), key=str):
+                yield dia, id_plantilla
+            dia += timedelta(days=1)
+
+
+def indice_de_tabla(df):
+    """Índice con las filas maestras de una tabla de tareas ('Puntual' se ignora)."""
+    indice = IndiceRecurrencias()
+    if not df.empty:
+        for id_plantilla, frecuencia in zip(df['ID'], df['Frecuencia']):
+            indice.agregar(id_plantilla, frecuencia)
+    return indice
+
+
+def expandir(df, desde, hasta):
+    """Genera las instancias concretas (dict de la fila + 'Fecha') entre dos días."""
+    indice = indice_de_tabla(df)
+    filas = {f['ID']: f for f in df.to_dict('records') if f['ID'] in indice}
+    for dia, id_plantilla in indice.instancias(desde, hasta):
+        yield {**filas[id_plantilla], 'Fecha': dia}
@@ -0,0 +1,234 @@
+import threading
+import time
+
+from cola import ColaDetenida, ColaEscritura, ColaSinEnviar
+from esquema import aplicar_esquema, quitar_esquema
+from persistencia import BackendSQLite, calcular_delta
+
+# ==========================================
+# RÉPLICA LOCAL (OFFLINE-FIRST)
+# ==========================================
+# La app lee y escribe siempre en una copia SQLite en disco, así que cargar
+# una página no depende de la API de Sheets y sigue funcionando si se cae.
+# En segundo plano:
+# - los cambios locales se envían a la hoja con una ColaEscritura (lotes,
+#   reintentos, persistencia en disco);
+# - cada 'intervalo' segundos, si no queda nada por enviar y la hoja ha
+#   cambiado, se traen sus cambios a la copia local como un delta. Mientras
+#   la hoja no cambia, la espera se dobla hasta 'intervalo_max', y con
+#   'sondeo' (el presupuesto que comparten las réplicas de todos los
+#   hogares) una vuelta sin presupuesto no pregunta a la hoja.
+# Si la hoja rechaza un cambio por conflicto, la copia local se rehace desde
+# la hoja en la siguiente sincronización (la hoja manda).
+
+
+class ReplicaSinDatos(Exception):
+    """La copia local es nueva y todavía no se ha podido llenar desde la hoja."""
+
+
+def _normalizada(df):
+    """Tabla con tipos simples y comparables venga de la hoja o de SQLite."""
+    return quitar_esquema(aplicar_esquema(df))
+
+
+class BackendReplica:
+    """Backend sobre una copia local de 'remoto' que se sincroniza sola.
+
+    - leer(), version() y aplicar_delta() trabajan contra la copia local; los
+      deltas aplicados se encolan para el remoto.
+    - Las marcas de IDs y del reinicio diario se piden al remoto: sirven para
+      coordinar procesos y no pueden decidirse con una copia local.
+    - escribir_todo() es síncrono contra el remoto (requiere conexión).
+    - Una copia recién creada no sirve nada hasta la primera sincronización:
+      leer() lanza ReplicaSinDatos en vez de dar una tabla vacía.
+    """
+
+    def __init__(self, remoto, ruta='replica.db', intervalo=10.0, intervalo_envio=2.0, ruta_cola=None,
+                 intervalo_max=None, sondeo=None, iniciar=True, **opciones_cola):
+        self.remoto = remoto
+        self.local = BackendSQLite(ruta)
+        self.ruta = ruta
+        self.intervalo = intervalo
+        self.intervalo_max = intervalo_max if intervalo_max is not None else 8 * intervalo
+        # sondeo() -> bool: si queda presupuesto para preguntar a la hoja en esta vuelta
+        self.sondeo = sondeo
+        self.sondeos_omitidos = 0
+        # Espera hasta la siguiente vuelta del hilo (crece mientras la hoja no cambia)
+        self._espera = intervalo
+        self.sincronizaciones = 0
+        self.ultima_sincronizacion = None
+        self.ultimo_error = None
+        self._version_remota = None
+        # Hay que rehacer la copia desde el remoto aunque su versión no cambie
+        self._forzar = False
+        self._escrituras = 0
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._despertar = threading.Event()
+        self.cola = ColaEscritura(remoto, ruta=ruta_cola or f"{ruta}.cola.jsonl",
+                                  intervalo=intervalo_envio, al_enviar=self._al_enviar, **opciones_cola)
+        self._hilo = threading.Thread(target=self._bucle, name="replica-sincronizacion", daemon=True)
+        # Copia recién creada: vacía no significa 'no hay tareas' hasta que se llene
+        self.sin_datos = self.local.version() == 0
+        if self.sin_datos:
+            # Se intenta llenar antes de servir la primera página
+            self._sincronizar_seguro()
+        if iniciar:
+            self._hilo.start()
+
+    # --- Interfaz de backend ---
+    def leer(self):
+        if self.sin_datos:
+            raise ReplicaSinDatos(f"Aún no se ha podido traer la hoja ({self.ultimo_error or 'sin sincronizar'})")
+        return self.local.leer()
+
+    def version(self):
+        return self.local.version()
+
+    def aplicar_delta(self, delta, clave='ID'):
+        if delta.vacio:
+            return
+        with self._lock:
+            self._comprobar_activa()
+            self.local.aplicar_delta(delta, clave)
+            self._escrituras += 1
+            # Hay actividad en el hogar: se vuelve a mirar la hoja a menudo
+            self._espera = self.intervalo
+            try:
+                self.cola.encolar(delta)
+            except Exception:
+                # Ya está en la copia local pero no llegará a la hoja: la próxima
+                # sincronización deja la copia como la hoja
+                self._forzar = True
+                raise
+
+    def reservar(self, delta, clave='ID'):
+        """Reserva contra la copia local; la hoja vuelve a comprobar el stock al recibirla."""
+        with self._lock:
+            self._comprobar_activa()
+            if not self.local.reservar(delta, clave):
+                return False
+            self._escrituras += 1
+            self._espera = self.intervalo
+            try:
+                self.cola.encolar(delta)
+            except Exception:
+                self._forzar = True
+                raise
+        return True
+
+    def escribir_todo(self, df):
+        with self._lock:
+            # Lo encolado se enviaría después encima de la tabla nueva
+            if not self.cola.vaciar():
+                raise ColaSinEnviar("Hay cambios sin enviar a la hoja; no se reescribe la tabla")
+            self.remoto.escribir_todo(df)
+            self.local.escribir_todo(_normalizada(df))
+            self._escrituras += 1
+            self.sin_datos = False
+
+    def leer_marca_ids(self):
+        return self.remoto.leer_marca_ids()
+
+    def reservar_ids(self, n, minimo=0):
+        return self.remoto.reservar_ids(n, minimo)
+
+    def leer_ultimo_reinicio(self):
+        return self.remoto.leer_ultimo_reinicio()
+
+    def reclamar_reinicio(self, anterior, nuevo):
+        return self.remoto.reclamar_reinicio(anterior, nuevo)
+
+    # --- Sincronización ---
+    def _al_enviar(self, descartados, escrituras):
+        if descartados:
+            self._forzar = True
+            self._despertar.set()
+
+    def sincronizar(self):
+        """Trae a la copia local los cambios del remoto. Devuelve True si la ha cambiado."""
+        with self._lock:
+            generacion = self._escrituras
+        # Lo local va primero: hasta que no se envíe, traer la hoja lo pisaría
+        if self.cola.estado()['pendientes']:
+            return False
+        version = self.remoto.version()
+        self.ultima_sincronizacion = time.time()
+        if not self._forzar and version is not None and version == self._version_remota:
+            return False
+        remoto = _normalizada(self.remoto.leer())
+        with self._lock:
+            if self._escrituras != generacion or self.cola.estado()['pendientes']:
+                # Se ha colado una escritura local mientras se leía la hoja
+                return False
+            delta = calcular_delta(_normalizada(self.local.leer()), remoto)
+            if delta is None:
+                self.local.escribir_todo(remoto)
+            elif not delta.vacio:
+                self.local.aplicar_delta(delta)
+            self._version_remota = version
+            self._forzar = False
+            self.sin_datos = False
+        cambiado = delta is None or not delta.vacio
+        self.sincronizaciones += cambiado
+        return cambiado
+
+    def _sincronizar_seguro(self):
+        try:
+            cambiado = self.sincronizar()
+            self.ultimo_error = None
+            return cambiado
+        except Exception as e:
+            self.ultimo_error = str(e)
+            return False
+
+    def _sondear(self):
+        """Una vuelta del hilo. Devuelve los segundos hasta la siguiente."""
+        # Una copia sin datos o que hay que rehacer no espera turno
+        if self._forzar or self.sin_datos or self.sondeo is None or self.sondeo():
+            cambiado = self._sincronizar_seguro()
+            if cambiado or self.sin_datos:
+                self._espera = self.intervalo
+            else:
+                self._espera = min(2 * self._espera, self.intervalo_max)
+        else:
+            self.sondeos_omitidos += 1
+        return self._espera
+
+    def _comprobar_activa(self):
+        # Detenida, la copia local ya puede ser de otra réplica del mismo hogar:
+        # un cambio escrito aquí no llegaría a la hoja
+        if self._parar.is_set():
+            raise ColaDetenida("El hogar se ha vuelto a cargar; el cambio no se ha guardado")
+
+    def detener(self):
+        with self._lock:
+            # Con el lock: una escritura en curso termina de encolarse antes de parar
+            self._parar.set()
+        self._despertar.set()
+        if self._hilo.is_alive():
+            self._hilo.join()
+        self.cola.detener()
+
+    def estado(self):
+        cola = self.cola.estado()
+        desde = None if self.ultima_sincronizacion is None else time.time() - self.ultima_sincronizacion
+        return {
+            'pendientes': cola['pendientes'],
+            'sin_datos': self.sin_datos,
+            'descartados': cola['descartados'],
+            'sincronizaciones': self.sincronizaciones,
+            'ultima_sincronizacion': self.ultima_sincronizacion,
+            'espera_sondeo': self._espera,
+            'sondeos_omitidos': self.sondeos_omitidos,
+            'segundos_desde_sincronizacion': desde,
+            # Error al traer de la hoja o al enviarle cambios
+            'ultimo_error': self.ultimo_error or cola['ultimo_error'],
+            'reintento_en': cola['reintento_en'],
+        }
+
+    # --- Hilo ---
+    def _bucle(self):
+        while not self._parar.is_set():
+            self._despertar.clear()
+            self._despertar.wait(self._sondear())
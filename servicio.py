@@ -0,0 +1,306 @@
+import os
+from datetime import date
+
+import pandas as pd
+
+from almacen import AlmacenTareas, TareaNoDisponible, ejecutar_con_reintentos
+from cola import ColaEscritura, ColaSinEnviar, ejecutar_diferido
+from historial import Historial
+from hogares import HOGAR_POR_DEFECTO, Inquilino
+from instrumentacion import BackendMedido
+from persistencia import AsignadorIDs, CacheTabla, crear_backend
+from planificador import PlanificadorReinicio
+from recurrencias import escribir_frecuencia
+from replica import BackendReplica
+
+# ==========================================
+# NÚCLEO DE LA APP (SIN STREAMLIT)
+# ==========================================
+# Todo lo que la app hace con las tareas, sin ninguna llamada a st.:
+# - Configuracion: las opciones GESTI_* del entorno;
+# - crear_inquilino(): monta los recursos de un hogar (backend, caché, IDs,
+#   cola, historial, reinicio) según la configuración;
+# - Sesion: lo que ve y hace un usuario (sus listas y sus operaciones).
+# app.py solo pinta y llama aquí; la CLI (gesti.py) y las pruebas de carga
+# usan lo mismo sin levantar un servidor.
+#
+#   inquilino = crear_inquilino(hogar, Configuracion(backend='sqlite'))
+#   sesion = Sesion(inquilino, 'Papá')
+#   sesion.asignar(sesion.libres()['ID'].iloc[0], 'Tarde')
+
+
+class SinPermiso(Exception):
+    """La operación es solo para administradores."""
+
+
+def _si_no(texto):
+    return texto == "1"
+
+
+class Configuracion:
+    """Opciones de almacenamiento, escritura y reinicio; por defecto las de la app."""
+
+    # atributo: (variable de entorno, conversión, valor por defecto)
+    ENTORNO = {
+        # 'gsheets', 'sqlite' o 'normalizado'
+        'backend': ("GESTI_BACKEND", str, "gsheets"),
+        # Ruta del .db (por defecto tareas.db, o tareas_normalizadas.db con el modelo normalizado)
+        'ruta_sqlite': ("GESTI_SQLITE", str, None),
+        # Con el modelo normalizado, de dónde se migra la primera vez: 'gsheets' (la hoja del
+        # hogar), la ruta de un CSV con la tabla plana, o vacío para empezar sin tareas
+        'migrar_desde': ("GESTI_MIGRAR_DESDE", str, "gsheets"),
+        # Escritura diferida: el clic no espera a la hoja; se envía por lotes cada N segundos
+        'escritura_diferida': ("GESTI_ESCRITURA_DIFERIDA", _si_no, False),
+        'intervalo_envio': ("GESTI_INTERVALO_ENVIO", float, 2.0),
+        'ruta_historial': ("GESTI_HISTORIAL", str, "historial"),
+        # Hora del reinicio automático ('HH:MM'); vacío para hacerlo solo a mano
+        'hora_reinicio': ("GESTI_HORA_REINICIO", str, "04:00"),
+        # Hogares (usuarios, admins y hoja de cada uno); sin fichero hay un solo hogar
+        'ruta_hogares': ("GESTI_HOGARES", str, "hogares.json"),
+        # Hogar de esta instalación cuando la URL no lleva ?hogar= (vacío: con varios hogares es obligatorio)
+        'hogar': ("GESTI_HOGAR", str, None),
+        'max_hogares_activos': ("GESTI_MAX_HOGARES_ACTIVOS", int, 200),
+        # Pool de conexiones a Sheets y cuota de la API (peticiones por minuto de la cuenta de servicio)
+        'tam_pool': ("GESTI_POOL", int, 4),
+        'lecturas_minuto': ("GESTI_LECTURAS_MINUTO", float, 60.0),
+        'escrituras_minuto': ("GESTI_ESCRITURAS_MINUTO", float, 60.0),
+        # Réplica local de la hoja: las páginas se leen de disco y se sincroniza en segundo
+        # plano (vacío para leer directamente de la hoja); solo con el backend de Sheets
+        'ruta_replica': ("GESTI_REPLICA", str, "replica.db"),
+        'intervalo_sincronizacion': ("GESTI_INTERVALO_SINCRONIZACION", float, 10.0),
+        # Tiempos de cada parte de la recarga; GESTI_INSTRUMENTACION=0 lo apaga
+        'instrumentacion': ("GESTI_INSTRUMENTACION", lambda t: t != "0", True),
+    }
+
+    def __init__(self, **opciones):
+        for nombre, (_, _, defecto) in self.ENTORNO.items():
+            setattr(self, nombre, opciones.pop(nombre, defecto))
+        if opciones:
+            raise TypeError(f"Opciones desconocidas: {', '.join(opciones)}")
+        if self.ruta_sqlite is None:
+            self.ruta_sqlite = "tareas_normalizadas.db" if self.backend == "normalizado" else "tareas.db"
+
+    @classmethod
+    def desde_entorno(cls, entorno=None, **opciones):
+        """La configuración de las variables GESTI_*; 'opciones' manda sobre el entorno."""
+        entorno = os.environ if entorno is None else entorno
+        for nombre, (variable, convertir, _) in cls.ENTORNO.items():
+            if nombre not in opciones and variable in entorno:
+                opciones[nombre] = convertir(entorno[variable])
+        return cls(**opciones)
+
+    def usa_gsheets(self):
+        """Hace falta la conexión a Sheets (como backend o para migrar desde la hoja)."""
+        return self.backend == "gsheets" or (self.backend == "normalizado" and self.migrar_desde == "gsheets")
+
+
+def _ruta_hogar(ruta, hogar):
+    """La ruta tal cual para el hogar único; con varios hogares, una por hogar."""
+    if hogar.id == HOGAR_POR_DEFECTO:
+        return ruta
+    base, ext = os.path.splitext(ruta)
+    return f"{base}_{hogar.id}{ext}"
+
+
+def crear_inquilino(hogar, conf, gestor=None, instrumentacion=None):
+    """Recursos de un hogar: caché, IDs, cola, historial y reinicio, cada uno con sus datos.
+
+    'gestor' son las conexiones a Sheets (solo si conf.usa_gsheets()); con
+    'instrumentacion' se miden las llamadas al backend. El planificador se
+    crea sin hilo: lo comprueba el registro de hogares.
+    """
+    unico = hogar.id == HOGAR_POR_DEFECTO
+    backend = crear_backend(conf.backend, gestor=gestor, ruta_sqlite=_ruta_hogar(conf.ruta_sqlite, hogar),
+                            libro=hogar.libro, pestana=hogar.pestana)
+    if conf.backend == "normalizado" and conf.migrar_desde and backend.version() == 0:
+        # Primera vez con el modelo normalizado: se migra la tabla plana del hogar
+        if conf.migrar_desde == "gsheets":
+            plana = crear_backend("gsheets", gestor=gestor, libro=hogar.libro, pestana=hogar.pestana).leer()
+        else:
+            plana = pd.read_csv(conf.migrar_desde)
+        backend.escribir_todo(plana)
+    replica = None
+    if conf.ruta_replica and conf.backend == "gsheets":
+        # La réplica ya envía los cambios por lotes: no hace falta además la cola diferida
+        backend = replica = BackendReplica(
+            backend, ruta=_ruta_hogar(conf.ruta_replica, hogar),
+            intervalo=conf.intervalo_sincronizacion, intervalo_envio=conf.intervalo_envio,
+            sondeo=gestor.permitir_sondeo if gestor is not None else None)
+    if instrumentacion is not None:
+        # Llamadas, tiempos y bytes del backend para el panel de rendimiento
+        backend = BackendMedido(backend, instrumentacion)
+    # Caché única por hogar: todas las sesiones de la casa comparten la misma instantánea
+    cache = CacheTabla(backend)
+    # IDs nuevos compartidos por las sesiones del hogar (sin carreras entre clics simultáneos)
+    ids = AsignadorIDs(backend)
+    cola = None
+    if conf.escritura_diferida and replica is None:
+        def al_enviar(descartados, escrituras):
+            # Si se descartó algo, la copia compartida ya no coincide con la hoja
+            if descartados:
+                cache.invalidar()
+            else:
+                cache.actualizar_version(escrituras)
+        cola = ColaEscritura(backend, ruta="cola_escrituras.jsonl" if unico else f"cola_escrituras_{hogar.id}.jsonl",
+                             intervalo=conf.intervalo_envio, al_enviar=al_enviar)
+    historial = Historial(conf.ruta_historial if unico else os.path.join(conf.ruta_historial, hogar.id))
+    planificador = None
+    if conf.hora_reinicio:
+        # Con réplica, el reinicio se hace contra la hoja y no contra la copia local
+        planificador = PlanificadorReinicio(replica.remoto if replica is not None else backend, ids=ids,
+                                            historial=historial, hora=conf.hora_reinicio,
+                                            al_reiniciar=cache.registrar_escritura, replica=replica,
+                                            iniciar=False)
+    return Inquilino(hogar, cache, ids, historial=historial, cola=cola, planificador=planificador,
+                     replica=replica)
+
+
+class Sesion:
+    """Lo que ve y hace un usuario de un hogar, con su propia copia de la tabla.
+
+    - Las listas (libres(), pendientes()...) salen de la copia, sin leer el
+      backend.
+    - Cada operación guarda enseguida solo sus cambios (o los encola, con
+      escritura diferida) y devuelve el delta. Si la tarea ya no se puede
+      coger lanza TareaNoDisponible y la copia se recarga.
+    - Las operaciones de administración lanzan SinPermiso a quien no es admin.
+    """
+
+    def __init__(self, inquilino, usuario=None):
+        self.inquilino = inquilino
+        self.almacen = None
+        self._libres = (None, None)
+        self.cambiar_usuario(usuario or inquilino.hogar.usuarios[0])
+        planificador = inquilino.planificador
+        self._reinicios_vistos = planificador.reinicios if planificador is not None else 0
+
+    def cambiar_usuario(self, usuario):
+        hogar = self.inquilino.hogar
+        if usuario not in hogar.usuarios:
+            raise ValueError(f"'{usuario}' no es usuario de {hogar.nombre}")
+        self.usuario = usuario
+        self.es_admin = hogar.es_admin(usuario)
+        self.grupos = ['Padres', 'Todos'] if self.es_admin else ['Hijos', 'Todos']
+
+    # --- Copia de la tabla ---
+    def cargar(self, forzar=False, tabla=None):
+        """Vuelve a sacar la copia de la caché del hogar ('forzar' la relee del backend).
+
+        Con 'tabla' se usa esa en lugar de leer (la app pone una vacía si no ha podido leer).
+        """
+        if tabla is None:
+            tabla = self.inquilino.cache.obtener(forzar=forzar)
+        self.almacen = AlmacenTareas(tabla, ids=self.inquilino.ids)
+        return self.almacen
+
+    def _recargar(self):
+        return self.cargar(forzar=True)
+
+    def al_dia(self):
+        """Carga la copia si no la hay, o la recarga si el reinicio automático pasó desde la última vez."""
+        planificador = self.inquilino.planificador
+        reinicios = planificador.reinicios if planificador is not None else 0
+        if self.almacen is None:
+            self.cargar()
+        elif reinicios != self._reinicios_vistos:
+            self._recargar()
+        self._reinicios_vistos = reinicios
+        return self.almacen
+
+    # --- Vistas ---
+    def dia(self):
+        """El día de la app: cambia con el reinicio (a las 2:00 sigue siendo el día anterior)."""
+        planificador = self.inquilino.planificador
+        return planificador.dia_debido() if planificador is not None else date.today()
+
+    def libres(self):
+        """Tareas que el usuario puede coger hoy (con stock, badge y texto).
+
+        Como almacen.tabla(), se rehace solo si la copia, el día o el usuario han cambiado.
+        """
+        clave = (self.almacen, self.almacen.version, self.dia(), tuple(self.grupos))
+        if self._libres[0] != clave:
+            self._libres = (clave, self.almacen.tareas_libres(self.grupos, self.almacen.debidas(clave[2])))
+        return self._libres[1]
+
+    def pendientes(self):
+        return self.almacen.filas_de(self.usuario, 'Pendiente')
+
+    def finalizadas(self):
+        return self.almacen.filas_de(self.usuario, 'Hecho')
+
+    def tabla(self):
+        return self.almacen.tabla()
+
+    def stock(self, tarea):
+        return self.almacen.stock(tarea)
+
+    # --- Operaciones ---
+    def _guardar(self, operacion):
+        inquilino = self.inquilino
+        try:
+            if inquilino.cola is not None:
+                self.almacen, delta = ejecutar_diferido(self.almacen, operacion, inquilino.cola)
+            else:
+                self.almacen, delta = ejecutar_con_reintentos(self.almacen, operacion, inquilino.backend,
+                                                              self._recargar)
+        except TareaNoDisponible:
+            self._recargar()
+            raise
+        # Encolado aún no ha llegado al backend: su versión no se ha movido
+        inquilino.cache.registrar_escritura(delta, escrituras=0 if inquilino.cola is not None else 1)
+        return delta
+
+    def _solo_admin(self):
+        if not self.es_admin:
+            raise SinPermiso(f"{self.usuario} no es administrador de {self.inquilino.hogar.nombre}")
+
+    def asignar(self, id_tarea, franja):
+        return self._guardar(lambda a: a.asignar(id_tarea, self.usuario, franja))
+
+    def completar(self, id_tarea):
+        delta = self._guardar(lambda a: a.completar(id_tarea))
+        if self.inquilino.historial is not None:
+            # Con la hora de ahora: al cerrar el día se archiva con ella
+            self.inquilino.historial.apuntar_hecha(self.almacen.fila(id_tarea))
+        return delta
+
+    def liberar(self, id_tarea):
+        return self._guardar(lambda a: a.liberar(id_tarea))
+
+    def reabrir(self, id_tarea):
+        """Deshace un 'Hecho'."""
+        delta = self._guardar(lambda a: a.reabrir(id_tarea))
+        if self.inquilino.historial is not None:
+            self.inquilino.historial.anular_hecha(id_tarea)
+        return delta
+
+    def nueva_tarea(self, tarea, para, tipo, cantidad, regla=None):
+        """Crea una tarea que se repite según 'regla' (una Regla de recurrencias; por defecto diaria)."""
+        self._solo_admin()
+        frecuencia = escribir_frecuencia(regla) if regla is not None else 'Diaria'
+        return self._guardar(lambda a: a.nueva_tarea(tarea, para, tipo, cantidad, frecuencia))
+
+    def ajustar_cantidad(self, id_tarea, cantidad):
+        self._solo_admin()
+        return self._guardar(lambda a: a.ajustar_cantidad(id_tarea, cantidad))
+
+    def reinicio_diario(self):
+        """Cierre del día a mano: archiva lo hecho y deja todo libre y pendiente.
+
+        Después se relee la tabla: en el modelo normalizado las tareas normales
+        que estaban asignadas vuelven a quedar libres.
+        """
+        self._solo_admin()
+        inquilino = self.inquilino
+        # El reinicio toca todas las filas: con cambios sin enviar no se hace
+        for cola in (inquilino.cola, inquilino.replica.cola if inquilino.replica is not None else None):
+            if cola is not None and not cola.vaciar():
+                raise ColaSinEnviar("Hay cambios sin enviar a la hoja; el reinicio no se ha hecho. "
+                                    "Prueba otra vez en unos segundos.")
+        # Se archiva antes de borrar; si el guardado falla, repetirlo no duplica filas
+        if inquilino.historial is not None:
+            inquilino.historial.cerrar_dia(self.almacen.tabla())
+        delta = self._guardar(lambda a: a.reinicio_diario())
+        self._recargar()
+        return delta
@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+# Los datos sintéticos de los benchmarks sirven también para los tests
+sys.path.insert(0, os.path.join(RAIZ, 'benchmarks'))
+from logica import COLUMNAS  # noqa: E402
+
+
+@pytest.fixture
+def tabla():
+    """Tabla pequeña: dos normales, un contador de 3 con una unidad asignada y una tarea hecha."""
+    return pd.DataFrame([
+        [1, 'Fregar', 'Diaria', 'Normal', 'Todos', 'Sin asignar', 'Pendiente', '-', 1],
+        [2, 'Barrer', 'Diaria', 'Normal', 'Padres', 'Sin asignar', 'Pendiente', '-', 1],
+        [3, 'Lavadora', 'Diaria', 'Contador', 'Todos', 'Sin asignar', 'Pendiente', '-', 3],
+        [4, 'Lavadora', 'Puntual', 'Contador', 'Todos', 'Papá', 'Pendiente', 'Tarde', 1],
+        [5, 'Regar', 'Diaria', 'Normal', 'Hijos', 'Sin asignar', 'Pendiente', '-', 1],
+        [6, 'Regar', 'Puntual', 'Normal', 'Hijos', 'Cris', 'Hecho', 'Mañana', 1],
+    ], columns=COLUMNAS)
@@ -0,0 +1,190 @@
+import random
+import threading
+from collections import Counter
+from datetime import date
+
+import pytest
+
+from almacen import AlmacenTareas, TareaNoDisponible, ejecutar_con_reintentos
+from datos_sinteticos import FRANJAS, USUARIOS, mismas_filas, tabla_sintetica
+from logica import TIPOS_CONTADOR, calcular_indice_stock, vista_tareas_libres
+from persistencia import AsignadorIDs, BackendMemoria, BackendSQLite, ConflictoConcurrencia
+
+GRUPOS = [['Padres', 'Todos'], ['Hijos', 'Todos']]
+
+
+def _sesion(backend):
+    """(almacén recién leído, función que lo vuelve a leer, contador de recargas)."""
+    ids = AsignadorIDs(backend)
+    recargas = []
+
+    def recargar():
+        recargas.append(1)
+        return AlmacenTareas(backend.leer(), ids=ids)
+    return AlmacenTareas(backend.leer(), ids=ids), recargar, recargas
+
+
+def _fila(backend, id_tarea):
+    df = backend.leer()
+    return df[df['ID'] == id_tarea]
+
+
+# ==========================================
+# ESCRITURAS CONDICIONADAS (CAS)
+# ==========================================
+
+def test_escritura_sobre_una_fila_cambiada_da_conflicto(tabla):
+    backend = BackendMemoria(tabla)
+    primera, _, _ = _sesion(backend)
+    segunda, _, _ = _sesion(backend)
+    primera.completar(4)
+    backend.aplicar_delta(primera.cambios_pendientes())
+    segunda.liberar(4)
+    with pytest.raises(ConflictoConcurrencia):
+        backend.aplicar_delta(segunda.cambios_pendientes())
+    assert _fila(backend, 4)['Estado'].tolist() == ['Hecho']
+
+
+def test_conflicto_se_reintenta_sobre_los_datos_frescos(tabla):
+    backend = BackendMemoria(tabla)
+    primera, recargar_primera, _ = _sesion(backend)
+    segunda, recargar, recargas = _sesion(backend)
+    ejecutar_con_reintentos(primera, lambda a: a.completar(4), backend, recargar_primera)
+    segunda, delta = ejecutar_con_reintentos(segunda, lambda a: a.liberar(4), backend, recargar)
+    assert len(recargas) == 1
+    assert delta.borrados == [4]
+    assert _fila(backend, 4).empty
+
+
+def test_cambios_en_otras_filas_se_conservan(tabla):
+    backend = BackendMemoria(tabla)
+    primera, recargar_primera, _ = _sesion(backend)
+    segunda, recargar, recargas = _sesion(backend)
+    ejecutar_con_reintentos(primera, lambda a: a.completar(4), backend, recargar_primera)
+    ejecutar_con_reintentos(segunda, lambda a: a.reabrir(6), backend, recargar)
+    assert not recargas
+    assert _fila(backend, 4)['Estado'].tolist() == ['Hecho']
+    assert _fila(backend, 6)['Estado'].tolist() == ['Pendiente']
+
+
+def test_reserva_sin_stock_no_se_reintenta(tabla):
+    backend = BackendMemoria(tabla)
+    primera, recargar_primera, _ = _sesion(backend)
+    segunda, recargar, recargas = _sesion(backend)
+    # Quedan dos lavadoras: las coge la primera sesión
+    for _ in range(2):
+        primera, _ = ejecutar_con_reintentos(primera, lambda a: a.asignar(3, 'Papá', 'Tarde'),
+                                             backend, recargar_primera)
+    # La segunda aún las ve libres, pero la reserva se rechaza en la misma llamada
+    assert segunda.stock('Lavadora') == 2
+    with pytest.raises(TareaNoDisponible):
+        ejecutar_con_reintentos(segunda, lambda a: a.asignar(3, 'Cris', 'Noche'), backend, recargar)
+    assert not recargas
+    assert len(segunda.cambios_pendientes().insertados) == 0
+    puntuales = backend.leer()
+    assert ((puntuales['Tarea'] == 'Lavadora') & (puntuales['Frecuencia'] == 'Puntual')).sum() == 3
+
+
+def _sobreasignaciones(df):
+    """Unidades asignadas por encima del objetivo + tareas normales repetidas."""
+    puntuales = df[df['Frecuencia'] == 'Puntual']
+    maestras = df[df['Frecuencia'] != 'Puntual'].drop_duplicates('Tarea').set_index('Tarea')
+    exceso = 0
+    for (tarea, tipo), n in Counter(zip(puntuales['Tarea'], puntuales['Tipo'])).items():
+        limite = int(float(maestras.at[tarea, 'Cantidad'])) if tipo in TIPOS_CONTADOR else 1
+        exceso += max(0, n - limite)
+    return exceso
+
+
+@pytest.mark.parametrize('motor', ['memoria', 'sqlite'])
+def test_sesiones_simultaneas_sin_perdidas_ni_exceso(motor, tmp_path):
+    df = tabla_sintetica(60, ratio_contador=0.5, ratio_puntual=0.0)
+    if motor == 'memoria':
+        backend = BackendMemoria(df, latencia=0.001)
+    else:
+        backend = BackendSQLite(str(tmp_path / 'tareas.db'))
+        backend.escribir_todo(df)
+    ids = AsignadorIDs(backend)
+    confirmadas = Counter()
+    barrera = threading.Barrier(4)
+
+    def sesion(usuario, rnd):
+        recargar = lambda: AlmacenTareas(backend.leer(), ids=ids)  # noqa: E731
+        almacen = recargar()
+        barrera.wait()
+        for _ in range(20):
+            libres = list(almacen.libres_para(['Todos', 'Padres', 'Hijos'])['ID'])
+            if not libres:
+                return
+            id_tarea = rnd.choice(libres)
+            try:
+                almacen, _ = ejecutar_con_reintentos(
+                    almacen, lambda a: a.asignar(id_tarea, usuario, 'Tarde'), backend, recargar)
+                confirmadas[usuario] += 1
+            except (TareaNoDisponible, ConflictoConcurrencia):
+                almacen = recargar()
+
+    hilos = [threading.Thread(target=sesion, args=(USUARIOS[n], random.Random(n))) for n in range(4)]
+    for h in hilos: h.start()
+    for h in hilos: h.join()
+    final = backend.leer()
+    # Toda asignación confirmada al usuario está guardada, y ninguna de más
+    assert (final['Frecuencia'] == 'Puntual').sum() == sum(confirmadas.values()) > 0
+    assert _sobreasignaciones(final) == 0
+    assert not final['ID'].duplicated().any()
+
+
+# ==========================================
+# VISTAS MANTENIDAS POR EL ALMACÉN
+# ==========================================
+
+def _comprobar_vistas(almacen):
+    df = almacen.tabla()
+    debidas = almacen.debidas(date.today())
+    indice = calcular_indice_stock(df)
+    # Es la vista que se pidió al final de la comprobación anterior: sale de
+    # rehacer solo las tareas tocadas desde entonces
+    incremental = almacen.tareas_libres(GRUPOS[-1], debidas)
+    assert mismas_filas(incremental, vista_tareas_libres(df, GRUPOS[-1], indice, debidas))
+    for grupo in GRUPOS:
+        for filtro in (None, debidas):
+            assert mismas_filas(almacen.tareas_libres(grupo, filtro),
+                                vista_tareas_libres(df, grupo, indice, filtro)), grupo
+    for usuario in USUARIOS:
+        for estado in ('Pendiente', 'Hecho'):
+            esperado = df[(df['Responsable'] == usuario) & (df['Estado'] == estado)]
+            assert mismas_filas(almacen.filas_de(usuario, estado), esperado), (usuario, estado)
+    almacen.tareas_libres(GRUPOS[-1], debidas)
+
+
+@pytest.mark.parametrize('semilla', [1, 2])
+def test_vistas_coinciden_con_el_filtrado_tras_operaciones_al_azar(semilla):
+    rnd = random.Random(semilla)
+    almacen = AlmacenTareas(tabla_sintetica(100, ratio_puntual=0.3, semilla=semilla), ids=AsignadorIDs())
+    _comprobar_vistas(almacen)
+    for n in range(100):
+        id_tarea = rnd.choice(list(almacen._filas))
+        op = rnd.choice(['asignar', 'completar', 'reabrir', 'liberar', 'cantidad', 'nueva', 'reinicio'])
+        try:
+            if op == 'asignar':
+                almacen.asignar(id_tarea, rnd.choice(USUARIOS), rnd.choice(FRANJAS))
+            elif op == 'completar':
+                almacen.completar(id_tarea)
+            elif op == 'reabrir':
+                almacen.reabrir(id_tarea)
+            elif op == 'liberar':
+                almacen.liberar(id_tarea)
+            elif op == 'cantidad':
+                almacen.ajustar_cantidad(id_tarea, rnd.randint(0, 4))
+            elif op == 'nueva':
+                almacen.nueva_tarea(f"Nueva {n}", rnd.choice(['Todos', 'Padres', 'Hijos']), 'Normal', 1)
+            elif rnd.random() < 0.1:
+                almacen.reinicio_diario()
+        except TareaNoDisponible:
+            pass
+        # Uno de cada cuatro guardados "falla" y se deshace
+        if rnd.random() < 0.25:
+            almacen.revertir()
+        else:
+            almacen.confirmar()
+        _comprobar_vistas(almacen)
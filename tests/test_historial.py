@@ -0,0 +1,33 @@
+from datetime import date, datetime, timedelta
+
+from historial import Historial
+
+
+class HistorialContado(Historial):
+    """Historial que cuenta las lecturas de disco."""
+
+    lecturas = 0
+
+    def leer(self, *args, **kwargs):
+        self.lecturas += 1
+        return super().leer(*args, **kwargs)
+
+
+def _ayer():
+    return datetime.combine(date.today() - timedelta(days=1), datetime.min.time())
+
+
+def test_ultimos_dias_no_relee_hasta_que_se_archiva_algo(tabla, tmp_path):
+    historial = HistorialContado(str(tmp_path / 'historial'))
+    historial.cerrar_dia(tabla, momento=_ayer())
+    primera = historial.ultimos_dias(7)
+    assert primera['Tarea'].tolist() == ['Regar']
+    for _ in range(5):
+        assert historial.ultimos_dias(7) is primera
+    assert historial.lecturas == 1
+    # Se archiva otra tarea en un día del rango
+    historial.registrar(tabla[tabla['ID'] == 4].assign(Estado='Hecho'), momento=_ayer())
+    assert sorted(historial.ultimos_dias(7)['ID']) == [4, 6]
+    assert historial.lecturas == 2
+    # Otro rango es otra lectura
+    assert historial.ultimos_dias(1).empty
@@ -0,0 +1,77 @@
+import threading
+import time
+
+import pytest
+
+from cola import ColaDetenida, ColaEscritura
+from hogares import Hogar, Inquilino, RegistroHogares
+from persistencia import AsignadorIDs, BackendMemoria, CacheTabla, calcular_delta
+from replica import BackendReplica
+
+
+def _delta_completar(df, id_tarea):
+    despues = df.copy()
+    despues.loc[despues['ID'] == id_tarea, 'Estado'] = 'Hecho'
+    return calcular_delta(df, despues)
+
+
+def test_cola_detenida_no_acepta_cambios(tabla, tmp_path):
+    ruta = tmp_path / 'cola.jsonl'
+    backend = BackendMemoria(tabla)
+    cola = ColaEscritura(backend, ruta=str(ruta), intervalo=0.01)
+    cola.detener()
+    with pytest.raises(ColaDetenida):
+        cola.encolar(_delta_completar(tabla, 1))
+    # Nada en el fichero, que puede ser ya de la cola del inquilino nuevo
+    assert not ruta.exists() or ruta.read_text() == ''
+
+
+def test_replica_detenida_no_toca_la_copia_local(tabla, tmp_path):
+    replica = BackendReplica(BackendMemoria(tabla), ruta=str(tmp_path / 'replica.db'), iniciar=False)
+    antes = replica.leer()
+    replica.detener()
+    with pytest.raises(ColaDetenida):
+        replica.aplicar_delta(_delta_completar(antes, 1))
+    assert replica.local.leer()['Estado'].tolist() == antes['Estado'].tolist()
+
+
+class InquilinoLento(Inquilino):
+    """Inquilino con una cola de verdad que tarda en cerrarse y apunta cuándo termina."""
+
+    def cerrar(self):
+        time.sleep(0.2)
+        super().cerrar()
+        self.cerrado = time.monotonic()
+
+
+def test_descargar_cierra_antes_de_volver_a_cargar(tabla, tmp_path):
+    backends = {h: BackendMemoria(tabla) for h in ('a', 'b')}
+    creados = []
+
+    def fabrica(hogar):
+        backend = backends[hogar.id]
+        cola = ColaEscritura(backend, ruta=str(tmp_path / f'cola_{hogar.id}.jsonl'), intervalo=0.01)
+        inquilino = InquilinoLento(hogar, CacheTabla(backend), AsignadorIDs(backend), cola=cola)
+        inquilino.creado = time.monotonic()
+        creados.append(inquilino)
+        return inquilino
+
+    registro = RegistroHogares({h: Hogar(h) for h in backends}, fabrica, max_activos=1, iniciar=False)
+    viejo = registro.obtener('a')
+    # Entrar en 'b' descarga 'a'; mientras se cierra, otra sesión vuelve a 'a'
+    hilo = threading.Thread(target=registro.obtener, args=('b',))
+    hilo.start()
+    time.sleep(0.05)
+    nuevo = registro.obtener('a')
+    hilo.join()
+    assert nuevo is not viejo
+    assert nuevo.creado >= viejo.cerrado
+    # La sesión que aún tiene el inquilino viejo no puede perder su cambio en silencio
+    with pytest.raises(ColaDetenida):
+        viejo.cola.encolar(_delta_completar(tabla, 1))
+    nuevo.cola.encolar(_delta_completar(tabla, 2))
+    assert nuevo.cola.vaciar()
+    assert backends['a'].leer().loc[lambda d: d['ID'] == 2, 'Estado'].tolist() == ['Hecho']
+    registro.detener()
+    for inquilino in creados:
+        inquilino.cola.detener()
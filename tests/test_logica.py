@@ -0,0 +1,41 @@
+from logica import TIPOS_CONTADOR, calcular_indice_stock, vista_tareas_libres
+from datos_sinteticos import tabla_sintetica
+
+FILTRO = ['Hijos', 'Todos']
+
+
+def _por_fila(df, indice_stock):
+    """El bucle iterrows que pintaba 'Tareas Libres' antes de la vista vectorizada."""
+    filas = []
+    libres = df[(df['Responsable'] == 'Sin asignar') & (df['Para'].isin(FILTRO))]
+    for _, row in libres.iterrows():
+        stock = 1
+        if row['Tipo'] in TIPOS_CONTADOR:
+            if row['Frecuencia'] == 'Puntual': continue
+            stock = indice_stock.get(row['Tarea'], 0)
+            if stock <= 0: continue
+        txt = f"{'🔢' if row['Tipo'] in TIPOS_CONTADOR else '📋'} **{row['Tarea']}**"
+        if row['Tipo'] in TIPOS_CONTADOR:
+            txt += f"  \n*(Disponibles: {stock})*"
+        filas.append((row['ID'], txt))
+    return filas
+
+
+def test_vista_libres_igual_que_el_bucle_por_filas():
+    df = tabla_sintetica(2_000, ratio_puntual=0.5)
+    vista = vista_tareas_libres(df, FILTRO, calcular_indice_stock(df))
+    assert list(zip(vista['ID'], vista['Texto'])) == _por_fila(df, calcular_indice_stock(df))
+
+
+def test_vista_libres_oculta_lo_que_no_se_puede_coger(tabla):
+    vista = vista_tareas_libres(tabla, FILTRO)
+    # Barrer es de Padres, la asignación de la lavadora no es una fila libre
+    # y Regar ya está asignada hoy
+    assert vista['ID'].tolist() == [1, 3]
+    assert vista['Texto'].tolist() == ["📋 **Fregar**", "🔢 **Lavadora**  \n*(Disponibles: 2)*"]
+    assert vista['Stock'].tolist() == [1, 2]
+
+
+def test_vista_libres_solo_las_debidas(tabla):
+    assert vista_tareas_libres(tabla, FILTRO, debidas={3})['ID'].tolist() == [3]
+    assert vista_tareas_libres(tabla.iloc[:0], FILTRO).empty
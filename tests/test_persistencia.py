@@ -0,0 +1,103 @@
+import multiprocessing
+import sqlite3
+import threading
+
+import pytest
+
+from modelo import BackendNormalizado
+from persistencia import AsignadorIDs, BackendMemoria, BackendSQLite, CacheTabla, calcular_delta
+
+POR_TRABAJADOR = 200
+
+
+class BackendConEscrituraAjena(BackendMemoria):
+    """BackendMemoria en el que otro proceso escribe justo después de leer la tabla."""
+
+    escritura_ajena = None
+
+    def leer(self):
+        df = super().leer()
+        if self.escritura_ajena is not None:
+            escribir, self.escritura_ajena = self.escritura_ajena, None
+            escribir()
+        return df
+
+
+def _completar(backend, id_tarea):
+    antes = backend.leer()
+    despues = antes.copy()
+    despues.loc[despues['ID'] == id_tarea, 'Estado'] = 'Hecho'
+    backend.aplicar_delta(calcular_delta(antes, despues))
+
+
+def _estado(df, id_tarea):
+    return df.loc[df['ID'] == id_tarea, 'Estado'].iloc[0]
+
+
+def test_cache_escritura_entre_leer_y_version(tabla):
+    backend = BackendConEscrituraAjena(tabla)
+    cache = CacheTabla(backend, comprobar_cada=0)
+    backend.escritura_ajena = lambda: _completar(backend, 1)
+    # La primera lectura se queda con la tabla de antes de la escritura ajena...
+    assert _estado(cache.obtener(), 1) == 'Pendiente'
+    # ...pero con la versión de antes, así que la siguiente comprobación la relee
+    assert _estado(cache.obtener(), 1) == 'Hecho'
+    assert _estado(backend.leer(), 1) == 'Hecho'
+
+
+def _repartir(asignador, trabajadores):
+    repartidos = []
+    barrera = threading.Barrier(trabajadores)
+
+    def trabajador():
+        barrera.wait()
+        ids = [asignador.siguiente() for _ in range(POR_TRABAJADOR)]
+        repartidos.extend(ids)
+
+    hilos = [threading.Thread(target=trabajador) for _ in range(trabajadores)]
+    for h in hilos: h.start()
+    for h in hilos: h.join()
+    return repartidos
+
+
+@pytest.mark.parametrize('clase', [BackendMemoria, BackendSQLite, BackendNormalizado])
+def test_ids_unicos_entre_hilos(clase, tmp_path):
+    backend = clase() if clase is BackendMemoria else clase(str(tmp_path / 'tareas.db'))
+    repartidos = _repartir(AsignadorIDs(backend, tam_bloque=5), 8)
+    assert len(repartidos) == len(set(repartidos)) == 8 * POR_TRABAJADOR
+
+
+def _proceso(clase, ruta, barrera):
+    # Bloques pequeños para que los procesos pidan bloque a la vez muchas veces
+    asignador = AsignadorIDs(clase(ruta), tam_bloque=5)
+    barrera.wait()
+    return [asignador.siguiente() for _ in range(POR_TRABAJADOR)]
+
+
+@pytest.mark.parametrize('clase', [BackendSQLite, BackendNormalizado])
+def test_ids_unicos_entre_procesos(clase, tmp_path):
+    ruta = str(tmp_path / 'tareas.db')
+    clase(ruta)  # crea el esquema antes de que arranquen los procesos
+    with multiprocessing.Manager() as gestor:
+        barrera = gestor.Barrier(4)
+        with multiprocessing.Pool(4) as pool:
+            listas = pool.starmap(_proceso, [(clase, ruta, barrera)] * 4)
+    repartidos = [i for lista in listas for i in lista]
+    assert len(repartidos) == len(set(repartidos)) == 4 * POR_TRABAJADOR
+
+
+def test_reservar_ids_espera_a_que_se_suelte_la_base(tmp_path):
+    ruta = str(tmp_path / 'tareas.db')
+    backend = BackendSQLite(ruta)
+    # La conexión se rinde enseguida: solo los reintentos cubren el bloqueo
+    backend.espera_bloqueo = 0.01
+    otro = sqlite3.connect(ruta, isolation_level=None, check_same_thread=False)
+    otro.execute("BEGIN EXCLUSIVE")
+    soltar = threading.Timer(0.2, lambda: otro.execute("COMMIT"))
+    soltar.start()
+    try:
+        assert backend.reservar_ids(10) == 0
+    finally:
+        soltar.join()
+        otro.close()
+    assert backend.leer_marca_ids() == 10
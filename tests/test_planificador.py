@@ -0,0 +1,81 @@
+from datetime import date, datetime
+
+import pytest
+
+from persistencia import AsignadorIDs, BackendMemoria, ConflictoConcurrencia
+from planificador import PlanificadorReinicio
+from replica import BackendReplica
+
+AYER, HOY = date(2026, 10, 17), date(2026, 10, 18)
+
+
+class HojaQueRechaza(BackendMemoria):
+    """Hoja en la que otro proceso gana siempre la carrera por las mismas filas."""
+
+    def aplicar_delta(self, delta, clave='ID'):
+        raise ConflictoConcurrencia("otra sesión ha cambiado la fila")
+
+
+def _planificador(hoja, replica):
+    hoja.reclamar_reinicio(0, AYER.toordinal())
+    return PlanificadorReinicio(hoja, ids=AsignadorIDs(replica), replica=replica,
+                                reloj=lambda: datetime(2026, 10, 18, 5), iniciar=False)
+
+
+@pytest.fixture
+def replica_de(tmp_path):
+    replicas = []
+
+    def crear(hoja):
+        replicas.append(BackendReplica(hoja, ruta=str(tmp_path / 'replica.db'), iniciar=False,
+                                       intervalo_envio=0.01))
+        return replicas[-1]
+    yield crear
+    for replica in replicas:
+        replica.detener()
+
+
+def test_reinicio_con_replica_se_hace_en_la_hoja(tabla, replica_de):
+    hoja = BackendMemoria(tabla)
+    replica = replica_de(hoja)
+    assert _planificador(hoja, replica).comprobar()
+    assert not (hoja.leer()['Frecuencia'] == 'Puntual').any()
+    assert hoja.leer_ultimo_reinicio() == HOY.toordinal()
+    # La copia local ya tiene el reinicio y no queda nada en su cola
+    assert not (replica.leer()['Frecuencia'] == 'Puntual').any()
+    assert replica.cola.estado()['pendientes'] == 0
+
+
+def test_reinicio_rechazado_por_la_hoja_no_marca_el_dia(tabla, replica_de):
+    hoja = HojaQueRechaza(tabla)
+    replica = replica_de(hoja)
+    with pytest.raises(ConflictoConcurrencia):
+        _planificador(hoja, replica).comprobar()
+    assert hoja.leer_ultimo_reinicio() == AYER.toordinal()
+    assert (hoja.leer()['Frecuencia'] == 'Puntual').any()
+
+
+class HojaMarcaContada(BackendMemoria):
+    """BackendMemoria que cuenta las lecturas de la marca del reinicio."""
+
+    lecturas_marca = 0
+
+    def leer_ultimo_reinicio(self):
+        self.lecturas_marca += 1
+        return super().leer_ultimo_reinicio()
+
+
+def test_la_marca_no_se_pregunta_hasta_que_toca_otro_dia(tabla):
+    hoja = HojaMarcaContada(tabla)
+    hoja.reclamar_reinicio(0, AYER.toordinal())
+    ahora = [datetime(2026, 10, 18, 5)]
+    planificador = PlanificadorReinicio(hoja, reloj=lambda: ahora[0], iniciar=False)
+    assert planificador.comprobar()
+    lecturas = hoja.lecturas_marca
+    for _ in range(10):
+        assert not planificador.comprobar()
+    assert hoja.lecturas_marca == lecturas
+    # Al día siguiente vuelve a preguntar (y reinicia)
+    ahora[0] = datetime(2026, 10, 19, 5)
+    assert planificador.comprobar()
+    assert hoja.lecturas_marca > lecturas
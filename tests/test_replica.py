@@ -0,0 +1,61 @@
+import pytest
+
+from conexion import GestorConexiones
+from persistencia import BackendMemoria, calcular_delta
+from replica import BackendReplica
+
+
+class HojaContada(BackendMemoria):
+    """BackendMemoria que cuenta cuántas veces se le pregunta la versión."""
+
+    consultas = 0
+
+    def version(self):
+        self.consultas += 1
+        return super().version()
+
+
+@pytest.fixture
+def crear_replica(tmp_path):
+    replicas = []
+
+    def crear(hoja, nombre='replica', **opciones):
+        replicas.append(BackendReplica(hoja, ruta=str(tmp_path / f'{nombre}.db'), iniciar=False, **opciones))
+        return replicas[-1]
+    yield crear
+    for replica in replicas:
+        replica.detener()
+
+
+def test_sondeo_se_espacia_mientras_la_hoja_no_cambia(tabla, crear_replica):
+    hoja = HojaContada(tabla)
+    replica = crear_replica(hoja, intervalo=10, intervalo_max=40)
+    assert [replica._sondear() for _ in range(4)] == [20, 40, 40, 40]
+    # Un cambio en la hoja se trae y el sondeo vuelve a su ritmo
+    antes = hoja.leer()
+    despues = antes.copy()
+    despues.loc[despues['ID'] == 1, 'Estado'] = 'Hecho'
+    hoja.aplicar_delta(calcular_delta(antes, despues))
+    assert replica._sondear() == 10
+    assert (replica.leer().loc[replica.leer()['ID'] == 1, 'Estado'] == 'Hecho').all()
+
+
+def test_sin_presupuesto_no_se_pregunta_a_la_hoja(tabla, crear_replica):
+    hoja = HojaContada(tabla)
+    replica = crear_replica(hoja, sondeo=lambda: False)
+    consultas = hoja.consultas
+    replica._sondear()
+    assert hoja.consultas == consultas
+    assert replica.estado()['sondeos_omitidos'] == 1
+
+
+def test_presupuesto_de_sondeo_compartido_entre_hogares(tabla, crear_replica):
+    # 60 lecturas por minuto, un cuarto para sondeos: una cada 4 s
+    gestor = GestorConexiones(lambda: None, lecturas_por_minuto=60, fraccion_sondeo=0.25)
+    hojas = [HojaContada(tabla) for _ in range(10)]
+    replicas = [crear_replica(h, f'hogar{n}', sondeo=gestor.permitir_sondeo) for n, h in enumerate(hojas)]
+    antes = [h.consultas for h in hojas]
+    for replica in replicas:
+        replica._sondear()
+    assert sum(h.consultas for h in hojas) - sum(antes) == 1
+    assert gestor.metricas()['sondeos_omitidos'] == 9